@@ -29,14 +29,32 @@ def create_app(key="default"):
     migrate.init_app(app, db)
     cors.init_app(app)
 
+    from .cache import init_cache
+    from .database import apply_sqlite_pragmas
+    from .instrumentation import init_instrumentation
+    from .metrics import init_metrics
+    from .suggest import init_suggest
+
+    init_cache(app)
+    apply_sqlite_pragmas(app)
+    init_instrumentation(app)
+    init_metrics(app)
+    init_suggest(app)
+
     from .main import main_bp
     from .books import books_bp
     from .members import members_bp
     from .transactions import transactions_bp
+    from .analytics import analytics_bp
 
     app.register_blueprint(main_bp)
     app.register_blueprint(books_bp, url_prefix="/api/books")
     app.register_blueprint(members_bp, url_prefix="/api/members")
     app.register_blueprint(transactions_bp, url_prefix="/api/transactions")
+    app.register_blueprint(analytics_bp, url_prefix="/api/analytics")
+
+    from .commands import register_commands
+
+    register_commands(app)
 
     return app
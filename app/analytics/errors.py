@@ -0,0 +1,18 @@
+from flask import jsonify
+from app.analytics import analytics_bp
+from .reports import InvalidReport
+
+
+@analytics_bp.errorhandler(InvalidReport)
+def invalid_report(e):
+    """Handle report arguments out of range.
+
+    Args:
+        e (exception): and exception object.
+
+    Returns:
+        json: Error message
+    """
+    return jsonify({
+        "Error": str(e)
+    }), 400
@@ -0,0 +1,36 @@
+"""The ledger the circulation analytics count from.
+
+Transactions moved out by ``flask archive-transactions`` still count, so
+every report and rollup reads ``transactions`` and
+``transactions_archive`` together.
+"""
+from ..models import Transaction, TransactionArchive
+from ..utils import TransactionType
+
+LEDGERS = (Transaction, TransactionArchive)
+
+
+def ledger_range(column, start, end=None):
+    """Filters ledger rows to those whose timestamp column falls in a range.
+
+    Args:
+        column (Column): ``issued_on`` or ``returned_on`` of a ledger.
+        start (datetime): Start of the range.
+        end (datetime, optional): End of the range, excluded.
+
+    Returns:
+        list: The conditions.
+    """
+    conditions = [column >= start]
+
+    if end is not None:
+        conditions.append(column < end)
+
+    if column is Transaction.issued_on:
+        # every transaction is an issue or a return, but naming both lets
+        # the (type, issued_on) index serve the range
+        conditions.append(
+            Transaction.type.in_([TransactionType.ISSUE, TransactionType.RETURN])
+        )
+
+    return conditions
@@ -0,0 +1,205 @@
+"""Circulation reports.
+
+Every report covers whole days, from the first day of the window to
+today. They are computed either with grouped queries over the
+transactions ledger, archived transactions included, or, when ``ANALYTICS_SOURCE`` is ``rollup``, from the
+``daily_book_stats`` and ``daily_member_stats`` tables, which hold one row
+per day and book or member and are kept up to date by ``update_rollups``
+(``flask refresh-analytics``). Reading the rollups costs the same however
+long the ledger gets, at the price of lagging behind it until the next
+refresh.
+"""
+from app import db
+from datetime import date, datetime, time, timedelta
+from flask import current_app
+from sqlalchemy import func, select, union_all
+from ..models import Book, DailyBookStats, DailyMemberStats, Member
+from ..sql import day_bucket
+from .ledger import LEDGERS, ledger_range
+
+MAX_REPORT_DAYS = 366
+MAX_REPORT_LIMIT = 100
+
+# ledger column and rollup table of each kind of counted row
+GROUPS = {
+    "book": ("book_id", DailyBookStats, DailyBookStats.book_id),
+    "member": ("member_id", DailyMemberStats, DailyMemberStats.member_id),
+}
+
+
+class InvalidReport(ValueError):
+    """Raised when report arguments are out of range."""
+
+
+def first_day(days):
+    """Returns the first day of a window of some days ending today.
+
+    Raises:
+        InvalidReport: If days is not between 1 and MAX_REPORT_DAYS.
+    """
+    if not 1 <= days <= MAX_REPORT_DAYS:
+        raise InvalidReport(f"days must be between 1 and {MAX_REPORT_DAYS}")
+
+    return date.today() - timedelta(days=days - 1)
+
+
+def check_limit(limit):
+    """Raises InvalidReport if a report limit is out of range."""
+    if not 1 <= limit <= MAX_REPORT_LIMIT:
+        raise InvalidReport(f"limit must be between 1 and {MAX_REPORT_LIMIT}")
+
+
+def issue_counts(group, since):
+    """Counts the loans per book or member from a day on.
+
+    Args:
+        group (str): ``book`` or ``member``.
+        since (date): The first day counted.
+
+    Returns:
+        Subquery: Rows of (id, issues).
+    """
+    ledger_key, rollup, rollup_key = GROUPS[group]
+
+    if current_app.config["ANALYTICS_SOURCE"] == "rollup":
+        query = (
+            select(rollup_key.label("id"), func.sum(rollup.issues).label("issues"))
+            .where(rollup.day >= since)
+            .group_by(rollup_key)
+        )
+    else:
+        start = datetime.combine(since, time.min)
+        loans = union_all(
+            *(
+                select(getattr(model, ledger_key).label("id")).where(
+                    *ledger_range(model.issued_on, start)
+                )
+                for model in LEDGERS
+            )
+        ).subquery()
+        query = select(loans.c.id, func.count().label("issues")).group_by(
+            loans.c.id
+        )
+
+    return query.subquery()
+
+
+def popular_books(days, limit):
+    """Lists the most borrowed books of the last days.
+
+    Args:
+        days (int): Length of the window in days, today included.
+        limit (int): Number of books listed.
+
+    Raises:
+        InvalidReport: If days or limit is out of range.
+
+    Returns:
+        list: Rows of (book_id, title, author, issues), most issued first.
+    """
+    check_limit(limit)
+    counts = issue_counts("book", first_day(days))
+
+    return db.session.execute(
+        select(counts.c.id.label("book_id"), Book.title, Book.author, counts.c.issues)
+        .outerjoin(Book, Book.id == counts.c.id)
+        .order_by(counts.c.issues.desc(), counts.c.id)
+        .limit(limit)
+    ).all()
+
+
+def active_members(days, limit):
+    """Lists the members who borrowed the most books in the last days.
+
+    Args:
+        days (int): Length of the window in days, today included.
+        limit (int): Number of members listed.
+
+    Raises:
+        InvalidReport: If days or limit is out of range.
+
+    Returns:
+        list: Rows of (member_id, name, issues), most issues first.
+    """
+    check_limit(limit)
+    counts = issue_counts("member", first_day(days))
+
+    return db.session.execute(
+        select(counts.c.id.label("member_id"), Member.name, counts.c.issues)
+        .outerjoin(Member, Member.id == counts.c.id)
+        .order_by(counts.c.issues.desc(), counts.c.id)
+        .limit(limit)
+    ).all()
+
+
+def circulation(days):
+    """Counts the loans issued, the books returned and the penalties
+    charged on each of the last days.
+
+    Args:
+        days (int): Length of the window in days, today included.
+
+    Raises:
+        InvalidReport: If days is out of range.
+
+    Returns:
+        list: (day, issues, returns, charges) tuples for every day of the
+        window, oldest first.
+    """
+    since = first_day(days)
+    issues = {}
+    returns = {}
+
+    if current_app.config["ANALYTICS_SOURCE"] == "rollup":
+        rows = db.session.execute(
+            select(
+                DailyBookStats.day,
+                func.sum(DailyBookStats.issues),
+                func.sum(DailyBookStats.returns),
+                func.sum(DailyBookStats.charges),
+            )
+            .where(DailyBookStats.day >= since)
+            .group_by(DailyBookStats.day)
+        )
+        for day, issued, returned, charged in rows:
+            issues[day] = issued
+            returns[day] = (returned, charged)
+    else:
+        start = datetime.combine(since, time.min)
+        issue_rows = union_all(
+            *(
+                select(day_bucket(model.issued_on).label("day")).where(
+                    *ledger_range(model.issued_on, start)
+                )
+                for model in LEDGERS
+            )
+        ).subquery()
+        return_rows = union_all(
+            *(
+                select(
+                    day_bucket(model.returned_on).label("day"),
+                    model.charge.label("charge"),
+                ).where(*ledger_range(model.returned_on, start))
+                for model in LEDGERS
+            )
+        ).subquery()
+
+        issues = dict(
+            db.session.execute(
+                select(issue_rows.c.day, func.count()).group_by(issue_rows.c.day)
+            ).all()
+        )
+        rows = db.session.execute(
+            select(
+                return_rows.c.day,
+                func.count(),
+                func.coalesce(func.sum(return_rows.c.charge), 0),
+            ).group_by(return_rows.c.day)
+        )
+        returns = {day: (returned, charged) for day, returned, charged in rows}
+
+    return [
+        (day, issues.get(day, 0), *returns.get(day, (0, 0)))
+        for day in (since + timedelta(days=offset) for offset in range(days))
+    ]
+
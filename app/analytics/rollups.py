@@ -0,0 +1,160 @@
+"""Incremental maintenance of the daily rollups.
+
+``daily_book_stats`` and ``daily_member_stats`` hold the issues, returns
+and charges of each day per book and per member. ``update_rollups``
+(``flask refresh-analytics``) reads only the transactions whose
+``updated_at`` moved past the stored watermark, collects the days they
+were issued or returned on, and recounts just those days from the
+transactions and the archive together. The whole run is one transaction,
+so readers never see a day half rebuilt and a failed run leaves the
+watermark where it was.
+"""
+from app import db
+from datetime import datetime, time, timedelta
+from sqlalchemy import and_, delete, func, insert, literal, select, union, union_all
+from ..cache import invalidate
+from ..models import DailyBookStats, DailyMemberStats, RollupWatermark
+from ..sql import day_bucket
+from .ledger import LEDGERS, ledger_range
+
+WATERMARK = "daily_stats"
+
+# rows written less than this long ago may belong to transactions that
+# have not committed yet; they are left for the next run
+SETTLE_TIME = timedelta(minutes=1)
+
+# days recounted per statement
+DAYS_PER_BATCH = 100
+
+# rollup table and the ledger column it is keyed on
+ROLLUPS = ((DailyBookStats, "book_id"), (DailyMemberStats, "member_id"))
+
+
+def day_range(column, days):
+    """Filters ledger rows to those whose column falls on some days.
+
+    The range comes first so the column's index can serve it.
+    """
+    return and_(
+        *ledger_range(
+            column,
+            datetime.combine(min(days), time.min),
+            datetime.combine(max(days) + timedelta(days=1), time.min),
+        ),
+        day_bucket(column).in_(days),
+    )
+
+
+def changed_days(low, high):
+    """Collects the days touched by ledger rows changed in a time range.
+
+    Args:
+        low (datetime): Start of the range, or None for the beginning.
+        high (datetime): End of the range, excluded.
+
+    Returns:
+        list: The days, sorted.
+    """
+    selects = []
+
+    for model in LEDGERS:
+        changed = [model.updated_at < high]
+        if low is not None:
+            changed.append(model.updated_at >= low)
+
+        selects.append(select(day_bucket(model.issued_on)).where(*changed))
+        selects.append(
+            select(day_bucket(model.returned_on)).where(
+                *changed, model.returned_on.is_not(None)
+            )
+        )
+
+    return sorted(
+        day for day in db.session.scalars(union(*selects)) if day is not None
+    )
+
+
+def ledger_events(key, days):
+    """Builds one row per issue and per return falling on some days.
+
+    Returns:
+        Subquery: Rows of (day, key, issues, returns, charges).
+    """
+    selects = []
+
+    for model in LEDGERS:
+        selects.append(
+            select(
+                day_bucket(model.issued_on).label("day"),
+                getattr(model, key).label("key"),
+                literal(1).label("issues"),
+                literal(0).label("returns"),
+                literal(0).label("charges"),
+            ).where(day_range(model.issued_on, days))
+        )
+        selects.append(
+            select(
+                day_bucket(model.returned_on),
+                getattr(model, key),
+                literal(0),
+                literal(1),
+                func.coalesce(model.charge, 0),
+            ).where(day_range(model.returned_on, days))
+        )
+
+    return union_all(*selects).subquery()
+
+
+def rebuild_days(days):
+    """Recounts the rollup rows of some days from the ledger."""
+    for rollup, key in ROLLUPS:
+        events = ledger_events(key, days)
+
+        db.session.execute(delete(rollup).where(rollup.day.in_(days)))
+        db.session.execute(
+            insert(rollup).from_select(
+                ["day", key, "issues", "returns", "charges"],
+                select(
+                    events.c.day,
+                    events.c.key,
+                    func.sum(events.c.issues),
+                    func.sum(events.c.returns),
+                    func.sum(events.c.charges),
+                ).group_by(events.c.day, events.c.key),
+            )
+        )
+
+
+def update_rollups(now, full=False):
+    """Brings the daily rollups up to date with the ledger.
+
+    Args:
+        now (datetime): The current time, naive UTC like ``updated_at``.
+        full (bool, optional): Whether to rebuild every day instead of
+            only the days changed since the watermark. Defaults to False.
+
+    Returns:
+        int: The number of days recounted.
+    """
+    high = now - SETTLE_TIME
+    mark = db.session.get(RollupWatermark, WATERMARK)
+
+    if full:
+        for rollup, _ in ROLLUPS:
+            db.session.execute(delete(rollup))
+
+    low = mark.watermark if mark is not None and not full else None
+    days = changed_days(low, high)
+
+    for start in range(0, len(days), DAYS_PER_BATCH):
+        rebuild_days(days[start : start + DAYS_PER_BATCH])
+
+    if mark is None:
+        db.session.add(RollupWatermark(name=WATERMARK, watermark=high))
+    else:
+        mark.watermark = high
+
+    db.session.commit()
+    invalidate("analytics")
+
+    return len(days)
@@ -0,0 +1,77 @@
+from app.analytics import analytics_bp
+from flask import jsonify, request
+from .reports import active_members, circulation, popular_books
+from ..cache import cached
+
+
+def report_args(default_days):
+    """Reads the days and limit arguments of a report request."""
+    return (
+        request.args.get("days", default=default_days, type=int),
+        request.args.get("limit", default=10, type=int),
+    )
+
+
+@analytics_bp.route("/popular_books", methods=["GET"])
+@cached("analytics", ttl_key="ANALYTICS_CACHE_TTL")
+def get_popular_books():
+    """Returns the most borrowed books of the last days (?days=7&limit=10).
+
+    Returns:
+        dict: Dictionary response message.
+    """
+    days, limit = report_args(7)
+
+    books = [
+        {
+            "book_id": row.book_id,
+            "title": row.title,
+            "author": row.author,
+            "issues": row.issues,
+        }
+        for row in popular_books(days, limit)
+    ]
+
+    return jsonify({"days": days, "books": books}), 200
+
+
+@analytics_bp.route("/active_members", methods=["GET"])
+@cached("analytics", ttl_key="ANALYTICS_CACHE_TTL")
+def get_active_members():
+    """Returns the members with the most loans of the last days.
+
+    Returns:
+        dict: Dictionary response message.
+    """
+    days, limit = report_args(7)
+
+    members = [
+        {"member_id": row.member_id, "name": row.name, "issues": row.issues}
+        for row in active_members(days, limit)
+    ]
+
+    return jsonify({"days": days, "members": members}), 200
+
+
+@analytics_bp.route("/circulation", methods=["GET"])
+@cached("analytics", ttl_key="ANALYTICS_CACHE_TTL")
+def get_circulation():
+    """Returns the loans issued, books returned and penalties charged on
+    each of the last days (?days=30).
+
+    Returns:
+        dict: Dictionary response message.
+    """
+    days = request.args.get("days", default=30, type=int)
+
+    circulation_list = [
+        {
+            "day": day.isoformat(),
+            "issues": issues,
+            "returns": returns,
+            "charges": charges,
+        }
+        for day, issues, returns, charges in circulation(days)
+    ]
+
+    return jsonify({"days": days, "circulation": circulation_list}), 200
@@ -1,14 +1,88 @@
 from app import db
 from app.books import books_bp
-from flask import request, jsonify
-from ..schema import BookSchema
+from flask import current_app, request, jsonify
+from ..schema import BookSchema, IdsQuerySchema
 from ..models import Book, Transaction
+from ..search import SEARCH_COLUMNS, deferred_search_index, search_books
+from ..suggest import get_suggest_index, normalize
+from ..pagination import InvalidCursor, paginate_request, uses_cursor
+from ..bulk import bulk_insert
+from ..export import export_response
+from ..cache import cached
+from ..versions import InvalidSince, changed_since, conditional, mark_changed
 
 from math import ceil
-from pydantic import ValidationError
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import select
+from sqlalchemy.orm.exc import StaleDataError
 
 book_error_dict = {"Error": "Could not find book"}
 
+book_list_adapter = TypeAdapter(list[BookSchema])
+
+MAX_SUGGESTIONS = 50
+
+
+def book_to_dict(book):
+    """Serializes a book for JSON responses.
+
+    Args:
+        book (Book): The book object.
+
+    Returns:
+        dict: The book data.
+    """
+    return {
+        "id": book.id,
+        "title": book.title,
+        "author": book.author,
+        "quantity": book.quantity,
+        "on_loan": book.on_loan,
+        "total_copies": book.total_copies,
+        "penalty_fee": book.penalty_fee,
+        "updated_at": book.updated_at.isoformat(),
+        "version": book.version,
+    }
+
+
+def book_conflict_response(book):
+    """Builds the response refusing an update of a book changed meanwhile.
+
+    Args:
+        book (Book): The book as currently stored.
+
+    Returns:
+        tuple: JSON response and status code.
+    """
+    return (
+        jsonify(
+            {
+                "Error": "Book was changed by another request",
+                "book": book_to_dict(book),
+            }
+        ),
+        409,
+    )
+
+
+def cursor_response(query):
+    """Builds a cursor-paginated response for a Book query.
+
+    Args:
+        query (Query): The Book query.
+
+    Returns:
+        tuple: JSON response and status code.
+    """
+    try:
+        books = paginate_request(query, Book.id)
+    except InvalidCursor as e:
+        return jsonify({"Error": str(e)}), 400
+
+    books_list = [book_to_dict(book) for book in books]
+
+    return jsonify(books.to_dict("books", books_list)), 200
+
 
 @books_bp.route("/hello", methods=["GET"])
 def hello_world():
@@ -40,7 +114,11 @@ def create_book():
         )
         # add book data to database
         db.session.add(book)
+        db.session.flush()
+        suggestion = (book.id, book.title, book.author)
+        mark_changed("books")
         db.session.commit()
+        get_suggest_index().put(*suggestion)
 
         return (
             jsonify(
@@ -60,94 +138,114 @@ def create_book():
         return jsonify({"Error": str(e)}), 500
 
 
-@books_bp.route("/get_by_title/<string:string>", methods=["GET"])
-def get_by_title(string):
-    """Gets books with a given title (in pages).
+def validate_books(books_data):
+    """Validates a list of books, keeping the valid ones.
 
     Args:
-        title (str): The title of the book.
+        books_data (list): Book dictionaries from the request.
 
     Returns:
-        list: a list of all books with the given title.
+        tuple: (list of (index, BookSchema) pairs, list of per-row errors)
     """
-    query_title = string.lower().replace("_", " ")
+    try:
+        return list(enumerate(book_list_adapter.validate_python(books_data))), []
+    except ValidationError as e:
+        row_errors = {}
+        for error in e.errors():
+            index, *loc = error["loc"]
+            row_errors.setdefault(index, []).append({**error, "loc": tuple(loc)})
+
+    valid_indexes = [i for i in range(len(books_data)) if i not in row_errors]
+    valid_books = book_list_adapter.validate_python(
+        [books_data[i] for i in valid_indexes]
+    )
+    errors = [
+        {"index": index, "Details": details}
+        for index, details in sorted(row_errors.items())
+    ]
 
-    page = request.args.get("page", default=1, type=int)
-    per_page = request.args.get("per_page", default=10, type=int)
+    return list(zip(valid_indexes, valid_books)), errors
 
-    books = Book.query.filter(Book.title.like(f"%{query_title}%")).paginate(
-        page=page, per_page=per_page
-    )
 
-    if books.total == 0:
-        return book_error_dict, 400
+@books_bp.route("/bulk_create", methods=["POST"])
+def bulk_create_books():
+    """Creates many books from a JSON array in one transaction.
 
-    total_pages = ceil(books.total / per_page)
+    Invalid rows are reported by their index in the array and skipped; the
+    valid rows are inserted in batches.
+
+    Returns:
+        dict: Number of books created and per-row validation errors.
+    """
+    books_data = request.get_json()
+
+    if not isinstance(books_data, list):
+        return jsonify({"Error": "Expected a JSON array of books"}), 400
+
+    valid_books, errors = validate_books(books_data)
+
+    if not valid_books:
+        return jsonify({"Error": "Validation failed", "Details": errors}), 400
 
-    books_list = [
+    rows = (
         {
-            "id": book.id,
-            "title": book.title,
-            "author": book.author,
+            "title": book.title.lower(),
+            "author": book.author.lower(),
             "quantity": book.quantity,
             "penalty_fee": book.penalty_fee,
         }
-        for book in books
-    ]
+        for _, book in valid_books
+    )
+
+    try:
+        with deferred_search_index():
+            created = bulk_insert(
+                Book, rows, current_app.config["BULK_INSERT_CHUNK_SIZE"]
+            )
+        mark_changed("books")
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"Error": str(e)}), 500
 
     return (
         jsonify(
             {
-                "total_books": books.total,
-                "total_pages": total_pages,
-                "pages": books.pages,
-                "current_page": page,
-                "books": books_list,
-                "per_page": per_page,
-                "has_next": books.has_next,
-                "has_prev": books.has_prev,
-                "next_page": books.next_num if books.has_next else None,
-                "prev_page": books.prev_num if books.has_prev else None,
+                "Message": "Books created succesfully",
+                "created": created,
+                "failed": len(errors),
+                "errors": errors,
             }
         ),
-        200,
+        201,
     )
 
 
-@books_bp.route("/get_by_author/<string:string>")
-def get_by_author(string):
-    """Gets a list of books from an author (in pages).
+def search_response(term, columns=SEARCH_COLUMNS):
+    """Runs a book search and builds the paginated response.
 
     Args:
-        title (str): title of the author.
+        term (str): The normalized search term.
+        columns (tuple): Book columns to search.
 
     Returns:
-        list: List of books.
+        tuple: JSON response and status code.
     """
-    query_author = string.lower().replace("_", " ")
+    if uses_cursor():
+        return cursor_response(search_books(term, columns))
 
     page = request.args.get("page", default=1, type=int)
     per_page = request.args.get("per_page", default=10, type=int)
 
-    books = Book.query.filter(Book.author.like(f"%{query_author}%")).paginate(
-        page=page, per_page=per_page
-    )
+    books = search_books(term, columns).paginate(page=page, per_page=per_page)
 
     if books.total == 0:
         return book_error_dict, 400
 
     total_pages = ceil(books.total / per_page)
 
-    books_list = [
-        {
-            "id": book.id,
-            "title": book.title,
-            "author": book.author,
-            "quantity": book.quantity,
-            "penalty_fee": book.penalty_fee,
-        }
-        for book in books
-    ]
+    books_list = [book_to_dict(book) for book in books]
 
     return (
         jsonify(
@@ -168,10 +266,90 @@ def get_by_author(string):
     )
 
 
+@books_bp.route("/search", methods=["GET"])
+@conditional("books")
+@cached("books")
+def search():
+    """Searches books by title and author, best matches first (in pages).
+
+    Returns:
+        dict: Pagination object with matching books as list.
+    """
+    term = request.args.get("q", default="", type=str).strip().lower()
+
+    if not term:
+        return jsonify({"Error": "Missing search query"}), 400
+
+    return search_response(term)
+
+
+@books_bp.route("/suggest", methods=["GET"])
+def suggest():
+    """Suggests books whose title or author starts with a prefix.
+
+    Served from the worker's in-memory index, for search boxes that ask on
+    every keystroke. ``limit`` defaults to 10, at most 50.
+
+    Returns:
+        dict: The prefix and the matching books.
+    """
+    prefix = request.args.get("prefix", default="", type=str)
+    limit = request.args.get("limit", default=10, type=int)
+
+    if not normalize(prefix):
+        return jsonify({"Error": "Missing prefix"}), 400
+
+    limit = min(max(limit, 1), MAX_SUGGESTIONS)
+
+    suggestions = [
+        {"id": book_id, "title": title, "author": author}
+        for book_id, title, author in get_suggest_index().suggest(prefix, limit)
+    ]
+
+    return jsonify({"prefix": prefix, "suggestions": suggestions}), 200
+
+
+@books_bp.route("/get_by_title/<string:string>", methods=["GET"])
+@conditional("books")
+@cached("books")
+def get_by_title(string):
+    """Gets books with a given title (in pages).
+
+    Args:
+        title (str): The title of the book.
+
+    Returns:
+        list: a list of all books with the given title.
+    """
+    query_title = string.lower().replace("_", " ")
+
+    return search_response(query_title, columns=("title",))
+
+
+@books_bp.route("/get_by_author/<string:string>")
+@conditional("books")
+@cached("books")
+def get_by_author(string):
+    """Gets a list of books from an author (in pages).
+
+    Args:
+        title (str): title of the author.
+
+    Returns:
+        list: List of books.
+    """
+    query_author = string.lower().replace("_", " ")
+
+    return search_response(query_author, columns=("author",))
+
+
 @books_bp.route("/update/<int:book_id>", methods=["PUT"])
 def update_book(book_id):
     """Updates the details of a book object.
 
+    Send the ``version`` last read to have the update refused with 409 if
+    the book was changed since.
+
     Args:
         book_id (int): The book's id.
 
@@ -185,6 +363,11 @@ def update_book(book_id):
     if book is None:
         return book_error_dict, 400
 
+    expected_version = book_data.pop("version", None)
+
+    if expected_version is not None and expected_version != book.version:
+        return book_conflict_response(book)
+
     try:
         book_schema = BookSchema(**book_data)
 
@@ -193,13 +376,16 @@ def update_book(book_id):
         book.quantity = book_schema.quantity
         book.penalty_fee = book_schema.penalty_fee
 
+        mark_changed("books")
         db.session.commit()
+        get_suggest_index().put(book_id, book_schema.title, book_schema.author)
 
         return (
             jsonify(
                 {
                     "Message": "Book updated successfully",
                     "New book": book_schema.model_dump(),
+                    "version": book.version,
                 }
             ),
             200,
@@ -208,6 +394,16 @@ def update_book(book_id):
     except ValidationError as e:
         return jsonify({"Error": "Validation failed.", "Details": e.errors()}), 400
 
+    except StaleDataError:
+        # changed by another request between our read and our write
+        db.session.rollback()
+        book = db.session.get(Book, book_id)
+
+        if book is None:
+            return book_error_dict, 400
+
+        return book_conflict_response(book)
+
 
 @books_bp.route("/delete/<int:book_id>", methods=["DELETE"])
 def delete_book(book_id):
@@ -233,7 +429,9 @@ def delete_book(book_id):
             return jsonify({"Error": "Book has pending transactions"}), 400
 
         db.session.delete(book_to_delete)
+        mark_changed("books", "transactions")
         db.session.commit()
+        get_suggest_index().remove(book_id)
 
         return jsonify({"Message": "Deletion succesfull!"}), 200
 
@@ -244,29 +442,34 @@ def delete_book(book_id):
 
 
 @books_bp.route("/get_books", methods=["GET"])
+@conditional("books")
+@cached("books")
 def get_books():
     """Gets book objects in pages.
 
+    Pass ``cursor`` (empty for the first page) instead of ``page`` to use
+    keyset pagination; ``with_total=false`` skips the total count.
+    ``since`` keeps only books changed at or after a timestamp.
+
     Returns:
         dict: Pagination object with book data as list.
     """
+    try:
+        query = changed_since(Book.query, Book.updated_at)
+    except InvalidSince as e:
+        return jsonify({"Error": str(e)}), 400
+
+    if uses_cursor():
+        return cursor_response(query)
+
     page = request.args.get("page", default=1, type=int)
     per_page = request.args.get("per_page", default=10, type=int)
 
-    books = Book.query.paginate(page=page, per_page=per_page)
+    books = query.paginate(page=page, per_page=per_page)
 
     total_pages = ceil(books.total / per_page)
 
-    books_list = [
-        {
-            "id": book.id,
-            "title": book.title,
-            "author": book.author,
-            "quantity": book.quantity,
-            "penalty_fee": book.penalty_fee,
-        }
-        for book in books
-    ]
+    books_list = [book_to_dict(book) for book in books]
 
     return (
         jsonify(
@@ -288,6 +491,8 @@ def get_books():
 
 
 @books_bp.route("/get_by_id/<int:book_id>", methods=["GET"])
+@conditional("books")
+@cached("books")
 def get_by_id(book_id):
     """Gets a book by its id.
 
@@ -302,15 +507,52 @@ def get_by_id(book_id):
     if book is None:
         return book_error_dict, 400
 
+    return jsonify(book_to_dict(book)), 200
+
+
+@books_bp.route("/get_many", methods=["GET"])
+@conditional("books")
+@cached("books")
+def get_many():
+    """Gets several books by id in one query (?ids=1,2,3).
+
+    Books come back in the order their ids were asked for; ids without a
+    book are listed under ``missing``.
+
+    Returns:
+        dict: The books found and the missing ids.
+    """
+    try:
+        ids = IdsQuerySchema(ids=request.args.getlist("ids")).ids
+    except ValidationError as e:
+        return jsonify({"Error": "Validation failed", "Details": e.errors()}), 400
+
+    ids = list(dict.fromkeys(ids))
+    books = {
+        book.id: book
+        for book in db.session.scalars(select(Book).where(Book.id.in_(ids)))
+    }
+
     return (
         jsonify(
             {
-                "id": book.id,
-                "title": book.title,
-                "author": book.author,
-                "quantity": book.quantity,
-                "penalty_fee": book.penalty_fee,
+                "books": [book_to_dict(books[i]) for i in ids if i in books],
+                "missing": [i for i in ids if i not in books],
             }
         ),
         200,
     )
+
+
+@books_bp.route("/export", methods=["GET"])
+def export_books():
+    """Streams every book as NDJSON or CSV (?format=ndjson|csv).
+
+    Returns:
+        Response: The streamed export.
+    """
+    query = db.session.query(
+        Book.id, Book.title, Book.author, Book.quantity, Book.penalty_fee
+    ).order_by(Book.id)
+
+    return export_response(query, "books")
@@ -0,0 +1,45 @@
+"""Batched inserts for bulk loads.
+
+Rows are written with Core ``INSERT`` statements, one ``executemany`` per
+chunk, instead of one ORM object and flush per row. Callers own the
+transaction and commit once at the end.
+"""
+from app import db
+from itertools import islice
+from sqlalchemy import insert
+
+
+def chunked(iterable, size):
+    """Splits an iterable into lists of at most size items.
+
+    Args:
+        iterable (iterable): The items to split.
+        size (int): The chunk size.
+
+    Yields:
+        list: The next chunk.
+    """
+    iterator = iter(iterable)
+
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def bulk_insert(model, rows, chunk_size):
+    """Inserts rows in chunks using executemany.
+
+    Args:
+        model (db.Model): The model whose table receives the rows.
+        rows (iterable): Dictionaries of column values.
+        chunk_size (int): Rows per INSERT statement.
+
+    Returns:
+        int: The number of rows inserted.
+    """
+    inserted = 0
+
+    for chunk in chunked(rows, chunk_size):
+        db.session.execute(insert(model), chunk)
+        inserted += len(chunk)
+
+    return inserted
@@ -0,0 +1,312 @@
+"""Read-through response cache.
+
+GET responses of the lookup endpoints are cached per namespace ("books",
+"members") under the request path and its sorted query arguments. Every
+namespace has a generation token that is part of each key; invalidating a
+namespace replaces the token, so all of its entries stop matching at once
+and age out of the backend on their own.
+
+``CACHE_BACKEND`` selects the backend:
+
+* ``memory``: an LRU dict with a TTL, private to each worker process.
+* ``filesystem``: one file per entry under ``CACHE_DIR``, shared by every
+  worker on the host, so an invalidation in one worker is seen by all.
+  Entries orphaned by an invalidation are never read again, so every
+  tenth of ``CACHE_MAX_ENTRIES`` writes the directory is counted, and
+  when it holds more files than that, the expired ones and then the
+  oldest are swept out until it is 90% full.
+* ``null``: caching disabled.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from collections import OrderedDict
+from flask import Response, current_app, request
+from functools import wraps
+
+
+class NullCache:
+    """Cache backend that stores nothing."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+
+class MemoryCache:
+    """In-process LRU cache with per-entry expiry.
+
+    Args:
+        max_entries (int): Entries kept before the least recently used
+            one is evicted.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            expires, value = entry
+            if expires is not None and expires <= time.monotonic():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + ttl if ttl else None
+
+        with self.lock:
+            self.entries[key] = (expires, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+class FileSystemCache:
+    """Cache backend storing one file per entry in a directory.
+
+    A file holds a JSON header line with the expiry, then the value. A
+    cached response keeps its status and mimetype in the header and its
+    body as raw bytes; any other value must be JSON serializable.
+
+    Args:
+        directory (str): Directory holding the entries; created, private
+            to the current user, if needed.
+        max_entries (int): Files kept before writes start pruning.
+    """
+
+    SUFFIX = ".cache"
+    # share of max_entries a prune leaves, so the next one is many
+    # writes away
+    PRUNE_TO = 0.9
+
+    def __init__(self, directory, max_entries=1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        # writes between two counts of the directory
+        self.check_every = max(1, max_entries // 10)
+        self.writes = 0
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(
+            self.directory, hashlib.sha1(key.encode()).hexdigest() + self.SUFFIX
+        )
+
+    @staticmethod
+    def read_header(file):
+        header = json.loads(file.readline())
+        return header["expires"], header
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "rb") as file:
+                expires, header = self.read_header(file)
+                body = file.read()
+        except (OSError, ValueError, KeyError):
+            return None
+
+        if expires is not None and expires <= time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        if "status" in header:
+            return body, header["status"], header["mimetype"]
+
+        return header["value"]
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + ttl if ttl else None
+
+        if isinstance(value, tuple):
+            body, status, mimetype = value
+            header = {"expires": expires, "status": status, "mimetype": mimetype}
+        else:
+            body = b""
+            header = {"expires": expires, "value": value}
+
+        # write then rename so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "wb") as file:
+            file.write(json.dumps(header).encode() + b"\n")
+            file.write(body)
+        os.replace(temp_path, self.path(key))
+
+        self.writes += 1
+        if self.writes >= self.check_every:
+            self.writes = 0
+            self.prune()
+
+    def prune(self):
+        """Deletes expired entries, then the oldest expiring ones, down to
+        PRUNE_TO of max_entries once the directory holds more than
+        max_entries files.
+
+        Entries without an expiry (the generation tokens) are kept.
+        """
+        with os.scandir(self.directory) as scan:
+            paths = [entry.path for entry in scan if entry.name.endswith(self.SUFFIX)]
+
+        if len(paths) <= self.max_entries:
+            return
+
+        now = time.time()
+        stale = []
+        expiring = []
+
+        for path in paths:
+            try:
+                with open(path, "rb") as file:
+                    expires, _ = self.read_header(file)
+            except OSError:
+                continue
+            except (ValueError, KeyError):
+                expires = now
+
+            if expires is None:
+                continue
+            if expires <= now:
+                stale.append(path)
+            else:
+                expiring.append((expires, path))
+
+        excess = len(paths) - len(stale) - int(self.max_entries * self.PRUNE_TO)
+        if excess > 0:
+            # the entries closest to expiring go first
+            stale.extend(path for _, path in sorted(expiring)[:excess])
+
+        for path in stale:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+CACHE_BACKENDS = {
+    "null": lambda config: NullCache(),
+    "memory": lambda config: MemoryCache(config["CACHE_MAX_ENTRIES"]),
+    "filesystem": lambda config: FileSystemCache(
+        config["CACHE_DIR"], config["CACHE_MAX_ENTRIES"]
+    ),
+}
+
+
+def init_cache(app):
+    """Creates the configured cache backend for the app.
+
+    Args:
+        app (Flask): The Flask application.
+    """
+    backend = app.config["CACHE_BACKEND"]
+
+    if backend not in CACHE_BACKENDS:
+        raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
+
+    if not app.config["CACHE_DIR"]:
+        app.config["CACHE_DIR"] = os.path.join(app.instance_path, "cache")
+
+    app.extensions["cache"] = CACHE_BACKENDS[backend](app.config)
+
+
+def get_cache():
+    """Returns the cache backend of the current app."""
+    return current_app.extensions["cache"]
+
+
+def generation(namespace):
+    """Returns the current generation token of a namespace.
+
+    A missing token (never set, or evicted) is replaced by a new one, which
+    can only cause misses, never stale hits.
+    """
+    cache = get_cache()
+    key = f"generation:{namespace}"
+    token = cache.get(key)
+
+    if token is None:
+        token = uuid.uuid4().hex
+        cache.set(key, token)
+
+    return token
+
+
+def invalidate(*namespaces):
+    """Drops every cached response of the given namespaces.
+
+    Args:
+        *namespaces (str): The namespaces to invalidate.
+    """
+    cache = get_cache()
+    for namespace in namespaces:
+        cache.set(f"generation:{namespace}", uuid.uuid4().hex)
+
+
+def request_key(namespace):
+    """Builds the cache key of the current request."""
+    args = "&".join(
+        f"{name}={value}" for name, value in sorted(request.args.items(multi=True))
+    )
+
+    return f"{namespace}:{generation(namespace)}:{request.path}?{args}"
+
+
+def cached(namespace, ttl_key="CACHE_DEFAULT_TTL"):
+    """Caches the successful responses of a GET view.
+
+    Only 200 responses are stored, for as many seconds as the ``ttl_key``
+    setting says. The ``X-Cache`` header tells whether a response came
+    from the cache.
+
+    Args:
+        namespace (str): The namespace invalidated when the data changes.
+        ttl_key (str, optional): Config key of the time to live. Defaults
+            to CACHE_DEFAULT_TTL.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_cache()
+            key = request_key(namespace)
+            hit = cache.get(key)
+
+            if hit is not None:
+                body, status, mimetype = hit
+                response = Response(body, status=status, mimetype=mimetype)
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+            response = current_app.make_response(view(*args, **kwargs))
+
+            if response.status_code == 200 and not response.is_streamed:
+                cache.set(
+                    key,
+                    (response.get_data(), response.status_code, response.mimetype),
+                    current_app.config[ttl_key],
+                )
+
+            response.headers["X-Cache"] = "MISS"
+            return response
+
+        return wrapper
+
+    return decorator
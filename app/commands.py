@@ -0,0 +1,248 @@
+"""Flask CLI commands."""
+import click
+import csv
+import json
+import time
+
+from app import db
+from contextlib import nullcontext
+from datetime import datetime
+from flask import current_app
+from flask.cli import with_appcontext
+from pydantic import ValidationError
+from .analytics.rollups import update_rollups
+from .bulk import bulk_insert, chunked
+from .idempotency import purge_expired_keys
+from .utils import utcnow
+from .versions import mark_changed
+from .models import Book, Member
+from .schema import BookSchema, MemberSchema
+from .search import deferred_search_index
+from .transactions.archive import archive_transactions
+from .transactions.counters import counter_drift, fix_drift
+from .transactions.penalties import sweep_penalties
+
+# model, row schema, schema to column values, context wrapping each batch
+IMPORTERS = {
+    "books": (
+        Book,
+        BookSchema,
+        lambda book: {
+            "title": book.title.lower(),
+            "author": book.author.lower(),
+            "quantity": book.quantity,
+            "penalty_fee": book.penalty_fee,
+        },
+        deferred_search_index,
+    ),
+    "members": (
+        Member,
+        MemberSchema,
+        lambda member: {
+            "name": member.name,
+            "debt": member.debt,
+            "books_borrowed": member.books_borrowed,
+        },
+        nullcontext,
+    ),
+}
+
+# validation errors printed before the rest are only counted
+MAX_REPORTED_ERRORS = 20
+
+
+def read_records(file, file_format):
+    """Yields (line number, record) pairs from a CSV or NDJSON file.
+
+    CSV records are dicts; empty cells are dropped so schema defaults
+    apply. NDJSON records are the raw lines, parsed by the caller so a
+    malformed line can be rejected on its own.
+    """
+    if file_format == "csv":
+        reader = csv.DictReader(file)
+        for record in reader:
+            yield reader.line_num, {k: v for k, v in record.items() if v != ""}
+        return
+
+    for line_number, line in enumerate(file, start=1):
+        if line.strip():
+            yield line_number, line
+
+
+@click.command("import")
+@click.argument("kind", type=click.Choice(sorted(IMPORTERS)))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--format",
+    "file_format",
+    type=click.Choice(["csv", "ndjson"]),
+    help="File format. Defaults to the file extension.",
+)
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    help="Rows per INSERT and commit. Defaults to BULK_INSERT_CHUNK_SIZE.",
+)
+@with_appcontext
+def import_command(kind, path, file_format, batch_size):
+    """Bulk load books or members from a CSV or NDJSON file."""
+    model, schema, to_row, batch_context = IMPORTERS[kind]
+    file_format = file_format or ("csv" if path.endswith(".csv") else "ndjson")
+    batch_size = batch_size or current_app.config["BULK_INSERT_CHUNK_SIZE"]
+
+    imported = failed = 0
+    started = time.perf_counter()
+
+    def reject(line_number, error):
+        nonlocal failed
+        failed += 1
+        if failed <= MAX_REPORTED_ERRORS:
+            click.echo(f"line {line_number}: {error}", err=True)
+
+    def valid_rows(records):
+        for line_number, record in records:
+            try:
+                if isinstance(record, str):
+                    record = json.loads(record)
+                yield to_row(schema.model_validate(record))
+            except json.JSONDecodeError as e:
+                reject(line_number, f"invalid JSON: {e}")
+            except ValidationError as e:
+                reject(line_number, e.errors())
+
+    with open(path, newline="") as file:
+        rows = valid_rows(read_records(file, file_format))
+
+        for batch in chunked(rows, batch_size):
+            with batch_context():
+                imported += bulk_insert(model, batch, batch_size)
+            mark_changed(kind)
+            db.session.commit()
+
+            elapsed = time.perf_counter() - started
+            click.echo(
+                f"{imported} {kind} imported ({imported / elapsed:.0f} rows/s)"
+            )
+
+    elapsed = time.perf_counter() - started
+    click.echo(
+        f"Done: {imported} {kind} imported, {failed} rejected in {elapsed:.1f}s"
+    )
+
+
+@click.command("purge-idempotency-keys")
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    default=1000,
+    show_default=True,
+    help="Keys deleted per statement and commit.",
+)
+@with_appcontext
+def purge_idempotency_keys_command(batch_size):
+    """Delete stored Idempotency-Key responses older than IDEMPOTENCY_KEY_TTL."""
+    deleted = purge_expired_keys(batch_size)
+    click.echo(f"{deleted} expired idempotency keys deleted")
+
+
+@click.command("sweep-penalties")
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    default=10000,
+    show_default=True,
+    help="Transaction ids covered per statement and commit.",
+)
+@with_appcontext
+def sweep_penalties_command(batch_size):
+    """Charge the penalties of overdue open loans to the members' debt."""
+    started = time.perf_counter()
+
+    def progress(last_id, updated):
+        click.echo(f"up to transaction {last_id}: {updated} loans updated")
+
+    updated = sweep_penalties(batch_size, datetime.now(), progress)
+
+    elapsed = time.perf_counter() - started
+    click.echo(f"Done: {updated} loans updated in {elapsed:.1f}s")
+
+
+@click.command("archive-transactions")
+@click.option(
+    "--days",
+    type=click.IntRange(min=0),
+    default=365,
+    show_default=True,
+    help="Archive transactions returned more than this many days ago.",
+)
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    default=5000,
+    show_default=True,
+    help="Transactions moved per statement and commit.",
+)
+@with_appcontext
+def archive_transactions_command(days, batch_size):
+    """Move old returned transactions to the transactions_archive table."""
+    started = time.perf_counter()
+
+    def progress(moved):
+        click.echo(f"{moved} transactions archived")
+
+    moved = archive_transactions(days, batch_size, datetime.now(), progress)
+
+    elapsed = time.perf_counter() - started
+    click.echo(f"Done: {moved} transactions archived in {elapsed:.1f}s")
+
+
+@click.command("reconcile")
+@click.option("--fix", is_flag=True, help="Write the recounted values back.")
+@with_appcontext
+def reconcile_command(fix):
+    """Check the loan counters of books and members against the ledger."""
+    drift = counter_drift()
+
+    for name, rows in drift.items():
+        for row_id, stored, counted in rows[:MAX_REPORTED_ERRORS]:
+            click.echo(f"{name} {row_id}: counter {stored}, ledger {counted}")
+
+        if len(rows) > MAX_REPORTED_ERRORS:
+            click.echo(f"... and {len(rows) - MAX_REPORTED_ERRORS} more {name}")
+
+    click.echo(
+        f"{len(drift['books'])} books and {len(drift['members'])} members drifted"
+    )
+
+    if fix and any(drift.values()):
+        fix_drift(drift)
+        click.echo("Counters fixed")
+
+
+@click.command("refresh-analytics")
+@click.option(
+    "--full", is_flag=True, help="Rebuild every day, not only the changed ones."
+)
+@with_appcontext
+def refresh_analytics_command(full):
+    """Update the daily rollups read by the analytics endpoints."""
+    started = time.perf_counter()
+
+    days = update_rollups(utcnow(), full)
+
+    elapsed = time.perf_counter() - started
+    click.echo(f"Done: {days} days recounted in {elapsed:.1f}s")
+
+
+def register_commands(app):
+    """Registers the CLI commands on the app.
+
+    Args:
+        app (Flask): The Flask application.
+    """
+    app.cli.add_command(import_command)
+    app.cli.add_command(purge_idempotency_keys_command)
+    app.cli.add_command(sweep_penalties_command)
+    app.cli.add_command(archive_transactions_command)
+    app.cli.add_command(reconcile_command)
+    app.cli.add_command(refresh_analytics_command)
@@ -3,15 +3,91 @@ import os
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 
+def engine_options(
+    uri, pool_size, max_overflow, pool_recycle, pool_pre_ping, statement_timeout
+):
+    """Builds SQLALCHEMY_ENGINE_OPTIONS for a database URI.
+
+    Each default can be overridden with the matching DB_* environment
+    variable. SQLite keeps SQLAlchemy's own pool settings.
+
+    Args:
+        uri (str): The database URI.
+        pool_size (int): Connections kept open per worker.
+        max_overflow (int): Extra connections allowed under load.
+        pool_recycle (int): Seconds before a connection is replaced.
+        pool_pre_ping (bool): Whether to test connections on checkout.
+        statement_timeout (int): Milliseconds before a statement is
+            cancelled, 0 for no limit.
+
+    Returns:
+        dict: Engine options.
+    """
+    if uri.startswith("sqlite"):
+        return {}
+
+    options = {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", pool_size)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", max_overflow)),
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", pool_recycle)),
+        "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", str(pool_pre_ping))
+        .lower()
+        in ("true", "1", "yes"),
+    }
+
+    timeout = int(os.environ.get("DB_STATEMENT_TIMEOUT", statement_timeout))
+
+    if timeout and uri.startswith("postgresql"):
+        options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    elif timeout and uri.startswith("mysql"):
+        options["connect_args"] = {
+            "init_command": f"SET SESSION max_execution_time={timeout}"
+        }
+
+    return options
+
+
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY") or "AbrAcadabr@"
+    BULK_INSERT_CHUNK_SIZE = int(os.environ.get("BULK_INSERT_CHUNK_SIZE", 1000))
+    EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 1000))
+    # requests slower than this are logged with their slowest statement
+    SLOW_REQUEST_THRESHOLD_MS = float(os.environ.get("SLOW_REQUEST_THRESHOLD_MS", 500))
+    # PRAGMA name -> value, applied to every new SQLite connection
+    SQLITE_PRAGMAS = {}
+    # response cache of the book and member lookups: memory, filesystem or null
+    CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+    CACHE_DEFAULT_TTL = int(os.environ.get("CACHE_DEFAULT_TTL", 60))
+    CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 1024))
+    # filesystem cache directory; defaults to "cache" in the instance folder
+    CACHE_DIR = os.environ.get("CACHE_DIR")
+    # seconds a stored Idempotency-Key response is replayed for
+    IDEMPOTENCY_KEY_TTL = int(os.environ.get("IDEMPOTENCY_KEY_TTL", 24 * 3600))
+    # seconds after which a key still without a response counts as abandoned
+    IDEMPOTENCY_KEY_LEASE = int(os.environ.get("IDEMPOTENCY_KEY_LEASE", 30))
+    # analytics read the transactions ledger or the daily rollups kept by
+    # flask refresh-analytics; their responses are cached briefly
+    ANALYTICS_SOURCE = os.environ.get("ANALYTICS_SOURCE", "ledger")
+    ANALYTICS_CACHE_TTL = int(os.environ.get("ANALYTICS_CACHE_TTL", 30))
+    # title/author keys in each worker's suggestion index, two per book
+    SUGGEST_MAX_ENTRIES = int(os.environ.get("SUGGEST_MAX_ENTRIES", 2_000_000))
+    SUGGEST_REFRESH_SECONDS = float(os.environ.get("SUGGEST_REFRESH_SECONDS", 5))
 
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    SQLITE_PRAGMAS = {"busy_timeout": 5000}
     SQLALCHEMY_DATABASE_URI = os.environ.get(
         "DEV_DATABASE_URL"
     ) or "sqlite:///" + os.path.join(basedir, "data-dev.sqlite")
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(
+        SQLALCHEMY_DATABASE_URI,
+        pool_size=5,
+        max_overflow=5,
+        pool_recycle=1800,
+        pool_pre_ping=True,
+        statement_timeout=0,
+    )
 
 
 class ProductionConfig(Config):
@@ -20,12 +96,41 @@ class ProductionConfig(Config):
     SQLALCHEMY_DATABASE_URI = os.environ.get(
         "DATABASE_URL"
     ) or "sqlite:///" + os.path.join(basedir, "data.sqlite")
+    # per gunicorn worker; recycle below typical server idle timeouts and
+    # ping on checkout so workers survive a database restart
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(
+        SQLALCHEMY_DATABASE_URI,
+        pool_size=10,
+        max_overflow=20,
+        pool_recycle=1800,
+        pool_pre_ping=True,
+        statement_timeout=30000,
+    )
+    # WAL lets the gunicorn workers read while one of them writes; NORMAL
+    # sync is durable across application crashes in WAL mode
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000)),
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,  # KiB
+    }
+    # shared by the gunicorn workers, so invalidations reach all of them
+    CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "filesystem")
 
 
 class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = os.environ.get(
         "TEST_DATABASE_URL"
     ) or "sqlite:///" + os.path.join(basedir, "data-test.sqlite")
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(
+        SQLALCHEMY_DATABASE_URI,
+        pool_size=5,
+        max_overflow=10,
+        pool_recycle=-1,
+        pool_pre_ping=False,
+        statement_timeout=0,
+    )
 
 
 config = {
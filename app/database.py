@@ -0,0 +1,58 @@
+"""Engine-level database setup."""
+from app import db
+from sqlalchemy import event
+
+
+def apply_sqlite_pragmas(app):
+    """Runs the configured PRAGMA statements on every new SQLite connection.
+
+    ``SQLITE_PRAGMAS`` maps pragma names to values, e.g.
+    ``{"journal_mode": "WAL", "busy_timeout": 5000}``. Nothing is done for
+    other databases or when the mapping is empty.
+
+    Args:
+        app (Flask): The Flask application.
+    """
+    pragmas = app.config.get("SQLITE_PRAGMAS")
+
+    if not pragmas:
+        return
+
+    with app.app_context():
+        engine = db.engine
+
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+
+def pool_status(engine):
+    """Reports connection pool utilisation for monitoring.
+
+    Args:
+        engine (Engine): The SQLAlchemy engine.
+
+    Returns:
+        dict: Pool class and, for queue pools, size, connections checked
+        in and out, and overflow in use.
+    """
+    pool = engine.pool
+    status = {"pool": type(pool).__name__}
+
+    if hasattr(pool, "checkedout"):
+        status.update(
+            {
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+            }
+        )
+
+    return status
@@ -0,0 +1,90 @@
+"""Streaming NDJSON/CSV exports.
+
+Rows are read through a server-side cursor (``yield_per``) and written to
+the response from a generator, so an export holds one batch in memory no
+matter how large the table is.
+"""
+import csv
+import io
+import json
+
+from datetime import datetime
+from flask import Response, current_app, request, stream_with_context
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def to_json_value(value):
+    """Converts a column value to something json.dumps accepts."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+
+    return value
+
+
+def ndjson_lines(fields, rows):
+    """Yields one JSON object per row."""
+    for row in rows:
+        yield json.dumps(dict(zip(fields, map(to_json_value, row)))) + "\n"
+
+
+def csv_lines(fields, rows):
+    """Yields a CSV header line followed by one line per row."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow(to_json_value(value) for value in row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_response(query, name):
+    """Streams the rows of a column query as NDJSON or CSV.
+
+    The format comes from the ``format`` request argument (default ndjson).
+
+    Args:
+        query (Query): A query selecting the columns to export.
+        name (str): Base name of the downloaded file.
+
+    Returns:
+        Response: The streaming response, or an error tuple.
+    """
+    export_format = request.args.get("format", default="ndjson", type=str).lower()
+
+    if export_format not in EXPORT_FORMATS:
+        return {"Error": f"Unsupported export format: {export_format}"}, 400
+
+    fields = [column["name"] for column in query.column_descriptions]
+    batch_size = current_app.config["EXPORT_BATCH_SIZE"]
+    lines = ndjson_lines if export_format == "ndjson" else csv_lines
+
+    def generate():
+        rows = query.yield_per(batch_size)
+        batch = []
+
+        for line in lines(fields, rows):
+            batch.append(line)
+            if len(batch) >= batch_size:
+                yield "".join(batch)
+                batch = []
+
+        if batch:
+            yield "".join(batch)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={
+            "Content-Disposition": f"attachment; filename={name}.{export_format}"
+        },
+    )
@@ -0,0 +1,258 @@
+"""Idempotency keys for the issue and return endpoints.
+
+A client may send an ``Idempotency-Key`` header with a POST. The first
+request with a key reserves it in ``idempotency_keys``. The view's
+changes are committed here, in one transaction with the response stored
+on that row, so a response is stored exactly when the operation was
+recorded. Retries with the same key are answered from that row, found by
+its primary key, without running the transaction logic again. That way a
+retried return can never charge twice.
+
+Reusing a key with a different body gets 422. A retry that arrives while
+the first request is still running gets 409. A reservation left without
+a response for ``IDEMPOTENCY_KEY_LEASE`` seconds belongs to a request
+that failed or a worker that died, and the next retry takes it over; the
+response is only stored while the reservation, identified by a random
+token, is still the request's own, so a request outliving its lease is
+rolled back. Responses with a 5xx status are not stored, so those
+requests can be retried. Keys expire after ``IDEMPOTENCY_KEY_TTL``
+seconds, and ``flask purge-idempotency-keys`` deletes expired keys.
+"""
+import hashlib
+import uuid
+
+from app import db
+from datetime import timedelta
+from flask import Response, current_app, jsonify, request
+from functools import wraps
+from sqlalchemy import bindparam, delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from .models import IdempotencyKey
+from .utils import utcnow
+
+MAX_KEY_LENGTH = 255
+
+
+def expiry_cutoff():
+    """Returns the creation time before which keys have expired."""
+    return utcnow() - timedelta(seconds=current_app.config["IDEMPOTENCY_KEY_TTL"])
+
+
+def lease_cutoff():
+    """Returns the reservation time before which a running request is
+    taken as abandoned."""
+    return utcnow() - timedelta(seconds=current_app.config["IDEMPOTENCY_KEY_LEASE"])
+
+
+def find_key(key, endpoint):
+    """Loads the unexpired record of a key, or None."""
+    record = db.session.get(IdempotencyKey, (key, endpoint))
+
+    if record is None or record.created_at < expiry_cutoff():
+        return None
+
+    return record
+
+
+def abandoned(record):
+    """Tells whether a record is a reservation whose request never finished."""
+    return record.status_code is None and record.created_at < lease_cutoff()
+
+
+def reserve_key(key, endpoint, request_hash):
+    """Claims a key for the current request.
+
+    Expired keys and abandoned reservations are replaced.
+
+    Returns:
+        str: A random token identifying the reservation, or None if
+        another request holds the key already.
+    """
+    key_filter = (IdempotencyKey.key == key, IdempotencyKey.endpoint == endpoint)
+    token = uuid.uuid4().hex
+
+    try:
+        db.session.execute(
+            delete(IdempotencyKey).where(
+                *key_filter,
+                or_(
+                    IdempotencyKey.created_at < expiry_cutoff(),
+                    (IdempotencyKey.status_code.is_(None))
+                    & (IdempotencyKey.created_at < lease_cutoff()),
+                ),
+            )
+        )
+        db.session.execute(
+            insert(IdempotencyKey).values(
+                key=key,
+                endpoint=endpoint,
+                request_hash=request_hash,
+                token=token,
+            )
+        )
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return None
+
+    return token
+
+
+def release_key(key_filter, token):
+    """Drops a reservation so the request can be retried.
+
+    Failing here is not fatal: the reservation is then abandoned and
+    taken over once its lease runs out.
+    """
+    try:
+        db.session.execute(
+            delete(IdempotencyKey).where(*key_filter, IdempotencyKey.token == token)
+        )
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+
+
+def replay(record, request_hash):
+    """Answers a retried request from its stored record."""
+    if record is not None and record.request_hash != request_hash:
+        return (
+            jsonify({"Error": "Idempotency-Key was used for a different request"}),
+            422,
+        )
+
+    if record is None or record.status_code is None:
+        return (
+            jsonify({"Error": "A request with this Idempotency-Key is running"}),
+            409,
+        )
+
+    response = Response(
+        record.body, status=record.status_code, content_type=record.content_type
+    )
+    response.headers["Idempotent-Replayed"] = "true"
+
+    return response
+
+
+def commit_response(rv):
+    """Commits the changes of a view run without a key, unless it failed."""
+    response = current_app.make_response(rv)
+
+    try:
+        if response.status_code >= 500:
+            db.session.rollback()
+        else:
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return response
+
+
+def idempotent(view):
+    """Makes a POST view replay its response for a repeated Idempotency-Key.
+
+    The view leaves its changes uncommitted; they are committed here once
+    the response is built, with the response when the request has a key.
+    Responses with a 5xx status are rolled back.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+
+        if key is None:
+            return commit_response(view(*args, **kwargs))
+
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return jsonify({"Error": "Invalid Idempotency-Key"}), 400
+
+        endpoint = request.endpoint
+        request_hash = hashlib.sha256(request.get_data()).hexdigest()
+        key_filter = (IdempotencyKey.key == key, IdempotencyKey.endpoint == endpoint)
+
+        record = find_key(key, endpoint)
+
+        if record is not None and not abandoned(record):
+            return replay(record, request_hash)
+
+        token = reserve_key(key, endpoint, request_hash)
+
+        if token is None:
+            return replay(find_key(key, endpoint), request_hash)
+
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+
+            if response.status_code >= 500:
+                db.session.rollback()
+                release_key(key_filter, token)
+                return response
+
+            stored = db.session.execute(
+                update(IdempotencyKey)
+                .where(
+                    *key_filter,
+                    IdempotencyKey.token == token,
+                    IdempotencyKey.status_code.is_(None),
+                )
+                .values(
+                    status_code=response.status_code,
+                    content_type=response.content_type,
+                    body=response.get_data(as_text=True),
+                )
+            ).rowcount
+
+            if not stored:
+                # the lease ran out and a retry took the key over
+                db.session.rollback()
+                return replay(find_key(key, endpoint), request_hash)
+
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            release_key(key_filter, token)
+            raise
+
+        return response
+
+    return wrapper
+
+
+def purge_expired_keys(batch_size):
+    """Deletes expired keys, committing every batch_size rows.
+
+    Args:
+        batch_size (int): Keys deleted per statement and commit.
+
+    Returns:
+        int: The number of keys deleted.
+    """
+    keys = IdempotencyKey.__table__
+    cutoff = expiry_cutoff()
+    deleted = 0
+
+    while True:
+        expired = db.session.execute(
+            select(keys.c.key, keys.c.endpoint)
+            .where(keys.c.created_at < cutoff)
+            .limit(batch_size)
+        ).all()
+
+        if not expired:
+            return deleted
+
+        db.session.execute(
+            delete(keys).where(
+                keys.c.key == bindparam("expired_key"),
+                keys.c.endpoint == bindparam("expired_endpoint"),
+            ),
+            [
+                {"expired_key": key, "expired_endpoint": endpoint}
+                for key, endpoint in expired
+            ],
+        )
+        db.session.commit()
+        deleted += len(expired)
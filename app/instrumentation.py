@@ -0,0 +1,104 @@
+"""Per-request SQL instrumentation.
+
+Every statement run while a request is handled is counted and timed with
+the engine's cursor events. The totals are sent back in a
+``Server-Timing`` header and requests slower than
+``SLOW_REQUEST_THRESHOLD_MS`` are logged with their slowest statement.
+"""
+import time
+
+from app import db
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+
+
+class QueryStats:
+    """SQL statistics collected for one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_statement = None
+
+    def record(self, statement, elapsed):
+        """Adds one executed statement and its duration in seconds."""
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.slowest:
+            self.slowest = elapsed
+            self.slowest_statement = statement
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Notes when a statement starts on the connection."""
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Adds the finished statement to the current request's stats."""
+    started = conn.info["query_started"].pop()
+
+    if has_app_context() and "query_stats" in g:
+        g.query_stats.record(statement, time.perf_counter() - started)
+
+
+def handle_error(exception_context):
+    """Drops the start time of a statement that raised."""
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+
+def start_request_stats():
+    """Starts the timers for a request."""
+    g.request_started = time.perf_counter()
+    g.query_stats = QueryStats()
+
+
+def finish_request_stats(response):
+    """Adds the Server-Timing header and logs the request if it was slow."""
+    if "query_stats" not in g:
+        return response
+
+    stats = g.query_stats
+    elapsed = time.perf_counter() - g.request_started
+
+    response.headers.add(
+        "Server-Timing",
+        f'db;dur={stats.total * 1000:.2f};desc="{stats.count} queries", '
+        f"total;dur={elapsed * 1000:.2f}",
+    )
+
+    threshold = current_app.config["SLOW_REQUEST_THRESHOLD_MS"]
+    if threshold is not None and elapsed * 1000 >= threshold:
+        current_app.logger.warning(
+            "Slow request %s %s: %.1f ms, %d queries, %.1f ms in database, "
+            "slowest %.1f ms: %s",
+            request.method,
+            request.full_path,
+            elapsed * 1000,
+            stats.count,
+            stats.total * 1000,
+            stats.slowest * 1000,
+            stats.slowest_statement,
+        )
+
+    return response
+
+
+def init_instrumentation(app):
+    """Hooks SQL and request timing into the app and its engine.
+
+    Args:
+        app (Flask): The Flask application.
+    """
+    with app.app_context():
+        engine = db.engine
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+
+    app.before_request(start_request_stats)
+    app.after_request(finish_request_stats)
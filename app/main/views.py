@@ -1,5 +1,7 @@
+from app import db
 from app.main import main_bp
-from flask import render_template
+from flask import jsonify, render_template
+from ..database import pool_status
 
 
 @main_bp.route("/about", methods=["GET"])
@@ -7,3 +9,9 @@ from flask import render_template
 def index():
     """Render the index page."""
     return render_template("index.html")
+
+
+@main_bp.route("/db_pool", methods=["GET"])
+def db_pool():
+    """Report database connection pool utilisation."""
+    return jsonify(pool_status(db.engine)), 200
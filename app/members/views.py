@@ -1,16 +1,61 @@
 from app import db
 from app.members import members_bp
 from flask import request, jsonify
-from ..schema import MemberSchema
+from ..schema import IdsQuerySchema, MemberSchema
 from ..models import Member, Transaction
 from ..utils import TransactionType
+from ..pagination import InvalidCursor, paginate_request, uses_cursor
+from ..export import export_response
+from ..cache import cached
+from ..versions import InvalidSince, changed_since, conditional, mark_changed
 
 from math import ceil
 from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.orm.exc import StaleDataError
 
 members_error_dict = {"Error": "Could not find member!"}
 
 
+def member_to_dict(member):
+    """Serializes a member for JSON responses.
+
+    Args:
+        member (Member): The member object.
+
+    Returns:
+        dict: The member data.
+    """
+    return {
+        "id": member.id,
+        "name": member.name,
+        "debt": member.debt,
+        "books_borrowed": member.books_borrowed,
+        "updated_at": member.updated_at.isoformat(),
+        "version": member.version,
+    }
+
+
+def member_conflict_response(member):
+    """Builds the response refusing an update of a member changed meanwhile.
+
+    Args:
+        member (Member): The member as currently stored.
+
+    Returns:
+        tuple: JSON response and status code.
+    """
+    return (
+        jsonify(
+            {
+                "Error": "Member was changed by another request",
+                "member": member_to_dict(member),
+            }
+        ),
+        409,
+    )
+
+
 @members_bp.route("/hello")
 def hello():
     """Returns a string.
@@ -40,6 +85,7 @@ def create_member():
         )
 
         db.session.add(member)
+        mark_changed("members")
         db.session.commit()
 
         return (
@@ -60,6 +106,9 @@ def create_member():
 def update_member(member_id):
     """Updates a member object.
 
+    Send the ``version`` last read to have the update refused with 409 if
+    the member was changed since.
+
     Args:
         member_id (int): Id of the member object.
 
@@ -74,6 +123,11 @@ def update_member(member_id):
     if member is None:
         return members_error_dict, 400
 
+    expected_version = member_data.pop("version", None)
+
+    if expected_version is not None and expected_version != member.version:
+        return member_conflict_response(member)
+
     try:
         member_schema = MemberSchema(**member_data)
 
@@ -81,20 +135,34 @@ def update_member(member_id):
         member.debt = member_schema.debt
         member.books_borrowed = member_schema.books_borrowed
 
+        mark_changed("members")
         db.session.commit()
 
         return jsonify(
             {
                 "Message": "Member updated successfully!",
                 "Member": member_schema.model_dump(),
+                "version": member.version,
             }
         )
 
     except ValidationError as e:
         return jsonify({"Error": "Validation failed", "Details": e.errors()}), 400
 
+    except StaleDataError:
+        # changed by another request between our read and our write
+        db.session.rollback()
+        member = db.session.get(Member, member_id)
+
+        if member is None:
+            return members_error_dict, 400
+
+        return member_conflict_response(member)
+
 
 @members_bp.route("/get_by_id/<int:member_id>")
+@conditional("members")
+@cached("members")
 def get_member_by_id(member_id):
     """Get member object using id.
 
@@ -110,13 +178,37 @@ def get_member_by_id(member_id):
     if member is None:
         return members_error_dict, 400
 
+    return jsonify(member_to_dict(member)), 200
+
+
+@members_bp.route("/get_many")
+@conditional("members")
+@cached("members")
+def get_many_members():
+    """Gets several members by id in one query (?ids=1,2,3).
+
+    Members come back in the order their ids were asked for; ids without a
+    member are listed under ``missing``.
+
+    Returns:
+        dict: The members found and the missing ids.
+    """
+    try:
+        ids = IdsQuerySchema(ids=request.args.getlist("ids")).ids
+    except ValidationError as e:
+        return jsonify({"Error": "Validation failed", "Details": e.errors()}), 400
+
+    ids = list(dict.fromkeys(ids))
+    members = {
+        member.id: member
+        for member in db.session.scalars(select(Member).where(Member.id.in_(ids)))
+    }
+
     return (
         jsonify(
             {
-                "id": member.id,
-                "name": member.name,
-                "debt": member.debt,
-                "books_borrowed": member.books_borrowed,
+                "members": [member_to_dict(members[i]) for i in ids if i in members],
+                "missing": [i for i in ids if i not in members],
             }
         ),
         200,
@@ -124,28 +216,41 @@ def get_member_by_id(member_id):
 
 
 @members_bp.route("/get_members")
+@conditional("members")
+@cached("members")
 def get_members():
     """Gets members in pages.
 
+    Pass ``cursor`` (empty for the first page) instead of ``page`` to use
+    keyset pagination; ``with_total=false`` skips the total count.
+    ``since`` keeps only members changed at or after a timestamp.
+
     Returns:
         dict: Pagination object with data as list.
     """
+    try:
+        query = changed_since(Member.query, Member.updated_at)
+    except InvalidSince as e:
+        return jsonify({"Error": str(e)}), 400
+
+    if uses_cursor():
+        try:
+            members = paginate_request(query, Member.id)
+        except InvalidCursor as e:
+            return jsonify({"Error": str(e)}), 400
+
+        members_list = [member_to_dict(member) for member in members]
+
+        return jsonify(members.to_dict("members", members_list)), 200
+
     page = request.args.get("page", default=1, type=int)
     per_page = request.args.get("per_page", default=10, type=int)
 
-    members = Member.query.paginate(page=page, per_page=per_page)
+    members = query.paginate(page=page, per_page=per_page)
 
     total_pages = ceil(members.total / per_page)
 
-    members_list = [
-        {
-            "id": member.id,
-            "name": member.name,
-            "debt": member.debt,
-            "books_borrowed": member.books_borrowed,
-        }
-        for member in members
-    ]
+    members_list = [member_to_dict(member) for member in members]
 
     return (
         jsonify(
@@ -190,6 +295,21 @@ def delete_member(member_id):
         return jsonify({"Error": "Member has pending transactions!"}), 400
 
     db.session.delete(member)
+    mark_changed("members", "transactions")
     db.session.commit()
 
     return jsonify({"Message": "Member deleted succesfully!"}), 200
+
+
+@members_bp.route("/export")
+def export_members():
+    """Streams every member as NDJSON or CSV (?format=ndjson|csv).
+
+    Returns:
+        Response: The streamed export.
+    """
+    query = db.session.query(
+        Member.id, Member.name, Member.debt, Member.books_borrowed
+    ).order_by(Member.id)
+
+    return export_response(query, "members")
@@ -0,0 +1,121 @@
+"""Prometheus metrics.
+
+Under gunicorn every worker is a separate process, so per-process
+counters would only describe whichever worker answered the scrape. When
+``PROMETHEUS_MULTIPROC_DIR`` is set (before the app is imported) the
+client library keeps every metric in memory-mapped files in that
+directory, and ``/metrics`` aggregates the files of all workers. Without
+it, metrics are kept in process as usual.
+"""
+import os
+import time
+
+from app import db
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from .database import pool_status
+
+REQUESTS = Counter(
+    "booknest_http_requests_total",
+    "HTTP requests handled.",
+    ["endpoint", "method", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "booknest_http_request_duration_seconds",
+    "Time spent handling HTTP requests.",
+    ["endpoint"],
+)
+ERRORS = Counter(
+    "booknest_http_errors_total",
+    "HTTP responses with a 4xx or 5xx status.",
+    ["endpoint", "status"],
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "booknest_db_pool_checked_out",
+    "Database connections in use.",
+    multiprocess_mode="livesum",
+)
+DB_POOL_SIZE = Gauge(
+    "booknest_db_pool_size",
+    "Database connections the pools keep open.",
+    multiprocess_mode="livesum",
+)
+BOOKS_ISSUED = Counter("booknest_books_issued_total", "Books issued to members.")
+BOOKS_RETURNED = Counter("booknest_books_returned_total", "Books returned.")
+PENALTIES_CHARGED = Counter(
+    "booknest_penalties_charged_total", "Penalty amount charged on returns."
+)
+
+
+def record_return(charge):
+    """Counts a returned book and the penalty charged for it.
+
+    Args:
+        charge (int): The penalty charged.
+    """
+    BOOKS_RETURNED.inc()
+    PENALTIES_CHARGED.inc(charge)
+
+
+def update_pool_gauges():
+    """Sets the pool gauges from this worker's engine."""
+    status = pool_status(db.engine)
+    DB_POOL_CHECKED_OUT.set(status.get("checked_out", 0))
+    DB_POOL_SIZE.set(status.get("size", 0))
+
+
+def start_timer():
+    """Starts the latency timer for a request."""
+    g.metrics_started = time.perf_counter()
+
+
+def record_request(response):
+    """Counts the finished request and observes its latency."""
+    if "metrics_started" not in g:
+        return response
+
+    endpoint = request.endpoint or "unmatched"
+    status = str(response.status_code)
+
+    REQUESTS.labels(endpoint, request.method, status).inc()
+    REQUEST_LATENCY.labels(endpoint).observe(time.perf_counter() - g.metrics_started)
+
+    if response.status_code >= 400:
+        ERRORS.labels(endpoint, status).inc()
+
+    update_pool_gauges()
+
+    return response
+
+
+def metrics():
+    """Exports the metrics of every worker in the Prometheus text format."""
+    update_pool_gauges()
+
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app):
+    """Registers the request hooks and the /metrics route.
+
+    Args:
+        app (Flask): The Flask application.
+    """
+    app.before_request(start_timer)
+    app.after_request(record_request)
+    app.add_url_rule("/metrics", "metrics", metrics, methods=["GET"])
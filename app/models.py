@@ -1,5 +1,7 @@
 from . import db
 from datetime import datetime
+from sqlalchemy.ext.hybrid import hybrid_property
+from .utils import utcnow
 
 
 class Book(db.Model):
@@ -8,12 +10,24 @@ class Book(db.Model):
     title = db.Column(db.String(255))
     author = db.Column(db.String(50))
     penalty_fee = db.Column(db.Integer, default=10)
+    # copies on the shelf and copies out on loan
     quantity = db.Column(db.Integer, nullable=False)
+    on_loan = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(
+        db.DateTime, nullable=False, default=utcnow, onupdate=utcnow, index=True
+    )
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+    __mapper_args__ = {"version_id_col": version}
 
     transactions = db.relationship(
         "Transaction", backref="book", cascade="all, delete-orphan"
     )
 
+    @hybrid_property
+    def total_copies(self):
+        return self.quantity + self.on_loan
+
 
 class Member(db.Model):
     __tablename__ = "members"
@@ -21,6 +35,12 @@ class Member(db.Model):
     name = db.Column(db.String(255))
     debt = db.Column(db.Integer, default=0)
     books_borrowed = db.Column(db.Integer, default=0)
+    updated_at = db.Column(
+        db.DateTime, nullable=False, default=utcnow, onupdate=utcnow, index=True
+    )
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+    __mapper_args__ = {"version_id_col": version}
 
     transactions = db.relationship(
         "Transaction", backref="member", cascade="all, delete-orphan"
@@ -29,12 +49,123 @@ class Member(db.Model):
 
 class Transaction(db.Model):
     __tablename__ = "transactions"
+    __table_args__ = (
+        db.Index("ix_transactions_member_id_type", "member_id", "type"),
+        db.Index("ix_transactions_book_id_type", "book_id", "type"),
+        # only open loans are looked up by book and member together
+        db.Index(
+            "ix_transactions_book_id_member_id_type",
+            "book_id",
+            "member_id",
+            "type",
+            sqlite_where=db.text("type = 'issue'"),
+            postgresql_where=db.text("type = 'issue'"),
+        ),
+        # overdue loans are found by type and age
+        db.Index("ix_transactions_type_issued_on", "type", "issued_on"),
+        # archived rows keep their ids, so SQLite must never hand one out
+        # again once the row has left this table
+        {"sqlite_autoincrement": True},
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     book_id = db.Column(db.Integer, db.ForeignKey("books.id"))
     member_id = db.Column(db.Integer, db.ForeignKey("members.id"))
-    issued_on = db.Column(db.DateTime, default=datetime.now())
-    returned_on = db.Column(db.DateTime)
+    issued_on = db.Column(db.DateTime, default=datetime.now)
+    # returns are counted per day by the analytics rollups
+    returned_on = db.Column(db.DateTime, index=True)
     charge = db.Column(db.Integer, default=0)
+    # penalty already added to the member's debt while the loan is open
+    accrued_charge = db.Column(db.Integer, nullable=False, default=0)
     type = db.Column(
         db.Enum("issue", "return", name="transaction_types"), nullable=False
     )
+    updated_at = db.Column(
+        db.DateTime, nullable=False, default=utcnow, onupdate=utcnow, index=True
+    )
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+    __mapper_args__ = {"version_id_col": version}
+
+
+class TableVersion(db.Model):
+    """Change counter of a table, bumped after every committed write to
+    that table."""
+
+    __tablename__ = "table_versions"
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+
+class IdempotencyKey(db.Model):
+    """Response stored for a request sent with an Idempotency-Key header.
+
+    ``status_code`` is NULL while the first request is still running;
+    ``created_at`` is when it reserved the key and ``token`` identifies
+    its reservation.
+    """
+
+    __tablename__ = "idempotency_keys"
+    key = db.Column(db.String(255), primary_key=True)
+    endpoint = db.Column(db.String(64), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False)
+    token = db.Column(db.String(32))
+    status_code = db.Column(db.Integer)
+    content_type = db.Column(db.String(64))
+    body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow, index=True)
+
+
+class DailyBookStats(db.Model):
+    """Loans, returns and charges of a book per day, for the analytics.
+
+    Issues count on the day the book was issued, returns and charges on
+    the day it came back.
+    """
+
+    __tablename__ = "daily_book_stats"
+    day = db.Column(db.Date, primary_key=True)
+    book_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    issues = db.Column(db.Integer, nullable=False, default=0)
+    returns = db.Column(db.Integer, nullable=False, default=0)
+    charges = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DailyMemberStats(db.Model):
+    """Loans, returns and charges of a member per day, for the analytics."""
+
+    __tablename__ = "daily_member_stats"
+    day = db.Column(db.Date, primary_key=True)
+    member_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    issues = db.Column(db.Integer, nullable=False, default=0)
+    returns = db.Column(db.Integer, nullable=False, default=0)
+    charges = db.Column(db.Integer, nullable=False, default=0)
+
+
+class RollupWatermark(db.Model):
+    """How far the rollups have read the ledger, by ``updated_at``."""
+
+    __tablename__ = "rollup_watermarks"
+    name = db.Column(db.String(64), primary_key=True)
+    watermark = db.Column(db.DateTime, nullable=False)
+
+
+class TransactionArchive(db.Model):
+    """Returned transactions moved out of the hot ``transactions`` table.
+
+    Rows keep their original ids. There are no foreign keys, so books and
+    members can be deleted after their history was archived.
+    """
+
+    __tablename__ = "transactions_archive"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    book_id = db.Column(db.Integer, index=True)
+    member_id = db.Column(db.Integer, index=True)
+    issued_on = db.Column(db.DateTime)
+    returned_on = db.Column(db.DateTime)
+    charge = db.Column(db.Integer, default=0)
+    accrued_charge = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, index=True)
+    version = db.Column(db.Integer, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False, default=utcnow)
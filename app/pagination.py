@@ -0,0 +1,231 @@
+"""Keyset (cursor) pagination shared by the list endpoints.
+
+Offset pagination (``?page=``) issues ``OFFSET n`` and a ``COUNT(*)`` for
+every page, so deep pages get slower as tables grow. Cursor pagination
+instead seeks past the last id seen (``WHERE id > :last ORDER BY id``),
+which costs the same on every page. Listings ordered by a timestamp
+seek past the last (timestamp, id) pair instead. Cursors are opaque
+tokens; clients pass back the ``next_cursor`` of the previous page, or an
+empty ``cursor`` for the first page. The total count is optional.
+"""
+import base64
+import binascii
+import json
+
+from datetime import datetime
+from flask import request
+from sqlalchemy import or_
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token cannot be decoded."""
+
+
+def encode_cursor(last_id, after=None):
+    """Encodes the last id of a page into an opaque cursor token.
+
+    Args:
+        last_id (int): Id of the last row on the page.
+        after (datetime, optional): Timestamp the page is ordered by, on
+            the last row.
+
+    Returns:
+        str: The cursor token.
+    """
+    position = {"id": last_id}
+
+    if after is not None:
+        position["after"] = after.isoformat()
+
+    payload = json.dumps(position, separators=(",", ":")).encode()
+
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def cursor_position(token):
+    """Decodes the JSON object inside a cursor token."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+    if not isinstance(position, dict) or not isinstance(position.get("id"), int):
+        raise InvalidCursor("Invalid cursor")
+
+    return position
+
+
+def decode_cursor(token):
+    """Decodes a cursor token back into the id it points past.
+
+    Args:
+        token (str): The cursor token.
+
+    Raises:
+        InvalidCursor: If the token is malformed.
+
+    Returns:
+        int: The id of the last row of the previous page.
+    """
+    return cursor_position(token)["id"]
+
+
+def decode_ordered_cursor(token):
+    """Decodes a cursor token of a timestamp-ordered listing.
+
+    Args:
+        token (str): The cursor token.
+
+    Raises:
+        InvalidCursor: If the token is malformed.
+
+    Returns:
+        tuple: (timestamp, id) of the last row of the previous page.
+    """
+    position = cursor_position(token)
+
+    try:
+        after = datetime.fromisoformat(position["after"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+    return after, position["id"]
+
+
+def wants_total(default=True):
+    """Reads the with_total request argument.
+
+    Returns:
+        bool: False if the client asked to skip the total count.
+    """
+    value = request.args.get("with_total")
+
+    if value is None:
+        return default
+
+    return value.lower() not in ("false", "0", "no")
+
+
+class CursorPage:
+    """A page of rows fetched with keyset pagination."""
+
+    def __init__(self, items, per_page, next_cursor, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def to_dict(self, name, items):
+        """Builds the response body for the page.
+
+        Args:
+            name (str): Key for the serialized items, e.g. 'books'.
+            items (list): The serialized items.
+
+        Returns:
+            dict: Response body.
+        """
+        body = {
+            name: items,
+            "per_page": self.per_page,
+            "has_next": self.has_next,
+            "next_cursor": self.next_cursor,
+        }
+
+        if self.total is not None:
+            body[f"total_{name}"] = self.total
+
+        return body
+
+
+def cursor_paginate(
+    query, key, cursor=None, per_page=10, with_total=True, order=None
+):
+    """Fetches one page of a query ordered by a unique integer key.
+
+    Args:
+        query (Query): The query to paginate. Any ordering is replaced.
+        key (Column): Unique, indexed integer column to seek on, usually id.
+        cursor (str, optional): Cursor from the previous page.
+        per_page (int, optional): Page size. Defaults to 10.
+        with_total (bool, optional): Whether to count all matching rows.
+        order (Column, optional): DateTime column to order by ahead of
+            key, with an index ending in it (key breaks ties). Each page
+            then seeks past the last (order, key) pair.
+
+    Raises:
+        InvalidCursor: If the cursor is malformed.
+
+    Returns:
+        CursorPage: The page.
+    """
+    per_page = max(per_page, 1)
+
+    total = query.order_by(None).count() if with_total else None
+
+    columns = [key] if order is None else [order, key]
+
+    if cursor and order is None:
+        query = query.filter(key > decode_cursor(cursor))
+    elif cursor:
+        after, last_id = decode_ordered_cursor(cursor)
+        # the first condition alone is an index range; the second only
+        # skips the rows of the boundary timestamp already seen
+        query = query.filter(order >= after, or_(order > after, key > last_id))
+
+    # fetch one extra row to learn whether there is a next page
+    rows = query.order_by(None).order_by(*columns).limit(per_page + 1).all()
+    items = rows[:per_page]
+
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(
+            getattr(last, key.key),
+            None if order is None else getattr(last, order.key),
+        )
+
+    return CursorPage(items, per_page, next_cursor, total)
+
+
+def paginate_request(query, key, order=None):
+    """Runs cursor pagination driven by the current request's arguments.
+
+    Reads ``cursor``, ``per_page`` and ``with_total`` from the query string.
+
+    Args:
+        query (Query): The query to paginate.
+        key (Column): Unique integer column to seek on.
+        order (Column, optional): DateTime column to order by ahead of key.
+
+    Raises:
+        InvalidCursor: If the cursor is malformed.
+
+    Returns:
+        CursorPage: The page.
+    """
+    return cursor_paginate(
+        query,
+        key,
+        cursor=request.args.get("cursor", default="", type=str),
+        per_page=request.args.get("per_page", default=10, type=int),
+        with_total=wants_total(),
+        order=order,
+    )
+
+
+def uses_cursor():
+    """Checks whether the current request asked for cursor pagination.
+
+    Returns:
+        bool: True if a ``cursor`` argument (even empty) was given.
+    """
+    return "cursor" in request.args
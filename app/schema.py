@@ -1,6 +1,6 @@
 from datetime import datetime
-from .utils import TransactionType
-from pydantic import BaseModel, Field
+from .utils import MAX_BATCH_SIZE, MAX_LOOKUP_IDS, TransactionType
+from pydantic import BaseModel, Field, field_validator
 
 
 class BookSchema(BaseModel):
@@ -27,3 +27,18 @@ class BookRequestSchema(BaseModel):
     member_id: int = Field(...)
     book_id: int = Field(...)
     date: datetime = Field(default_factory=datetime.now)
+
+
+class BatchRequestSchema(BaseModel):
+    member_id: int = Field(...)
+    book_ids: list[int] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class IdsQuerySchema(BaseModel):
+    ids: list[int] = Field(..., min_length=1, max_length=MAX_LOOKUP_IDS)
+
+    @field_validator("ids", mode="before")
+    @classmethod
+    def split_ids(cls, values):
+        """Accepts ``ids=1,2,3`` as well as repeated ``ids`` arguments."""
+        return [part for value in values for part in str(value).split(",")]
@@ -0,0 +1,151 @@
+"""Title/author search over the books catalog.
+
+On SQLite the ``books`` table is shadowed by an FTS5 index using the
+trigram tokenizer, which answers the same substring queries as
+``LIKE '%term%'`` without scanning the table. Triggers keep the index in
+sync with every insert, update and delete on ``books``, including bulk
+Core statements that bypass the ORM. Other databases, and terms shorter
+than a trigram, fall back to ``LIKE``.
+"""
+from app import db
+from .models import Book
+
+from contextlib import contextmanager
+from sqlalchemy import DDL, event, func, literal_column, or_, select, table, column
+
+SEARCH_COLUMNS = ("title", "author")
+
+# shortest term the trigram tokenizer can match
+MIN_FTS_TERM_LENGTH = 3
+
+BOOKS_FTS_INSERT_TRIGGER = (
+    "CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN "
+    "INSERT INTO books_fts(rowid, title, author) "
+    "VALUES (new.id, new.title, new.author); END"
+)
+
+BOOKS_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5("
+    "title, author, content='books', content_rowid='id', tokenize='trigram')",
+    BOOKS_FTS_INSERT_TRIGGER,
+    "CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, author) "
+    "VALUES ('delete', old.id, old.title, old.author); END",
+    "CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author "
+    "ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, author) "
+    "VALUES ('delete', old.id, old.title, old.author); "
+    "INSERT INTO books_fts(rowid, title, author) "
+    "VALUES (new.id, new.title, new.author); END",
+]
+
+BOOKS_FTS_DROP_DDL = ["DROP TABLE IF EXISTS books_fts"]
+
+books_fts = table("books_fts", column("rowid"), column("rank"))
+
+for statement in BOOKS_FTS_DDL:
+    event.listen(
+        Book.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite")
+    )
+
+for statement in BOOKS_FTS_DROP_DDL:
+    event.listen(
+        Book.__table__, "before_drop", DDL(statement).execute_if(dialect="sqlite")
+    )
+
+
+@contextmanager
+def deferred_search_index():
+    """Indexes the books inserted inside the block with one statement.
+
+    Row-by-row trigger maintenance dominates bulk loads, so the insert
+    trigger is dropped, the new rows are indexed in a single
+    ``INSERT ... SELECT`` when the block exits and the trigger is
+    recreated. SQLite DDL is transactional and all of this happens in the
+    caller's transaction, so other connections never see the trigger
+    missing and a rollback restores it. Callers commit afterwards.
+    """
+    if db.engine.dialect.name != "sqlite":
+        yield
+        return
+
+    connection = db.session.connection()
+    driver_connection = connection.connection.driver_connection
+
+    # pysqlite only opens transactions implicitly before DML; the DDL
+    # below must not run in autocommit mode
+    if not driver_connection.in_transaction:
+        driver_connection.execute("BEGIN IMMEDIATE")
+
+    last_id = connection.scalar(select(func.coalesce(func.max(Book.id), 0)))
+    connection.exec_driver_sql("DROP TRIGGER IF EXISTS books_fts_ai")
+
+    yield
+
+    connection.exec_driver_sql(
+        "INSERT INTO books_fts(rowid, title, author) "
+        "SELECT id, title, author FROM books WHERE id > ?",
+        (last_id,),
+    )
+    connection.exec_driver_sql(BOOKS_FTS_INSERT_TRIGGER)
+
+
+def uses_fts(term):
+    """Checks whether a search term can be answered from the FTS index.
+
+    Args:
+        term (str): The normalized search term.
+
+    Returns:
+        bool: True if the FTS index should be used.
+    """
+    return (
+        db.engine.dialect.name == "sqlite" and len(term) >= MIN_FTS_TERM_LENGTH
+    )
+
+
+def match_expression(term, columns=SEARCH_COLUMNS):
+    """Builds an FTS5 MATCH expression for a substring search.
+
+    The term is quoted as a single phrase so user input cannot inject
+    FTS5 query syntax.
+
+    Args:
+        term (str): The normalized search term.
+        columns (tuple): Columns to restrict the match to.
+
+    Returns:
+        str: The MATCH expression.
+    """
+    phrase = '"{}"'.format(term.replace('"', '""'))
+
+    return "{{{}}} : {}".format(" ".join(columns), phrase)
+
+
+def search_books(term, columns=SEARCH_COLUMNS):
+    """Builds a query for books whose title or author contains a term.
+
+    Results are ordered by relevance when the FTS index is used and by id
+    otherwise.
+
+    Args:
+        term (str): The normalized (lower case) search term.
+        columns (tuple): Book columns to search. Defaults to title and author.
+
+    Returns:
+        Query: A Book query.
+    """
+    if uses_fts(term):
+        return (
+            Book.query.join(books_fts, books_fts.c.rowid == Book.id)
+            .filter(
+                literal_column("books_fts").op("MATCH")(
+                    match_expression(term, columns)
+                )
+            )
+            .order_by(books_fts.c.rank, Book.id)
+        )
+
+    return Book.query.filter(
+        or_(*[getattr(Book, name).like(f"%{term}%") for name in columns])
+    ).order_by(Book.id)
@@ -0,0 +1,70 @@
+"""SQL constructs that differ between the supported databases."""
+from sqlalchemy import Date, Integer
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+
+class days_between(FunctionElement):
+    """Whole days from one timestamp to a later one, rounded down.
+
+    Matches ``int((end - start).total_seconds() // 86400)`` in Python.
+
+    Args:
+        start: The earlier timestamp expression.
+        end: The later timestamp expression.
+    """
+
+    name = "days_between"
+    inherit_cache = True
+    type = Integer()
+
+
+@compiles(days_between)
+def compile_days_between(element, compiler, **kw):
+    start, end = element.clauses
+    return "CAST(FLOOR(EXTRACT(EPOCH FROM (%s - %s)) / 86400) AS INTEGER)" % (
+        compiler.process(end, **kw),
+        compiler.process(start, **kw),
+    )
+
+
+@compiles(days_between, "sqlite")
+def compile_days_between_sqlite(element, compiler, **kw):
+    start, end = element.clauses
+    # whole seconds, so the integer division cannot be off by float error
+    return "((strftime('%%s', %s) - strftime('%%s', %s)) / 86400)" % (
+        compiler.process(end, **kw),
+        compiler.process(start, **kw),
+    )
+
+
+@compiles(days_between, "mysql")
+def compile_days_between_mysql(element, compiler, **kw):
+    start, end = element.clauses
+    return "TIMESTAMPDIFF(DAY, %s, %s)" % (
+        compiler.process(start, **kw),
+        compiler.process(end, **kw),
+    )
+
+
+class day_bucket(FunctionElement):
+    """The calendar day of a timestamp, for grouping by day.
+
+    Args:
+        timestamp: The timestamp expression.
+    """
+
+    name = "day_bucket"
+    inherit_cache = True
+    type = Date()
+
+
+@compiles(day_bucket)
+def compile_day_bucket(element, compiler, **kw):
+    return "CAST(%s AS DATE)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(day_bucket, "sqlite")
+def compile_day_bucket_sqlite(element, compiler, **kw):
+    # 'YYYY-MM-DD' text, which the Date type reads back as a date
+    return "date(%s)" % compiler.process(element.clauses, **kw)
@@ -0,0 +1,346 @@
+"""In-process prefix index for title and author autocompletion.
+
+Each worker keeps the normalized titles and authors of the catalog in one
+sorted list, so the keys starting with a prefix are found with a binary
+search and read off in order, without touching the database. Under
+gunicorn each worker builds its index in a background thread as it
+starts (see ``warm``); otherwise the first suggestion request builds it.
+Requests arriving while a build runs are answered from the database.
+
+Books created, updated or deleted through this worker are applied to its
+index right away. Changes made by other workers are pulled every
+``SUGGEST_REFRESH_SECONDS`` from ``books.updated_at``. Deleted rows leave
+nothing behind in ``updated_at``, so when the index holds more books than
+the table, the ids are reread and the missing books dropped.
+
+The index holds at most ``SUGGEST_MAX_ENTRIES`` keys, two per book. A
+catalog too large for it is answered with ``LIKE 'prefix%'`` queries
+instead, and the count is checked again every ``SUGGEST_REFRESH_SECONDS``
+so the index is rebuilt once deletes bring the catalog under the cap.
+The database matches lowercased titles and authors as stored: accents
+and runs of spaces in the catalog are not folded there.
+"""
+import threading
+import time
+import unicodedata
+
+from app import db
+from bisect import bisect_left
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import func, or_, select
+from .models import Book
+from .utils import utcnow
+
+# rows changed this long before a refresh may still be in uncommitted
+# transactions; they are read again by the next refresh
+REFRESH_OVERLAP = timedelta(minutes=1)
+
+# rows read per round trip while building
+BUILD_BATCH_SIZE = 10000
+
+
+def normalize(text):
+    """Folds case, accents and runs of whitespace for prefix matching.
+
+    Args:
+        text (str): A title, author or typed prefix.
+
+    Returns:
+        str: The normalized text.
+    """
+    text = text or ""
+
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(char for char in text if not unicodedata.combining(char))
+
+    folded = " ".join(text.casefold().split())
+
+    # titles are stored lowercase, so most keys can share the title string
+    return text if folded == text else folded
+
+
+class SuggestIndex:
+    """Sorted keys of the titles and authors of the books.
+
+    Args:
+        max_entries (int): Keys held at most; past it the index gives up
+            and suggest() falls back to the database.
+        refresh_seconds (float): Seconds between pulls of the changes made
+            by other workers.
+    """
+
+    def __init__(self, max_entries, refresh_seconds):
+        self.max_entries = max_entries
+        self.refresh_seconds = refresh_seconds
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # keys[i] is a normalized title or author of book ids[i]
+        self.keys = []
+        self.ids = []
+        # book id -> (title, author) as stored
+        self.books = {}
+        self.built = False
+        self.building = False
+        self.complete = True
+        self.synced_at = None
+        self.checked_at = 0.0
+
+    def insert(self, key, book_id):
+        position = bisect_left(self.keys, key)
+        self.keys.insert(position, key)
+        self.ids.insert(position, book_id)
+
+    def delete(self, key, book_id):
+        position = bisect_left(self.keys, key)
+        while position < len(self.keys) and self.keys[position] == key:
+            if self.ids[position] == book_id:
+                del self.keys[position]
+                del self.ids[position]
+                return
+            position += 1
+
+    def put(self, book_id, title, author):
+        """Adds a book, or replaces its title and author."""
+        with self.lock:
+            if not self.built or not self.complete:
+                return
+
+            self.drop(book_id)
+
+            if len(self.keys) + 2 > self.max_entries:
+                self.give_up()
+                return
+
+            self.books[book_id] = (title, author)
+            self.insert(normalize(title), book_id)
+            self.insert(normalize(author), book_id)
+
+    def remove(self, book_id):
+        """Drops a book."""
+        with self.lock:
+            self.drop(book_id)
+
+    def drop(self, book_id):
+        book = self.books.pop(book_id, None)
+
+        if book is not None:
+            title, author = book
+            self.delete(normalize(title), book_id)
+            self.delete(normalize(author), book_id)
+
+    def reset_entries(self):
+        self.keys = []
+        self.ids = []
+        self.books = {}
+
+    def give_up(self):
+        # the next sync rebuilds, which counts the books again
+        self.complete = False
+        self.built = False
+        self.reset_entries()
+
+    def build(self):
+        """Loads every book, or gives up if there are too many.
+
+        Runs without the lock; changes made meanwhile are caught by the
+        first refresh, which starts from when the build did.
+        """
+        synced_at = utcnow()
+        complete = (
+            db.session.scalar(select(func.count(Book.id))) * 2 <= self.max_entries
+        )
+        entries = []
+        books = {}
+
+        if complete:
+            columns = Book.__table__.c
+            # plain Core rows; the ORM adds nothing here but time
+            rows = db.session.connection().execute(
+                select(columns.id, columns.title, columns.author).execution_options(
+                    yield_per=BUILD_BATCH_SIZE
+                )
+            )
+            for book_id, title, author in rows:
+                books[book_id] = (title, author)
+                entries.append((normalize(title), book_id))
+                entries.append((normalize(author), book_id))
+
+            # one sort of the whole list beats inserting row by row
+            entries.sort()
+
+        with self.lock:
+            self.keys = [key for key, _ in entries]
+            self.ids = [book_id for _, book_id in entries]
+            self.books = books
+            self.complete = complete
+            self.built = True
+            self.synced_at = synced_at
+            self.checked_at = time.monotonic()
+
+    def refresh(self):
+        """Applies the changes made by other workers since the last pull."""
+        synced_at = utcnow()
+        changed = db.session.execute(
+            select(Book.id, Book.title, Book.author).where(
+                Book.updated_at >= self.synced_at - REFRESH_OVERLAP
+            )
+        ).all()
+
+        for book_id, title, author in changed:
+            if self.books.get(book_id) != (title, author):
+                self.drop(book_id)
+                self.books[book_id] = (title, author)
+                self.insert(normalize(title), book_id)
+                self.insert(normalize(author), book_id)
+
+        if len(self.books) > db.session.scalar(select(func.count(Book.id))):
+            existing = set(db.session.scalars(select(Book.id)))
+            for book_id in [i for i in self.books if i not in existing]:
+                self.drop(book_id)
+
+        if len(self.keys) > self.max_entries:
+            self.give_up()
+
+        self.synced_at = synced_at
+        self.checked_at = time.monotonic()
+
+    def sync(self):
+        """Builds the index on first use and pulls changes when due.
+
+        An index that gave up on a too large catalog is rebuilt when due
+        instead, in case deletes brought the catalog under the cap.
+
+        Returns:
+            bool: False while another thread is still building the index.
+        """
+        with self.lock:
+            if (
+                self.built
+                and time.monotonic() - self.checked_at >= self.refresh_seconds
+            ):
+                if self.complete:
+                    self.refresh()
+                else:
+                    self.built = False
+
+            if self.built:
+                return True
+
+            if self.building:
+                return False
+
+            self.building = True
+
+        try:
+            self.build()
+        finally:
+            self.building = False
+
+        return True
+
+    def warm(self, app):
+        """Builds the index in a background thread.
+
+        Args:
+            app (Flask): The Flask application.
+
+        Returns:
+            Thread: The started thread.
+        """
+
+        def run():
+            with app.app_context():
+                self.sync()
+                db.session.remove()
+
+        thread = threading.Thread(target=run, name="suggest-index", daemon=True)
+        thread.start()
+
+        return thread
+
+    def lookup(self, prefix, limit):
+        """Lists the books with a title or author starting with a prefix.
+
+        Returns:
+            list: (id, title, author) tuples ordered by the matching key,
+            each book once.
+        """
+        found = []
+        seen = set()
+        position = bisect_left(self.keys, prefix)
+
+        while len(found) < limit and position < len(self.keys):
+            if not self.keys[position].startswith(prefix):
+                break
+
+            book_id = self.ids[position]
+            if book_id not in seen:
+                seen.add(book_id)
+                found.append((book_id, *self.books[book_id]))
+            position += 1
+
+        return found
+
+    def suggest(self, prefix, limit):
+        """Lists books whose title or author starts with a prefix.
+
+        Args:
+            prefix (str): What was typed so far.
+            limit (int): Most books returned.
+
+        Returns:
+            list: (id, title, author) tuples.
+        """
+        prefix = normalize(prefix)
+
+        if self.sync():
+            with self.lock:
+                if self.complete:
+                    return self.lookup(prefix, limit)
+
+        return database_suggest(prefix, limit)
+
+
+def database_suggest(prefix, limit):
+    """Answers a suggestion with a LIKE query, for catalogs too large to
+    index and while the index is being built.
+
+    Only the prefix is normalized; the titles and authors are just
+    lowercased, so a prefix without the accents or double spaces of a
+    stored title does not match it here, though it does in the index.
+    """
+    pattern = (
+        prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    )
+
+    return db.session.execute(
+        select(Book.id, Book.title, Book.author)
+        .where(
+            or_(
+                func.lower(Book.title).like(pattern, escape="\\"),
+                func.lower(Book.author).like(pattern, escape="\\"),
+            )
+        )
+        .order_by(Book.title, Book.id)
+        .limit(limit)
+    ).all()
+
+
+def init_suggest(app):
+    """Creates the (still empty) suggestion index of the app.
+
+    Args:
+        app (Flask): The Flask application.
+    """
+    app.extensions["suggest"] = SuggestIndex(
+        app.config["SUGGEST_MAX_ENTRIES"], app.config["SUGGEST_REFRESH_SECONDS"]
+    )
+
+
+def get_suggest_index():
+    """Returns the suggestion index of the current app."""
+    return current_app.extensions["suggest"]
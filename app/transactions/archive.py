@@ -0,0 +1,115 @@
+"""Archival of returned transactions.
+
+Open loans are few and looked up constantly, while returned transactions
+pile up forever. ``archive_transactions`` (``flask archive-transactions``)
+moves returns older than a number of days into ``transactions_archive``
+in batches, each batch being one ``INSERT ... SELECT`` and one
+``DELETE`` in a short transaction. ``get_transactions`` reads both tables
+with ``UNION ALL`` when asked to include the archive.
+"""
+from app import db
+from datetime import timedelta
+from sqlalchemy import delete, insert, literal, select
+from ..models import Book, Member, Transaction, TransactionArchive
+from ..utils import TransactionType, utcnow
+from ..versions import mark_changed
+
+# transactions columns copied as they are
+ARCHIVED_COLUMNS = (
+    "id",
+    "book_id",
+    "member_id",
+    "issued_on",
+    "returned_on",
+    "charge",
+    "accrued_charge",
+    "updated_at",
+    "version",
+)
+
+
+def archived_rows():
+    """Builds the archive half of the transaction listings.
+
+    The columns match transaction_rows() position by position so both can
+    be combined with UNION ALL.
+
+    Returns:
+        Query: A query yielding archived rows with the serialized columns.
+    """
+    return (
+        db.session.query(
+            TransactionArchive.id,
+            TransactionArchive.book_id,
+            Book.title.label("book_title"),
+            TransactionArchive.member_id,
+            Member.name.label("member_name"),
+            literal(TransactionType.RETURN.value).label("type"),
+            TransactionArchive.issued_on,
+            TransactionArchive.returned_on,
+            TransactionArchive.charge,
+            TransactionArchive.updated_at,
+            TransactionArchive.version,
+        )
+        .outerjoin(Book, TransactionArchive.book_id == Book.id)
+        .outerjoin(Member, TransactionArchive.member_id == Member.id)
+    )
+
+
+def archive_batch(ids):
+    """Moves some transactions to the archive in one transaction."""
+    source = [getattr(Transaction, name) for name in ARCHIVED_COLUMNS]
+
+    db.session.execute(
+        insert(TransactionArchive).from_select(
+            [*ARCHIVED_COLUMNS, "archived_at"],
+            select(*source, literal(utcnow())).where(Transaction.id.in_(ids)),
+        )
+    )
+    db.session.execute(
+        delete(Transaction).where(Transaction.id.in_(ids)),
+        execution_options={"synchronize_session": False},
+    )
+    mark_changed("transactions")
+    db.session.commit()
+
+
+def archive_transactions(days, batch_size, now, progress=None):
+    """Moves transactions returned more than some days ago to the archive.
+
+    Args:
+        days (int): Age in days, by return date, of the rows to move.
+        batch_size (int): Rows moved per transaction.
+        now (datetime): The time the age is measured from.
+        progress (callable, optional): Called with the number of rows
+            moved so far after each batch.
+
+    Returns:
+        int: The number of transactions archived.
+    """
+    cutoff = now - timedelta(days=days)
+    moved = 0
+    last_id = 0
+
+    while True:
+        ids = db.session.scalars(
+            select(Transaction.id)
+            .where(
+                Transaction.id > last_id,
+                Transaction.type == TransactionType.RETURN,
+                Transaction.returned_on < cutoff,
+            )
+            .order_by(Transaction.id)
+            .limit(batch_size)
+        ).all()
+
+        if not ids:
+            db.session.commit()
+            return moved
+
+        archive_batch(ids)
+        moved += len(ids)
+        last_id = ids[-1]
+
+        if progress is not None:
+            progress(moved)
@@ -0,0 +1,94 @@
+"""Reconciliation of the loan counters with the ledger.
+
+``books.on_loan`` and ``members.books_borrowed`` are kept up to date by
+the issue and return statements themselves, but books and members can
+also be created and edited through the API, and rows can be deleted
+along with their history. ``counter_drift`` recounts the open loans from
+the ledger, one grouped query per counter, and lists the rows whose
+counter disagrees; ``fix_drift`` writes the recounted values back.
+"""
+from app import db
+from sqlalchemy import bindparam, case, func, select, update
+from ..models import Book, Member, Transaction
+from ..utils import TransactionType
+from ..versions import mark_changed
+
+# table name, counter column, ledger column
+COUNTERS = (
+    ("books", Book.__table__.c.on_loan, Transaction.book_id),
+    ("members", Member.__table__.c.books_borrowed, Transaction.member_id),
+)
+
+
+def counter_drift():
+    """Compares the loan counters with the open loans in the ledger.
+
+    Returns:
+        dict: Lists of (id, stored, counted) tuples by table name.
+    """
+    drift = {}
+
+    for name, counter, ledger_column in COUNTERS:
+        loans = (
+            select(ledger_column.label("id"), func.count().label("open"))
+            .where(Transaction.type == TransactionType.ISSUE)
+            .group_by(ledger_column)
+            .subquery()
+        )
+        table = counter.table
+        counted = func.coalesce(loans.c.open, 0)
+
+        drift[name] = db.session.execute(
+            select(table.c.id, counter, counted)
+            .outerjoin(loans, loans.c.id == table.c.id)
+            .where(func.coalesce(counter, -1) != counted)
+            .order_by(table.c.id)
+        ).all()
+
+    return drift
+
+
+def fix_drift(drift):
+    """Sets the counters of counter_drift() rows to the counted values.
+
+    A book keeps its total number of copies: copies wrongly counted as on
+    loan go back on the shelf, and the other way round, never below zero.
+
+    Args:
+        drift (dict): The result of counter_drift().
+    """
+    books = Book.__table__
+    members = Member.__table__
+    shelved = books.c.quantity + books.c.on_loan - bindparam("counted")
+
+    if drift["books"]:
+        db.session.execute(
+            update(books)
+            .where(books.c.id == bindparam("book_id"))
+            .values(
+                on_loan=bindparam("counted"),
+                quantity=case((shelved < 0, 0), else_=shelved),
+                version=books.c.version + 1,
+            ),
+            [
+                {"book_id": book_id, "counted": counted}
+                for book_id, _, counted in drift["books"]
+            ],
+        )
+
+    if drift["members"]:
+        db.session.execute(
+            update(members)
+            .where(members.c.id == bindparam("member_id"))
+            .values(books_borrowed=bindparam("counted"), version=members.c.version + 1),
+            [
+                {"member_id": member_id, "counted": counted}
+                for member_id, _, counted in drift["members"]
+            ],
+        )
+
+    changed = [name for name, rows in drift.items() if rows]
+
+    if changed:
+        mark_changed(*changed)
+        db.session.commit()
@@ -0,0 +1,495 @@
+"""Issue and return operations on the transactions ledger.
+
+The counters on ``books`` (``quantity`` on the shelf, ``on_loan``) and
+``members`` (``books_borrowed``, the open loans) are changed with
+conditional single-statement updates (``UPDATE ... WHERE quantity > 0``)
+and the affected row count decides whether the operation went through. The
+database serializes those statements per row, so two workers racing for
+the last copy cannot both succeed and a member cannot pass the borrowing
+limit, without locking anything beyond the rows involved.
+
+``issue_many`` and ``retrieve_many`` do the same for several books of one
+member at once: the member, the books and the open loans are read with one
+query each, the limits are checked across the whole batch, and either
+every book goes through in a single commit or none does.
+
+The operations leave their changes uncommitted; the views commit them
+through ``idempotent``, in the same transaction as the stored
+Idempotency-Key response.
+"""
+from app import db
+from datetime import datetime
+from sqlalchemy import case, func, select, update
+from ..models import Book, Member, Transaction
+from ..versions import mark_changed
+from ..utils import (
+    ALLOWED_BORROW_PERIOD,
+    MAX_BOOKS_BORROWED,
+    MAX_DEBT,
+    TransactionType,
+)
+
+
+class TransactionError(Exception):
+    """Raised when an issue or return cannot be recorded."""
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+class BatchError(TransactionError):
+    """Raised when some books of a batch cannot be issued or returned.
+
+    Args:
+        results (list): One result dict per requested book.
+    """
+
+    def __init__(self, results):
+        super().__init__("Batch rejected, no books were processed")
+        self.results = results
+
+
+def compute_penalty(issued_on, penalty_fee, now):
+    """Computes the charge for a loan returned at a given time.
+
+    Args:
+        issued_on (datetime): When the book was issued.
+        penalty_fee (int): The book's fee per overdue day.
+        now (datetime): When the book is returned.
+
+    Returns:
+        int: The penalty, capped at MAX_DEBT.
+    """
+    days = int((now - issued_on).total_seconds() // 86400)
+
+    if days <= ALLOWED_BORROW_PERIOD:
+        return 0
+
+    return min((days - ALLOWED_BORROW_PERIOD) * penalty_fee, MAX_DEBT)
+
+
+def capped_debt(extra):
+    """Member debt plus an amount, capped at MAX_DEBT."""
+    return case(
+        (Member.debt + extra > MAX_DEBT, MAX_DEBT),
+        else_=Member.debt + extra,
+    )
+
+
+def fail(message):
+    """Rolls back the current transaction and raises a TransactionError."""
+    db.session.rollback()
+    raise TransactionError(message)
+
+
+def refuse_member(member_id):
+    """Rolls back a failed member claim and raises the reason it failed.
+
+    The guarded update checks the borrowing limit and the debt at once,
+    so the member is read again to tell which one stopped it.
+    """
+    db.session.rollback()
+    debt = db.session.scalar(select(Member.debt).where(Member.id == member_id))
+
+    if debt is not None and debt > 0:
+        fail("Member must pay pending penalties!")
+
+    fail(f"Member cannot borrow more than {MAX_BOOKS_BORROWED} books!")
+
+
+def issue(member_id, book_id):
+    """Issues a book to a member.
+
+    Args:
+        member_id (int): The member's id.
+        book_id (int): The book's id.
+
+    Raises:
+        TransactionError: If the member may not borrow the book.
+
+    Returns:
+        Transaction: The new issue record.
+    """
+    member = db.session.get(Member, member_id)
+    book = db.session.get(Book, book_id)
+
+    # cheap early answers; the guarded updates below are authoritative
+    if member is None:
+        raise TransactionError("Cannot get member!")
+
+    if member.books_borrowed >= MAX_BOOKS_BORROWED:
+        raise TransactionError(
+            f"Member cannot borrow more than {MAX_BOOKS_BORROWED} books!"
+        )
+
+    if member.debt > 0:
+        raise TransactionError("Member must pay pending penalties!")
+
+    if book is None:
+        raise TransactionError("Cannot get book!")
+
+    if book.quantity <= 0:
+        raise TransactionError("Book not available")
+
+    # claiming the member row first also serializes concurrent issues to
+    # the same member, so the duplicate check below cannot race
+    claimed = db.session.execute(
+        update(Member)
+        .where(
+            Member.id == member_id,
+            Member.books_borrowed < MAX_BOOKS_BORROWED,
+            Member.debt <= 0,
+        )
+        .values(
+            books_borrowed=Member.books_borrowed + 1, version=Member.version + 1
+        )
+    ).rowcount
+
+    if not claimed:
+        refuse_member(member_id)
+
+    issue_record = Transaction.query.filter_by(
+        book_id=book_id, member_id=member_id, type=TransactionType.ISSUE
+    ).first()
+
+    if issue_record is not None:
+        fail("Book already issued to member")
+
+    claimed = db.session.execute(
+        update(Book)
+        .where(Book.id == book_id, Book.quantity > 0)
+        .values(
+            quantity=Book.quantity - 1,
+            on_loan=Book.on_loan + 1,
+            version=Book.version + 1,
+        )
+    ).rowcount
+
+    if not claimed:
+        fail("Book not available")
+
+    record = Transaction(
+        book_id=book_id,
+        member_id=member_id,
+        type=TransactionType.ISSUE,
+        issued_on=datetime.now(),
+    )
+
+    db.session.add(record)
+    mark_changed("books", "members", "transactions")
+
+    return record
+
+
+def retrieve(member_id, book_id):
+    """Records the return of a book and charges any overdue penalty.
+
+    Args:
+        member_id (int): The member's id.
+        book_id (int): The book's id.
+
+    Raises:
+        TransactionError: If the book is not on loan to the member.
+
+    Returns:
+        int: The penalty charged.
+    """
+    book_record = Transaction.query.filter_by(
+        book_id=book_id, member_id=member_id, type=TransactionType.ISSUE
+    ).first()
+
+    if book_record is None:
+        raise TransactionError("Book not issued to member!")
+
+    member = db.session.get(Member, member_id)
+    book = db.session.get(Book, book_id)
+
+    if member is None:
+        raise TransactionError("Cannot get member details from database!")
+
+    if book is None:
+        raise TransactionError("Connot retrieve book data from the database.")
+
+    now = datetime.now()
+    penalty_amount = compute_penalty(book_record.issued_on, book.penalty_fee, now)
+
+    # only one concurrent return of the same loan can close it
+    closed = db.session.execute(
+        update(Transaction)
+        .where(
+            Transaction.id == book_record.id,
+            Transaction.type == TransactionType.ISSUE,
+        )
+        .values(
+            type=TransactionType.RETURN,
+            returned_on=now,
+            charge=penalty_amount,
+            version=Transaction.version + 1,
+        )
+    ).rowcount
+
+    if not closed:
+        fail("Book not issued to member!")
+
+    # the penalty sweep may have charged part of it already; the loan is
+    # closed now, so its accrued charge can no longer change
+    accrued = (
+        select(Transaction.accrued_charge)
+        .where(Transaction.id == book_record.id)
+        .scalar_subquery()
+    )
+
+    db.session.execute(
+        update(Book)
+        .where(Book.id == book_id)
+        .values(
+            quantity=Book.quantity + 1,
+            on_loan=Book.on_loan - 1,
+            version=Book.version + 1,
+        )
+    )
+    db.session.execute(
+        update(Member)
+        .where(Member.id == member_id)
+        .values(
+            books_borrowed=Member.books_borrowed - 1,
+            version=Member.version + 1,
+            debt=capped_debt(penalty_amount - accrued),
+        )
+    )
+    mark_changed("books", "members", "transactions")
+
+    return penalty_amount
+
+
+def batch_results(book_ids, errors):
+    """Builds the per-book results of a rejected batch.
+
+    Args:
+        book_ids (list): The requested book ids, in request order.
+        errors (dict): Error message by position in book_ids.
+
+    Returns:
+        list: One result dict per requested book.
+    """
+    return [
+        {"book_id": book_id, "ok": False, "Error": errors[position]}
+        if position in errors
+        else {"book_id": book_id, "ok": True}
+        for position, book_id in enumerate(book_ids)
+    ]
+
+
+def duplicate_positions(book_ids):
+    """Maps the positions of repeated book ids to an error message."""
+    seen = set()
+    errors = {}
+
+    for position, book_id in enumerate(book_ids):
+        if book_id in seen:
+            errors[position] = "Book requested more than once"
+        seen.add(book_id)
+
+    return errors
+
+
+def open_loans(member_id, book_ids):
+    """Loads a member's open loans of some books in one query.
+
+    Returns:
+        dict: (Transaction, penalty fee) rows by book id.
+    """
+    rows = db.session.execute(
+        select(Transaction, Book.penalty_fee)
+        .join(Book, Transaction.book_id == Book.id)
+        .where(
+            Transaction.member_id == member_id,
+            Transaction.book_id.in_(book_ids),
+            Transaction.type == TransactionType.ISSUE,
+        )
+    ).all()
+
+    return {loan.book_id: (loan, penalty_fee) for loan, penalty_fee in rows}
+
+
+def issue_many(member_id, book_ids):
+    """Issues several books to a member, all or none.
+
+    Args:
+        member_id (int): The member's id.
+        book_ids (list): The books' ids.
+
+    Raises:
+        TransactionError: If the member may not borrow that many books.
+        BatchError: If any of the books cannot be issued.
+
+    Returns:
+        list: One result dict per requested book.
+    """
+    member = db.session.get(Member, member_id)
+
+    if member is None:
+        raise TransactionError("Cannot get member!")
+
+    if member.debt > 0:
+        raise TransactionError("Member must pay pending penalties!")
+
+    if member.books_borrowed + len(set(book_ids)) > MAX_BOOKS_BORROWED:
+        raise TransactionError(
+            f"Member cannot borrow more than {MAX_BOOKS_BORROWED} books!"
+        )
+
+    books = {
+        book.id: book
+        for book in db.session.scalars(select(Book).where(Book.id.in_(book_ids)))
+    }
+    count = len(set(book_ids))
+
+    # claim the member row first, as issue() does, so the open loan check
+    # below cannot race with another issue to the same member
+    claimed = db.session.execute(
+        update(Member)
+        .where(
+            Member.id == member_id,
+            Member.books_borrowed <= MAX_BOOKS_BORROWED - count,
+            Member.debt <= 0,
+        )
+        .values(
+            books_borrowed=Member.books_borrowed + count, version=Member.version + 1
+        )
+    ).rowcount
+
+    if not claimed:
+        refuse_member(member_id)
+
+    loans = open_loans(member_id, book_ids)
+    errors = duplicate_positions(book_ids)
+
+    for position, book_id in enumerate(book_ids):
+        book = books.get(book_id)
+
+        if position in errors:
+            continue
+        elif book is None:
+            errors[position] = "Cannot get book!"
+        elif book.quantity <= 0:
+            errors[position] = "Book not available"
+        elif book_id in loans:
+            errors[position] = "Book already issued to member"
+
+    if errors:
+        db.session.rollback()
+        raise BatchError(batch_results(book_ids, errors))
+
+    claimed = db.session.execute(
+        update(Book)
+        .where(Book.id.in_(book_ids), Book.quantity > 0)
+        .values(
+            quantity=Book.quantity - 1,
+            on_loan=Book.on_loan + 1,
+            version=Book.version + 1,
+        )
+    ).rowcount
+
+    if claimed != count:
+        fail("Book not available")
+
+    now = datetime.now()
+    db.session.add_all(
+        Transaction(
+            book_id=book_id,
+            member_id=member_id,
+            type=TransactionType.ISSUE,
+            issued_on=now,
+        )
+        for book_id in book_ids
+    )
+    mark_changed("books", "members", "transactions")
+
+    return batch_results(book_ids, {})
+
+
+def retrieve_many(member_id, book_ids):
+    """Records the return of several books of a member, all or none.
+
+    Args:
+        member_id (int): The member's id.
+        book_ids (list): The books' ids.
+
+    Raises:
+        TransactionError: If the member does not exist.
+        BatchError: If any of the books is not on loan to the member.
+
+    Returns:
+        list: One result dict per requested book, with the charge.
+    """
+    member = db.session.get(Member, member_id)
+
+    if member is None:
+        raise TransactionError("Cannot get member details from database!")
+
+    loans = open_loans(member_id, book_ids)
+    errors = duplicate_positions(book_ids)
+
+    for position, book_id in enumerate(book_ids):
+        if position not in errors and book_id not in loans:
+            errors[position] = "Book not issued to member!"
+
+    if errors:
+        raise BatchError(batch_results(book_ids, errors))
+
+    now = datetime.now()
+    results = []
+
+    for book_id in book_ids:
+        loan, penalty_fee = loans[book_id]
+        charge = compute_penalty(loan.issued_on, penalty_fee, now)
+
+        closed = db.session.execute(
+            update(Transaction)
+            .where(
+                Transaction.id == loan.id,
+                Transaction.type == TransactionType.ISSUE,
+            )
+            .values(
+                type=TransactionType.RETURN,
+                returned_on=now,
+                charge=charge,
+                version=Transaction.version + 1,
+            )
+        ).rowcount
+
+        if not closed:
+            fail("Book not issued to member!")
+
+        results.append({"book_id": book_id, "ok": True, "charge": charge})
+
+    total = sum(result["charge"] for result in results)
+    accrued = (
+        select(func.sum(Transaction.accrued_charge))
+        .where(Transaction.id.in_([loan.id for loan, _ in loans.values()]))
+        .scalar_subquery()
+    )
+
+    db.session.execute(
+        update(Book)
+        .where(Book.id.in_(book_ids))
+        .values(
+            quantity=Book.quantity + 1,
+            on_loan=Book.on_loan - 1,
+            version=Book.version + 1,
+        )
+    )
+    db.session.execute(
+        update(Member)
+        .where(Member.id == member_id)
+        .values(
+            books_borrowed=Member.books_borrowed - len(book_ids),
+            version=Member.version + 1,
+            debt=capped_debt(total - accrued),
+        )
+    )
+    mark_changed("books", "members", "transactions")
+
+    return results
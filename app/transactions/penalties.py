@@ -0,0 +1,167 @@
+"""Overdue penalty sweep.
+
+Penalties used to reach a member's debt only when the book came back.
+``sweep_penalties`` runs from cron (``flask sweep-penalties``) and
+charges overdue loans while they are still open. It computes each open
+loan's penalty so far in SQL, stores it in ``accrued_charge``, and adds
+the difference from the previous sweep to the member's debt. A return
+then charges only what has not been accrued yet.
+
+Loans are processed in windows of ``batch_size`` ids, each in its own
+transaction of three statements. A run therefore never holds locks for
+long, however large the ledger is.
+"""
+from app import db
+from datetime import timedelta
+from sqlalchemy import DateTime, and_, case, func, literal, select, update
+from ..models import Book, Member, Transaction
+from ..sql import days_between
+from ..utils import ALLOWED_BORROW_PERIOD, MAX_DEBT, TransactionType
+from ..versions import mark_changed
+from .operations import capped_debt
+
+
+def penalty_expression(now, penalty_fee=None):
+    """The SQL twin of compute_penalty for the current Transaction row.
+
+    Args:
+        now (datetime): The time the penalty is computed for.
+        penalty_fee (optional): The book's fee, for queries already joining
+            books. Looked up with a subquery otherwise.
+
+    Returns:
+        ColumnElement: The penalty, capped at MAX_DEBT.
+    """
+    if penalty_fee is None:
+        penalty_fee = (
+            select(Book.penalty_fee)
+            .where(Book.id == Transaction.book_id)
+            .scalar_subquery()
+        )
+    overdue = (
+        days_between(Transaction.issued_on, literal(now, DateTime))
+        - ALLOWED_BORROW_PERIOD
+    )
+
+    return case(
+        (overdue <= 0, 0),
+        (overdue * penalty_fee > MAX_DEBT, MAX_DEBT),
+        else_=overdue * penalty_fee,
+    )
+
+
+def overdue_rows(now):
+    """Builds the query behind the overdue loans report.
+
+    Open loans old enough to accrue a penalty are found with the
+    ``(type, issued_on)`` index; the days overdue and the penalty the
+    member would be charged if the book came back now are computed in the
+    same statement.
+
+    Args:
+        now (datetime): The time the report is computed for.
+
+    Returns:
+        Query: A query yielding rows with the serialized columns.
+    """
+    days_overdue = (
+        days_between(Transaction.issued_on, literal(now, DateTime))
+        - ALLOWED_BORROW_PERIOD
+    )
+
+    return (
+        db.session.query(
+            Transaction.id,
+            Transaction.book_id,
+            Book.title.label("book_title"),
+            Transaction.member_id,
+            Member.name.label("member_name"),
+            Transaction.issued_on,
+            days_overdue.label("days_overdue"),
+            Transaction.accrued_charge,
+            penalty_expression(now, Book.penalty_fee).label("projected_penalty"),
+        )
+        .outerjoin(Book, Transaction.book_id == Book.id)
+        .outerjoin(Member, Transaction.member_id == Member.id)
+        .filter(
+            Transaction.type == TransactionType.ISSUE,
+            Transaction.issued_on
+            <= now - timedelta(days=ALLOWED_BORROW_PERIOD + 1),
+        )
+    )
+
+
+def sweep_window(low, high, now):
+    """Accrues the penalties of the open loans with ids in [low, high).
+
+    Returns:
+        int: The number of loans whose accrued charge changed.
+    """
+    penalty = penalty_expression(now)
+    changed = and_(
+        Transaction.id >= low,
+        Transaction.id < high,
+        Transaction.type == TransactionType.ISSUE,
+        Transaction.accrued_charge != penalty,
+    )
+
+    # lock the loans first (a no-op on SQLite, where the writes below
+    # serialize anyway) so no return can close one between the statements
+    db.session.execute(select(Transaction.id).where(changed).with_for_update())
+
+    delta = (
+        select(func.sum(penalty - Transaction.accrued_charge))
+        .where(changed, Transaction.member_id == Member.id)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        update(Member)
+        .where(Member.id.in_(select(Transaction.member_id).where(changed)))
+        .values(debt=capped_debt(delta), version=Member.version + 1),
+        execution_options={"synchronize_session": False},
+    )
+
+    updated = db.session.execute(
+        update(Transaction)
+        .where(changed)
+        .values(accrued_charge=penalty, version=Transaction.version + 1),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+
+    if updated:
+        mark_changed("members", "transactions")
+
+    db.session.commit()
+
+    return updated
+
+
+def sweep_penalties(batch_size, now, progress=None):
+    """Accrues the penalties of every open loan.
+
+    Args:
+        batch_size (int): Transaction ids covered per window and commit.
+        now (datetime): The time the penalties are computed for.
+        progress (callable, optional): Called with the id reached and the
+            loans updated so far after each window.
+
+    Returns:
+        int: The number of loans whose accrued charge changed.
+    """
+    first, last = db.session.execute(
+        select(func.min(Transaction.id), func.max(Transaction.id)).where(
+            Transaction.type == TransactionType.ISSUE
+        )
+    ).one()
+    db.session.commit()
+
+    if first is None:
+        return 0
+
+    updated = 0
+    for low in range(first, last + 1, batch_size):
+        updated += sweep_window(low, low + batch_size, now)
+        if progress is not None:
+            progress(min(low + batch_size - 1, last), updated)
+
+    return updated
@@ -1,11 +1,25 @@
 from app import db
 from app.transactions import transactions_bp
-from datetime import datetime
 from flask import jsonify, request
 from pydantic import ValidationError
-from ..utils import TransactionType, ALLOWED_BORROW_PERIOD
-from ..schema import BookRequestSchema
+from .archive import archived_rows
+from .penalties import overdue_rows
+from .operations import (
+    BatchError,
+    TransactionError,
+    issue,
+    issue_many,
+    retrieve,
+    retrieve_many,
+)
+from ..metrics import BOOKS_ISSUED, record_return
+from ..schema import BatchRequestSchema, BookRequestSchema
 from ..models import Transaction, Member, Book
+from ..pagination import InvalidCursor, paginate_request, uses_cursor
+from ..export import export_response
+from ..versions import InvalidSince, changed_since, conditional
+from ..idempotency import idempotent
+from datetime import datetime
 from math import ceil
 
 member_error_dict = {"Error": "Cannot get member!"}
@@ -15,6 +29,58 @@ record_error_dict = {"Error": "Cannot retrieve book record"}
 book_not_issued_error_dict = {"Error": "Book not issued to member!"}
 
 
+def transaction_rows(include_archive=False):
+    """Builds the projection query behind the transaction listings.
+
+    Book titles and member names are joined in the same statement so a page
+    of transactions is one SELECT rather than one plus two per row.
+
+    Args:
+        include_archive (bool, optional): Whether to add the archived
+            transactions with UNION ALL. Defaults to False.
+
+    Returns:
+        Query: A query yielding rows with the serialized columns.
+    """
+    query = (
+        db.session.query(
+            Transaction.id,
+            Transaction.book_id,
+            Book.title.label("book_title"),
+            Transaction.member_id,
+            Member.name.label("member_name"),
+            Transaction.type,
+            Transaction.issued_on,
+            Transaction.returned_on,
+            Transaction.charge,
+            Transaction.updated_at,
+            Transaction.version,
+        )
+        .outerjoin(Book, Transaction.book_id == Book.id)
+        .outerjoin(Member, Transaction.member_id == Member.id)
+    )
+
+    if include_archive:
+        query = query.union_all(archived_rows())
+
+    return query.order_by(Transaction.id)
+
+
+def transaction_to_dict(row):
+    """Serializes a row of transaction_rows() for JSON responses.
+
+    Args:
+        row (Row): The transaction row.
+
+    Returns:
+        dict: The transaction data.
+    """
+    data = row._asdict()
+    data["updated_at"] = row.updated_at.isoformat()
+
+    return data
+
+
 @transactions_bp.route("/hello", methods=["GET"])
 def hello_world():
     """Returns a hello string.
@@ -26,6 +92,7 @@ def hello_world():
 
 
 @transactions_bp.route("/issue_book", methods=["GET", "POST"])
+@idempotent
 def issue_book():
     """Issues a book to a member if the member is allowed to.
 
@@ -37,49 +104,8 @@ def issue_book():
     try:
         return_schema = BookRequestSchema(**data)
 
-        member_id = return_schema.member_id
-        book_id = return_schema.book_id
-
-        member = db.session.get(Member, member_id)
-        book = db.session.get(Book, book_id)
-
-        if member is None:
-            return member_error_dict, 400
-
-        if member.books_borrowed >= 3:
-            return jsonify({"Error": "Member cannot borrow more than 3 books!"}), 400
-
-        if member.debt > 0:
-            return jsonify({"Error": "Member must pay pending penalties!"}), 400
-
-        if book is None:
-            return book_error_dict, 400
-
-        if book.quantity == 0:
-            return jsonify({"Error": "Book not available"}), 400
-
-        # search for existing transaction
-        issue_record = Transaction.query.filter_by(
-            book_id=book_id, member_id=member_id, type=TransactionType.ISSUE
-        ).first()
-
-        if issue_record is not None:
-            return jsonify({"Error": "Book already issued to member"}), 400
-
-        book.quantity -= 1
-        member.books_borrowed += 1
-
-        record = Transaction(
-            book_id=book_id,
-            member_id=member_id,
-            type=TransactionType.ISSUE,
-        )
-
-        db.session.merge(book)
-        db.session.merge(member)
-        db.session.add(record)
-
-        db.session.commit()
+        issue(return_schema.member_id, return_schema.book_id)
+        BOOKS_ISSUED.inc()
 
         return (
             jsonify(
@@ -94,11 +120,16 @@ def issue_book():
     except ValidationError as e:
         return jsonify({"Error": "Validation failed", "Details": e.errors()}), 400
 
+    except TransactionError as e:
+        return jsonify({"Error": e.message}), 400
+
     except Exception as e:
+        db.session.rollback()
         return jsonify({"Error": "Cannot complete transaction", "Details": str(e)}), 400
 
 
 @transactions_bp.route("/retrieve_book", methods=["POST", "GET", "PUT"])
+@idempotent
 def retrieve_book():
     """Takes record of book returned.
 
@@ -110,61 +141,101 @@ def retrieve_book():
     try:
         request_schema = BookRequestSchema(**data)
 
-        book_id = request_schema.book_id
-        member_id = request_schema.member_id
+        charge = retrieve(request_schema.member_id, request_schema.book_id)
+        record_return(charge)
+
+        return (
+            jsonify(
+                {
+                    "Message": "Return transaction recorded successfully",
+                    "Transaction": request_schema.model_dump(),
+                }
+            ),
+            200,
+        )
+
+    except ValidationError as e:
+        return jsonify({"Error": "Validation failed", "Details": e.errors()}), 400
+
+    except TransactionError as e:
+        return jsonify({"Error": e.message}), 400
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"Message": "Cannot complete transaction", "Error": str(e)}), 400
+
+
+@transactions_bp.route("/issue_books", methods=["POST"])
+@idempotent
+def issue_books():
+    """Issues several books to a member in one transaction.
+
+    Either every book is issued or none is; the response lists the outcome
+    for each requested book.
 
-        book_record = Transaction.query.filter_by(
-            book_id=book_id, member_id=member_id, type=TransactionType.ISSUE
-        ).first()
+    Returns:
+        dict: Dictionary response message with per-book results.
+    """
+    data = request.json
 
-        if book_record is None:
-            return jsonify(book_not_issued_error_dict), 400
+    try:
+        batch_schema = BatchRequestSchema(**data)
 
-        member = db.session.get(Member, member_id)
-        book = db.session.get(Book, book_id)
+        results = issue_many(batch_schema.member_id, batch_schema.book_ids)
+        BOOKS_ISSUED.inc(len(results))
 
-        if member is None:
-            return jsonify({"Error": "Cannot get member details from database!"}), 400
+        return (
+            jsonify(
+                {
+                    "Message": "Books issued successfully",
+                    "member_id": batch_schema.member_id,
+                    "results": results,
+                }
+            ),
+            201,
+        )
 
-        if book is None:
-            return ({"Error": "Connot retrieve book data from the database."}), 400
+    except ValidationError as e:
+        return jsonify({"Error": "Validation failed", "Details": e.errors()}), 400
 
-        date_of_issue = book_record.issued_on
+    except BatchError as e:
+        return jsonify({"Error": e.message, "results": e.results}), 400
 
-        # calculate charges
-        difference = datetime.now() - date_of_issue
-        days = difference.total_seconds() // 86400
-        penalty_amount = 0
-        if days > ALLOWED_BORROW_PERIOD:
-            extra_time = days - ALLOWED_BORROW_PERIOD
-            penalty_amount = extra_time * book.penalty_fee
+    except TransactionError as e:
+        return jsonify({"Error": e.message}), 400
 
-            if penalty_amount > 500:
-                penalty_amount = 500
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"Error": "Cannot complete transaction", "Details": str(e)}), 400
 
-            member.debt += penalty_amount
-            if member.debt + penalty_amount > 500:
-                member.debt = 500
 
-        book.quantity += 1
-        member.books_borrowed -= 1
+@transactions_bp.route("/retrieve_books", methods=["POST"])
+@idempotent
+def retrieve_books():
+    """Takes record of several books returned by a member in one transaction.
 
-        # update the book record
-        book_record.returned_on = datetime.now()
-        book_record.charge = penalty_amount
-        book_record.type = TransactionType.RETURN
+    Either every return is recorded or none is; the response lists the
+    charge for each book.
 
-        db.session.merge(book)
-        db.session.merge(member)
-        db.session.merge(book_record)
+    Returns:
+        dict: Dictionary response message with per-book results.
+    """
+    data = request.json
 
-        db.session.commit()
+    try:
+        batch_schema = BatchRequestSchema(**data)
+
+        results = retrieve_many(batch_schema.member_id, batch_schema.book_ids)
+        for result in results:
+            record_return(result["charge"])
 
         return (
             jsonify(
                 {
-                    "Message": "Return transaction recorded successfully",
-                    "Transaction": request_schema.model_dump(),
+                    "Message": "Return transactions recorded successfully",
+                    "member_id": batch_schema.member_id,
+                    "charge": sum(result["charge"] for result in results),
+                    "results": results,
                 }
             ),
             200,
@@ -173,22 +244,57 @@ def retrieve_book():
     except ValidationError as e:
         return jsonify({"Error": "Validation failed", "Details": e.errors()}), 400
 
+    except BatchError as e:
+        return jsonify({"Error": e.message, "results": e.results}), 400
+
+    except TransactionError as e:
+        return jsonify({"Error": e.message}), 400
+
     except Exception as e:
+        db.session.rollback()
         return jsonify({"Message": "Cannot complete transaction", "Error": str(e)}), 400
 
 
 @transactions_bp.route("/get_transactions", methods=["GET"])
+@conditional("books", "members", "transactions")
 def get_transactions():
     """Returns all transaction records in pagination.
 
+    Pass ``cursor`` (empty for the first page) instead of ``page`` to use
+    keyset pagination; ``with_total=false`` skips the total count.
+    ``since`` keeps only transactions changed at or after a timestamp.
+    ``include_archive=true`` also lists the archived transactions.
+
     Returns:
         dict: Dictionary response message.
     """
+    include_archive = request.args.get("include_archive", default="false")
+    include_archive = include_archive.lower() in ("true", "1", "yes")
+
+    try:
+        query = changed_since(
+            transaction_rows(include_archive), Transaction.updated_at
+        )
+    except InvalidSince as e:
+        return jsonify({"Error": str(e)}), 400
+
+    if uses_cursor():
+        try:
+            transactions = paginate_request(query, Transaction.id)
+        except InvalidCursor as e:
+            return jsonify({"Error": str(e)}), 400
+
+        transactions_list = [
+            transaction_to_dict(transaction) for transaction in transactions
+        ]
+
+        return jsonify(transactions.to_dict("transactions", transactions_list)), 200
+
     page = request.args.get("page", default=1, type=int)
     per_page = request.args.get("per_page", default=10, type=int)
 
     try:
-        transactions = Transaction.query.paginate(page=page, per_page=per_page)
+        transactions = query.paginate(page=page, per_page=per_page)
 
         if transactions.total == 0:
             return jsonify({"Message": "No transactions found"}), 400
@@ -196,18 +302,7 @@ def get_transactions():
         total_pages = ceil(transactions.total / per_page)
 
         transactions_list = [
-            {
-                "id": transaction.id,
-                "book_id": transaction.book_id,
-                "book_title": transaction.book.title,
-                "member_id": transaction.member_id,
-                "member_name": transaction.member.name,
-                "type": transaction.type,
-                "issued_on": transaction.issued_on,
-                "returned_on": transaction.returned_on,
-                "charge": transaction.charge,
-            }
-            for transaction in transactions
+            transaction_to_dict(transaction) for transaction in transactions
         ]
 
         return jsonify(
@@ -226,3 +321,36 @@ def get_transactions():
         )
     except Exception as e:
         return jsonify({"Error": str(e)}), 400
+
+
+@transactions_bp.route("/overdue", methods=["GET"])
+def get_overdue():
+    """Lists open loans past the borrowing period, oldest loan first.
+
+    Each loan comes with its days overdue, the penalty accrued by the
+    sweep so far and the penalty due if the book were returned now.
+    Paginated by cursor; ``with_total=false`` skips the total count.
+
+    Returns:
+        dict: Cursor page with the overdue loans as list.
+    """
+    try:
+        loans = paginate_request(
+            overdue_rows(datetime.now()), Transaction.id, order=Transaction.issued_on
+        )
+    except InvalidCursor as e:
+        return jsonify({"Error": str(e)}), 400
+
+    loans_list = [loan._asdict() for loan in loans]
+
+    return jsonify(loans.to_dict("loans", loans_list)), 200
+
+
+@transactions_bp.route("/export", methods=["GET"])
+def export_transactions():
+    """Streams every transaction record as NDJSON or CSV (?format=ndjson|csv).
+
+    Returns:
+        Response: The streamed export.
+    """
+    return export_response(transaction_rows(), "transactions")
@@ -1,3 +1,4 @@
+from datetime import datetime, timezone
 from enum import Enum
 
 
@@ -6,3 +7,14 @@ class TransactionType(str, Enum):
     ISSUE = 'issue'
 
 ALLOWED_BORROW_PERIOD = 7
+MAX_BOOKS_BORROWED = 3
+MAX_DEBT = 500
+# books per batch issue or return request
+MAX_BATCH_SIZE = 20
+# ids per get_many request
+MAX_LOOKUP_IDS = 200
+
+
+def utcnow():
+    """Returns the current UTC time as a naive datetime."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
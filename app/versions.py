@@ -0,0 +1,247 @@
+"""Table versions and conditional GETs.
+
+Every write to ``books``, ``members`` or ``transactions`` calls
+``mark_changed`` before committing. Once the transaction commits, the
+table's row in ``table_versions`` is bumped in a short transaction of its
+own, and the response cache namespaces of the changed tables are
+invalidated. Bumping inside the write's transaction would hold the
+version row locks until commit and serialize every writer on them. A
+bump that fails is retried by the worker's next commit or conditional
+GET, and until it succeeds responses built from its tables never get a
+304. The list and detail endpoints derive their ``ETag`` and ``Last-Modified``
+headers from those versions, so a client revalidating with
+``If-None-Match`` or ``If-Modified-Since`` gets ``304 Not Modified`` after
+a single primary key lookup, without the view's query or serialization
+running.
+
+Rows themselves carry ``updated_at`` and ``version``; ``?since=`` on the
+list endpoints returns only rows changed at or after a timestamp, for
+replicas pulling deltas. Deleted rows are not part of the feed.
+"""
+import threading
+
+from app import db
+from datetime import datetime, timezone
+from flask import Response, current_app, has_app_context, request
+from functools import wraps
+from werkzeug.http import parse_date
+from sqlalchemy import event, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from .cache import invalidate
+from .models import TableVersion
+from .utils import utcnow
+
+TRACKED_TABLES = ("books", "members", "transactions")
+
+pending_lock = threading.Lock()
+
+
+@event.listens_for(TableVersion.__table__, "after_create")
+def seed_table_versions(target, connection, **kw):
+    """Adds a version row for each tracked table."""
+    connection.execute(
+        target.insert(),
+        [
+            {"name": name, "version": 0, "updated_at": utcnow()}
+            for name in TRACKED_TABLES
+        ],
+    )
+
+
+def mark_changed(*tables):
+    """Records tables written in the current transaction.
+
+    Call it before committing; their versions are bumped once the
+    transaction commits.
+
+    Args:
+        *tables (str): Names of the changed tables.
+    """
+    db.session.info.setdefault("changed_tables", set()).update(tables)
+
+
+def pending_versions():
+    """Returns the tables of this worker whose version bump failed."""
+    return current_app.extensions.setdefault("pending_versions", set())
+
+
+def bump_versions(tables):
+    """Bumps the versions of some tables in a transaction of their own.
+
+    The data is committed already, so a failure cannot undo the write.
+    The tables are kept pending instead, and every later call (each
+    commit and each conditional GET of this worker) tries them again.
+    Rows are updated in name order so concurrent bumps always lock them
+    in the same order.
+
+    Args:
+        tables (iterable): Names of the changed tables.
+
+    Returns:
+        bool: False if the bump failed and the tables stay pending.
+    """
+    pending = pending_versions()
+
+    with pending_lock:
+        tables = set(tables) | pending
+        pending.clear()
+
+    if not tables:
+        return True
+
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(
+                update(TableVersion)
+                .where(TableVersion.name.in_(sorted(tables)))
+                .values(version=TableVersion.version + 1, updated_at=utcnow())
+            )
+    except SQLAlchemyError:
+        current_app.logger.exception(
+            "Could not bump the versions of %s", ", ".join(sorted(tables))
+        )
+        with pending_lock:
+            pending.update(tables)
+        return False
+
+    return True
+
+
+@event.listens_for(Session, "after_commit")
+def publish_changed_tables(session):
+    """Bumps the versions and drops the cached responses of the tables
+    changed by the transaction."""
+    tables = session.info.pop("changed_tables", None)
+
+    if tables and has_app_context():
+        bump_versions(tables)
+        invalidate(*tables)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def forget_changed_tables(session, previous_transaction):
+    """Forgets the changes of a rolled back transaction."""
+    session.info.pop("changed_tables", None)
+
+
+class InvalidSince(ValueError):
+    """Raised when the since argument is not a timestamp."""
+
+
+def parse_since(value):
+    """Parses an ISO 8601 or HTTP date into a naive UTC datetime.
+
+    Args:
+        value (str): The timestamp. Naive ISO values are taken as UTC.
+
+    Raises:
+        InvalidSince: If the value is not a timestamp.
+
+    Returns:
+        datetime: The timestamp.
+    """
+    try:
+        since = datetime.fromisoformat(value)
+    except ValueError:
+        since = parse_date(value)
+
+    if since is None:
+        raise InvalidSince(f"Invalid since timestamp: {value}")
+
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return since
+
+
+def changed_since(query, column):
+    """Applies the request's ``since`` argument to a list query.
+
+    Args:
+        query (Query): The list query.
+        column (Column): The ``updated_at`` column to filter on.
+
+    Raises:
+        InvalidSince: If ``since`` is not a timestamp.
+
+    Returns:
+        Query: The query, filtered when ``since`` is given.
+    """
+    since = request.args.get("since")
+
+    if not since:
+        return query
+
+    return query.filter(column >= parse_since(since))
+
+
+def table_versions(tables):
+    """Builds the validators of a response depending on some tables.
+
+    Args:
+        tables (tuple): Names of the tables the response is built from.
+
+    Returns:
+        tuple: (entity tag, last modification time or None)
+    """
+    rows = db.session.execute(
+        select(TableVersion.name, TableVersion.version, TableVersion.updated_at)
+        .where(TableVersion.name.in_(tables))
+        .order_by(TableVersion.name)
+    ).all()
+
+    tag = "-".join(f"{name}.{version}" for name, version, _ in rows)
+    last_modified = max((row.updated_at for row in rows), default=None)
+
+    return tag, last_modified
+
+
+def not_modified(tag, last_modified):
+    """Tells whether the request's validators match the current ones."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(tag)
+
+    if request.if_modified_since and last_modified is not None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+        return last_modified <= request.if_modified_since
+
+    return False
+
+
+def conditional(*tables):
+    """Adds ETag and Last-Modified to a GET view and answers 304 early.
+
+    The versions are read before the view runs and bumped after a change
+    commits, so the tag can only be older than the data, never newer.
+    While a bump of one of the tables is pending, the tag may describe
+    data that has changed since, so the view always runs.
+
+    Args:
+        *tables (str): Names of the tables the response is built from.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # retry the bumps left pending by earlier failures
+            bump_versions(())
+            stale = pending_versions() & set(tables)
+            tag, last_modified = table_versions(tables)
+
+            if not stale and not_modified(tag, last_modified):
+                response = Response(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(tag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,32 @@
+"""Gunicorn settings, loaded automatically from the working directory."""
+import os
+import shutil
+
+
+def on_starting(server):
+    """Clears metric files left over from a previous run."""
+    metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+    if not metrics_dir:
+        return
+
+    os.makedirs(metrics_dir, exist_ok=True)
+    for name in os.listdir(metrics_dir):
+        path = os.path.join(metrics_dir, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+
+def post_worker_init(worker):
+    """Starts building the worker's book suggestion index."""
+    worker.wsgi.extensions["suggest"].warm(worker.wsgi)
+
+
+def child_exit(server, worker):
+    """Drops the live gauges of a worker that exited."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,26 @@
+"""transactions type issued_on index
+
+Revision ID: 0a5d3e9f6c2b
+Revises: f2c6a8d4e7b1
+Create Date: 2026-10-18 20:12:58.734019
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a5d3e9f6c2b'
+down_revision = 'f2c6a8d4e7b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.create_index('ix_transactions_type_issued_on', ['type', 'issued_on'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_type_issued_on')
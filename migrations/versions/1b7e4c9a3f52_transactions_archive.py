@@ -0,0 +1,43 @@
+"""transactions archive
+
+Revision ID: 1b7e4c9a3f52
+Revises: 0a5d3e9f6c2b
+Create Date: 2026-10-18 21:04:37.182245
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b7e4c9a3f52'
+down_revision = '0a5d3e9f6c2b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('transactions_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=True),
+    sa.Column('member_id', sa.Integer(), nullable=True),
+    sa.Column('issued_on', sa.DateTime(), nullable=True),
+    sa.Column('returned_on', sa.DateTime(), nullable=True),
+    sa.Column('charge', sa.Integer(), nullable=True),
+    sa.Column('accrued_charge', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('transactions_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_transactions_archive_book_id'), ['book_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_transactions_archive_member_id'), ['member_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('transactions_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_transactions_archive_member_id'))
+        batch_op.drop_index(batch_op.f('ix_transactions_archive_book_id'))
+
+    op.drop_table('transactions_archive')
@@ -0,0 +1,48 @@
+"""books on loan
+
+Revision ID: 2c8f5a1d6e93
+Revises: 1b7e4c9a3f52
+Create Date: 2026-10-18 21:48:12.530917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c8f5a1d6e93'
+down_revision = '1b7e4c9a3f52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('on_loan', sa.Integer(), nullable=False, server_default='0'))
+
+    # copies out on loan are the open issue records of the ledger
+    op.execute(
+        "UPDATE books SET on_loan = ("
+        "SELECT count(*) FROM transactions "
+        "WHERE transactions.book_id = books.id AND transactions.type = 'issue')"
+    )
+
+    if op.get_bind().dialect.name != 'sqlite':
+        op.alter_column('books', 'on_loan', server_default=None)
+
+
+def downgrade():
+    bind = op.get_bind()
+    triggers = []
+    if bind.dialect.name == 'sqlite':
+        # dropping a column rebuilds the table on SQLite, which drops the
+        # books_fts triggers; recreate them afterwards
+        triggers = bind.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger'"
+        ).scalars().all()
+
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.drop_column('on_loan')
+
+    for sql in triggers:
+        op.execute(sql)
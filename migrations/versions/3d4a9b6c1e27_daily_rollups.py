@@ -0,0 +1,36 @@
+"""daily rollups
+
+Revision ID: 3d4a9b6c1e27
+Revises: 2c8f5a1d6e93
+Create Date: 2026-10-18 22:31:05.664318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d4a9b6c1e27'
+down_revision = '2c8f5a1d6e93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_book_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('book_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('issues', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'book_id')
+    )
+    op.create_table('daily_member_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('member_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('issues', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'member_id')
+    )
+
+
+def downgrade():
+    op.drop_table('daily_member_stats')
+    op.drop_table('daily_book_stats')
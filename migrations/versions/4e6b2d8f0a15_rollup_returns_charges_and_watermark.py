@@ -0,0 +1,57 @@
+"""rollup returns, charges and watermark
+
+Revision ID: 4e6b2d8f0a15
+Revises: 3d4a9b6c1e27
+Create Date: 2026-10-18 23:17:44.902651
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e6b2d8f0a15'
+down_revision = '3d4a9b6c1e27'
+branch_labels = None
+depends_on = None
+
+ROLLUPS = ('daily_book_stats', 'daily_member_stats')
+
+
+def upgrade():
+    op.create_table('rollup_watermarks',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('watermark', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+    for table in ROLLUPS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('returns', sa.Integer(), nullable=False, server_default='0'))
+            batch_op.add_column(sa.Column('charges', sa.Integer(), nullable=False, server_default='0'))
+
+    if op.get_bind().dialect.name != 'sqlite':
+        for table in ROLLUPS:
+            op.alter_column(table, 'returns', server_default=None)
+            op.alter_column(table, 'charges', server_default=None)
+
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_transactions_returned_on'), ['returned_on'], unique=False)
+
+    with op.batch_alter_table('transactions_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_transactions_archive_updated_at'), ['updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('transactions_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_transactions_archive_updated_at'))
+
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_transactions_returned_on'))
+
+    for table in reversed(ROLLUPS):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('charges')
+            batch_op.drop_column('returns')
+
+    op.drop_table('rollup_watermarks')
@@ -0,0 +1,56 @@
+"""books full-text search index
+
+Revision ID: 5f1c2a9d7e3b
+Revises: e251c92eac60
+Create Date: 2026-10-18 09:12:41.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f1c2a9d7e3b'
+down_revision = 'e251c92eac60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5("
+        "title, author, content='books', content_rowid='id', tokenize='trigram')"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN "
+        "INSERT INTO books_fts(rowid, title, author) "
+        "VALUES (new.id, new.title, new.author); END"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN "
+        "INSERT INTO books_fts(books_fts, rowid, title, author) "
+        "VALUES ('delete', old.id, old.title, old.author); END"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author "
+        "ON books BEGIN "
+        "INSERT INTO books_fts(books_fts, rowid, title, author) "
+        "VALUES ('delete', old.id, old.title, old.author); "
+        "INSERT INTO books_fts(rowid, title, author) "
+        "VALUES (new.id, new.title, new.author); END"
+    )
+    # index the rows that already exist
+    op.execute("INSERT INTO books_fts(books_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS books_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS books_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS books_fts_ai")
+    op.execute("DROP TABLE IF EXISTS books_fts")
@@ -0,0 +1,51 @@
+"""transactions autoincrement
+
+Revision ID: 7c3f9e2a5b18
+Revises: 4e6b2d8f0a15
+Create Date: 2026-10-19 10:26:53.418207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3f9e2a5b18'
+down_revision = '4e6b2d8f0a15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    # AUTOINCREMENT can only be given when the table is created
+    with op.batch_alter_table(
+        'transactions',
+        schema=None,
+        recreate='always',
+        table_kwargs={'sqlite_autoincrement': True},
+    ) as batch_op:
+        pass
+
+    # ids already moved to the archive must not be handed out again either
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'transactions'")
+    op.execute(
+        "INSERT INTO sqlite_sequence (name, seq) "
+        "SELECT 'transactions', coalesce(max(id), 0) FROM ("
+        "SELECT id FROM transactions UNION ALL SELECT id FROM transactions_archive)"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    with op.batch_alter_table(
+        'transactions',
+        schema=None,
+        recreate='always',
+        table_kwargs={'sqlite_autoincrement': False},
+    ) as batch_op:
+        pass
@@ -0,0 +1,26 @@
+"""idempotency key token
+
+Revision ID: 8e4a1d6b3c27
+Revises: 7c3f9e2a5b18
+Create Date: 2026-10-19 14:08:31.620914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e4a1d6b3c27'
+down_revision = '7c3f9e2a5b18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('idempotency_keys', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('token', sa.String(length=32), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('idempotency_keys', schema=None) as batch_op:
+        batch_op.drop_column('token')
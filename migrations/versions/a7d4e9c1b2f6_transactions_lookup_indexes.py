@@ -0,0 +1,36 @@
+"""transactions lookup indexes
+
+Revision ID: a7d4e9c1b2f6
+Revises: 5f1c2a9d7e3b
+Create Date: 2026-10-18 10:03:27.518260
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d4e9c1b2f6'
+down_revision = '5f1c2a9d7e3b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.create_index('ix_transactions_member_id_type', ['member_id', 'type'], unique=False)
+        batch_op.create_index('ix_transactions_book_id_type', ['book_id', 'type'], unique=False)
+        batch_op.create_index(
+            'ix_transactions_book_id_member_id_type',
+            ['book_id', 'member_id', 'type'],
+            unique=False,
+            sqlite_where=sa.text("type = 'issue'"),
+            postgresql_where=sa.text("type = 'issue'"),
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_book_id_member_id_type')
+        batch_op.drop_index('ix_transactions_book_id_type')
+        batch_op.drop_index('ix_transactions_member_id_type')
@@ -0,0 +1,38 @@
+"""table versions
+
+Revision ID: c3e8f1a6d2b4
+Revises: a7d4e9c1b2f6
+Create Date: 2026-10-18 14:21:09.304117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from datetime import datetime, timezone
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e8f1a6d2b4'
+down_revision = 'a7d4e9c1b2f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    table_versions = op.create_table('table_versions',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    op.bulk_insert(
+        table_versions,
+        [
+            {'name': name, 'version': 0, 'updated_at': now}
+            for name in ('books', 'members', 'transactions')
+        ],
+    )
+
+
+def downgrade():
+    op.drop_table('table_versions')
@@ -0,0 +1,58 @@
+"""row updated_at and version
+
+Revision ID: d9b2c7e4f1a8
+Revises: c3e8f1a6d2b4
+Create Date: 2026-10-18 16:02:44.918305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from datetime import datetime, timezone
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9b2c7e4f1a8'
+down_revision = 'c3e8f1a6d2b4'
+branch_labels = None
+depends_on = None
+
+TABLES = ('books', 'members', 'transactions')
+
+
+def upgrade():
+    # existing rows get the upgrade time and version 1; SQLite only allows
+    # constant defaults when adding NOT NULL columns
+    now = datetime.now(timezone.utc).replace(tzinfo=None).isoformat(sep=' ')
+
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=now))
+            batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+            batch_op.create_index(batch_op.f(f'ix_{table}_updated_at'), ['updated_at'], unique=False)
+
+    # the application always sets both columns; drop the backfill defaults
+    # where that does not mean rebuilding the table
+    if op.get_bind().dialect.name != 'sqlite':
+        for table in TABLES:
+            op.alter_column(table, 'updated_at', server_default=None)
+            op.alter_column(table, 'version', server_default=None)
+
+
+def downgrade():
+    bind = op.get_bind()
+    triggers = []
+    if bind.dialect.name == 'sqlite':
+        # dropping columns rebuilds the tables on SQLite, which drops their
+        # triggers (the books_fts ones); recreate them afterwards
+        triggers = bind.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger'"
+        ).scalars().all()
+
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f(f'ix_{table}_updated_at'))
+            batch_op.drop_column('version')
+            batch_op.drop_column('updated_at')
+
+    for sql in triggers:
+        op.execute(sql)
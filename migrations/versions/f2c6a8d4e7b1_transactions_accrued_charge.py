@@ -0,0 +1,29 @@
+"""transactions accrued charge
+
+Revision ID: f2c6a8d4e7b1
+Revises: e4a1f7c3b9d5
+Create Date: 2026-10-18 19:05:37.160442
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c6a8d4e7b1'
+down_revision = 'e4a1f7c3b9d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('accrued_charge', sa.Integer(), nullable=False, server_default='0'))
+
+    if op.get_bind().dialect.name != 'sqlite':
+        op.alter_column('transactions', 'accrued_charge', server_default=None)
+
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_column('accrued_charge')
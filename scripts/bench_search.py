@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""Benchmark book search: LIKE scan vs. the FTS5 trigram index.
+
+Titles come from ``scripts.data``, whose small vocabulary makes every
+word match several percent of the catalog. One title in a thousand also
+gets a unique edition code, so selective and unselective lookups can be
+timed separately. Each sample fetches the first page plus the total
+count, the same work as one ``/api/books/search`` request.
+
+Usage:
+    python -m scripts.bench_search --rows 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+db_file = os.path.join(tempfile.mkdtemp(), "bench-search.sqlite")
+os.environ["TEST_DATABASE_URL"] = "sqlite:///" + db_file
+
+from app import create_app, db  # noqa: E402
+from app.models import Book  # noqa: E402
+from app.search import search_books  # noqa: E402
+from scripts.data import generate_name, generate_title  # noqa: E402
+
+COMMON_TERMS = ["policy", "engineering", "celebration", "wide-eyed", "utopian"]
+
+
+def edition_code():
+    return "ed-{:08x}".format(random.getrandbits(32))
+
+
+def populate(rows, batch_size=50000):
+    """Inserts generated books in batches, returns the edition codes used."""
+    codes = []
+    for start in range(0, rows, batch_size):
+        batch = []
+        for _ in range(min(batch_size, rows - start)):
+            title = generate_title().lower()
+            if random.random() < 0.001:
+                codes.append(edition_code())
+                title = f"{title} {codes[-1]}"
+            batch.append(
+                {
+                    "title": title,
+                    "author": generate_name().lower(),
+                    "quantity": 10,
+                    "penalty_fee": 10,
+                }
+            )
+        db.session.execute(Book.__table__.insert(), batch)
+    db.session.commit()
+    return codes
+
+
+def time_query(build, terms, repeat):
+    """Times the first page plus total count of a query, in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        query = build(random.choice(terms))
+        started = time.perf_counter()
+        query.limit(10).all()
+        query.order_by(None).count()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(
+        f"{name:<22} median {statistics.median(samples):8.2f} ms"
+        f"   p95 {p95:8.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app("testing")
+
+    with app.app_context():
+        db.create_all()
+
+        started = time.perf_counter()
+        codes = populate(args.rows)
+        print(f"inserted {args.rows} books in {time.perf_counter() - started:.1f}s")
+
+        term_sets = {
+            "selective": codes,
+            "no match": [edition_code() for _ in range(100)],
+            "common word": COMMON_TERMS,
+        }
+
+        for label, terms in term_sets.items():
+            report(
+                f"LIKE {label}",
+                time_query(
+                    lambda term: Book.query.filter(Book.title.like(f"%{term}%")),
+                    terms,
+                    args.repeat,
+                ),
+            )
+            report(
+                f"FTS5 {label}",
+                time_query(
+                    lambda term: search_books(term, ("title",)), terms, args.repeat
+                ),
+            )
+
+        db.drop_all()
+
+    os.remove(db_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""Benchmark concurrent issue/return throughput with and without the
+production SQLite pragmas.
+
+Writer processes issue and return books in a loop while reader
+processes page through the catalog, all against one SQLite file, the way
+gunicorn workers share it. Failed operations, almost always ``database
+is locked``, are counted separately.
+
+Usage:
+    python -m scripts.bench_sqlite_pragmas --workers 3 --readers 3 --seconds 10
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from app import create_app, db
+from app.config import ProductionConfig, TestingConfig, config
+from app.models import Book, Member
+from app.transactions.operations import TransactionError, issue, retrieve
+
+
+def writer(key, member_ids, book_ids, seconds, results):
+    app = create_app(key)
+    done = failed = 0
+
+    with app.app_context():
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            member_id = random.choice(member_ids)
+            book_id = random.choice(book_ids)
+            try:
+                issue(member_id, book_id)
+                db.session.commit()
+                retrieve(member_id, book_id)
+                db.session.commit()
+                done += 2
+            except TransactionError:
+                db.session.rollback()
+            except Exception:
+                db.session.rollback()
+                failed += 1
+
+    results.put(("writes", done, failed))
+
+
+def reader(key, seconds, results):
+    app = create_app(key)
+    done = failed = 0
+
+    with app.app_context():
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            try:
+                Book.query.order_by(Book.id).paginate(
+                    page=random.randint(1, 5), per_page=10, error_out=False
+                )
+                done += 1
+            except Exception:
+                db.session.rollback()
+                failed += 1
+            db.session.remove()
+
+    results.put(("reads", done, failed))
+
+
+def run(label, pragmas, workers, readers, seconds):
+    db_file = os.path.join(tempfile.mkdtemp(), "bench-pragmas.sqlite")
+    config["bench"] = type(
+        "BenchConfig",
+        (TestingConfig,),
+        {"SQLALCHEMY_DATABASE_URI": "sqlite:///" + db_file, "SQLITE_PRAGMAS": pragmas},
+    )
+
+    app = create_app("bench")
+    with app.app_context():
+        db.create_all()
+        books = [Book(title=f"book {i}", author="bench", quantity=100) for i in range(50)]
+        members = [Member(name=f"member {i}", debt=0) for i in range(50)]
+        db.session.add_all(books + members)
+        db.session.commit()
+        book_ids = [book.id for book in books]
+        member_ids = [member.id for member in members]
+        db.engine.dispose()
+
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=writer,
+            args=("bench", member_ids[i::workers], book_ids, seconds, results),
+        )
+        for i in range(workers)
+    ] + [
+        multiprocessing.Process(target=reader, args=("bench", seconds, results))
+        for _ in range(readers)
+    ]
+    for process in processes:
+        process.start()
+
+    totals = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    writes = sum(done for kind, done, _ in totals if kind == "writes")
+    reads = sum(done for kind, done, _ in totals if kind == "reads")
+    failed = sum(result[2] for result in totals)
+    print(
+        f"{label:<10} {writes / seconds:8.0f} writes/s {reads / seconds:8.0f} reads/s"
+        f"   {failed} failed operations"
+    )
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_file + suffix):
+            os.remove(db_file + suffix)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--readers", type=int, default=3)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    for label, pragmas in (
+        ("default", {}),
+        ("tuned", ProductionConfig.SQLITE_PRAGMAS),
+    ):
+        run(label, pragmas, args.workers, args.readers, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""Benchmark the book suggestion index against prefix LIKE queries.
+
+Loads a catalog of random titles and authors into a temporary SQLite
+file, then reports how long the index takes to build, how much the
+worker grows while building it, how fast it answers random prefixes and applies single-book
+changes, and how fast the LIKE fallback answers the same prefixes.
+
+Usage:
+    python -m scripts.bench_suggest --books 1000000 --lookups 2000
+"""
+import argparse
+import os
+import random
+import string
+import tempfile
+import time
+import resource
+
+from app import create_app, db
+from app.bulk import bulk_insert
+from app.config import TestingConfig, config
+from app.models import Book
+from app.search import deferred_search_index
+from app.suggest import SuggestIndex, database_suggest
+
+WORDS = [
+    "".join(random.choices(string.ascii_lowercase, k=random.randint(3, 9)))
+    for _ in range(5000)
+]
+
+
+def phrase(words):
+    return " ".join(random.choices(WORDS, k=words))
+
+
+def timed(function, arguments):
+    """Runs a function once per argument; returns microseconds per call."""
+    started = time.perf_counter()
+    for argument in arguments:
+        function(argument)
+    return (time.perf_counter() - started) / len(arguments) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    db_file = os.path.join(tempfile.mkdtemp(), "bench-suggest.sqlite")
+    config["bench"] = type(
+        "BenchConfig",
+        (TestingConfig,),
+        {"SQLALCHEMY_DATABASE_URI": "sqlite:///" + db_file},
+    )
+    app = create_app("bench")
+
+    with app.app_context():
+        db.create_all()
+
+        started = time.perf_counter()
+        rows = (
+            {
+                "title": phrase(random.randint(1, 4)),
+                "author": phrase(2),
+                "quantity": 1,
+            }
+            for _ in range(args.books)
+        )
+        with deferred_search_index():
+            bulk_insert(Book, rows, 10000)
+        db.session.commit()
+        print(f"{args.books} books loaded in {time.perf_counter() - started:.1f}s")
+
+        index = SuggestIndex(max_entries=2 * args.books + 1000, refresh_seconds=60)
+
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        index.sync()
+        elapsed = time.perf_counter() - started
+        grown = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss
+        print(
+            f"index built in {elapsed:.1f}s, {len(index.keys)} keys, "
+            f"peak RSS +{grown / 1024:.0f} MiB"
+        )
+
+        prefixes = [
+            random.choice(WORDS)[: random.randint(1, 4)] for _ in range(args.lookups)
+        ]
+        print(
+            f"index lookup      "
+            f"{timed(lambda p: index.lookup(p, args.limit), prefixes):10.1f} us"
+        )
+
+        some_ids = random.sample(list(index.books), min(200, len(index.books)))
+        print(
+            f"index update      "
+            f"{timed(lambda i: index.put(i, phrase(2), phrase(2)), some_ids):10.1f} us"
+        )
+        print(f"index delete      {timed(index.remove, some_ids):10.1f} us")
+
+        sample = prefixes[: max(len(prefixes) // 100, 10)]
+        print(
+            f"LIKE 'prefix%'    "
+            f"{timed(lambda p: database_suggest(p, args.limit), sample):10.1f} us"
+        )
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_file + suffix):
+            os.remove(db_file + suffix)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+from datetime import date, datetime, timedelta
+from unittest import TestCase
+from app import create_app, db
+from app.analytics.rollups import SETTLE_TIME, update_rollups
+from app.models import (
+    Book,
+    DailyBookStats,
+    DailyMemberStats,
+    Member,
+    RollupWatermark,
+    Transaction,
+)
+from app.transactions.archive import archive_transactions
+from app.utils import TransactionType, utcnow
+from sqlalchemy import event
+
+
+class TestRollups(TestCase):
+    """Tests the incremental daily rollups"""
+
+    def setUp(self):
+        """Set up the app context with a book, a member and two old loans."""
+        self.app = create_app("testing")
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.book = Book(title="Test Book", author="Jane Doe", quantity=5)
+        self.member = Member(name="John Doe", debt=0)
+        db.session.add_all([self.book, self.member])
+        db.session.commit()
+
+        self.today = datetime.combine(date.today(), datetime.min.time())
+        self.loan(20, returned_after=3, charge=0)
+        self.loan(12, returned_after=10, charge=30)
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def loan(self, days_ago, returned_after=None, charge=0):
+        """Adds a loan issued some days ago, returned or still open."""
+        issued_on = self.today - timedelta(days=days_ago, hours=-10)
+        returned = returned_after is not None
+        db.session.add(
+            Transaction(
+                book_id=self.book.id,
+                member_id=self.member.id,
+                type=TransactionType.RETURN if returned else TransactionType.ISSUE,
+                issued_on=issued_on,
+                returned_on=issued_on + timedelta(days=returned_after)
+                if returned
+                else None,
+                charge=charge,
+            )
+        )
+        db.session.commit()
+
+    def day(self, days_ago):
+        """Returns the date some days before today."""
+        return date.today() - timedelta(days=days_ago)
+
+    def run_rollups(self, full=False):
+        """Updates the rollups with every row written so far."""
+        return update_rollups(utcnow() + SETTLE_TIME, full)
+
+    def stats(self, model=DailyBookStats):
+        """Returns (issues, returns, charges) of a rollup table by day."""
+        return {
+            row.day: (row.issues, row.returns, row.charges)
+            for row in model.query.order_by(model.day)
+        }
+
+    def test_first_run_counts_everything(self):
+        """Check the first run recounts every day of the ledger"""
+        days = self.run_rollups()
+
+        self.assertEqual(4, days)
+        expected = {
+            self.day(20): (1, 0, 0),
+            self.day(17): (0, 1, 0),
+            self.day(12): (1, 0, 0),
+            self.day(2): (0, 1, 30),
+        }
+        self.assertEqual(expected, self.stats())
+        self.assertEqual(expected, self.stats(DailyMemberStats))
+        self.assertIsNotNone(db.session.get(RollupWatermark, "daily_stats"))
+
+    def test_second_run_reads_only_changes(self):
+        """Check a run only recounts the days of rows changed since the last"""
+        self.run_rollups()
+        self.loan(2)
+
+        statements = []
+        event.listen(
+            db.engine,
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args: statements.append(statement),
+        )
+        days = self.run_rollups()
+
+        self.assertEqual(1, days)
+        self.assertEqual((1, 1, 30), self.stats()[self.day(2)])
+        deletes = [s for s in statements if s.startswith("DELETE")]
+        self.assertEqual(2, len(deletes))
+
+    def test_unchanged_ledger(self):
+        """Check a run with nothing new recounts nothing"""
+        self.run_rollups()
+
+        self.assertEqual(0, self.run_rollups())
+        self.assertEqual(4, DailyBookStats.query.count())
+
+    def test_recent_rows_wait(self):
+        """Check rows younger than the settle time are left for the next run"""
+        self.assertEqual(0, update_rollups(utcnow()))
+        self.assertEqual(4, self.run_rollups())
+
+    def test_archived_rows_still_counted(self):
+        """Check recounting a day includes its archived transactions"""
+        self.run_rollups()
+        archive_transactions(10, 100, datetime.now())
+        self.loan(20, returned_after=3, charge=0)
+
+        self.run_rollups()
+
+        self.assertEqual((2, 0, 0), self.stats()[self.day(20)])
+        self.assertEqual((0, 2, 0), self.stats()[self.day(17)])
+
+    def test_full_rebuild(self):
+        """Check --full drops rollups of days no longer in the ledger"""
+        self.run_rollups()
+        Transaction.query.delete()
+        db.session.commit()
+
+        result = self.app.test_cli_runner().invoke(
+            args=["refresh-analytics", "--full"]
+        )
+
+        self.assertEqual(0, result.exit_code, result.output)
+        self.assertIn("Done: 0 days recounted", result.output)
+        self.assertEqual({}, self.stats())
@@ -0,0 +1,152 @@
+from datetime import date, datetime, timedelta
+from unittest import TestCase
+from app import create_app, db
+from app.analytics.rollups import update_rollups
+from app.cache import invalidate
+from app.transactions.archive import archive_transactions
+from app.models import Book, DailyBookStats, Member, Transaction
+from app.utils import TransactionType, utcnow
+
+
+class TestAnalyticsViews(TestCase):
+    """Tests the analytics endpoints"""
+
+    def setUp(self):
+        """Set up the app context with loans spread over some days."""
+        self.app = create_app("testing")
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.books = [
+            Book(title=f"Book {i}", author="Jane Doe", quantity=5) for i in range(3)
+        ]
+        self.members = [Member(name=f"Member {i}", debt=0) for i in range(3)]
+        db.session.add_all(self.books + self.members)
+        db.session.commit()
+
+        today = datetime.combine(date.today(), datetime.min.time())
+        # (days ago, book, member); all but today's loans came back after
+        # a day with a charge of 5
+        for days_ago, book, member in (
+            (0, 0, 0),
+            (0, 1, 0),
+            (1, 1, 1),
+            (3, 1, 2),
+            (3, 2, 2),
+            (6, 2, 2),
+            (10, 0, 1),
+            (10, 0, 1),
+            (40, 0, 0),
+        ):
+            db.session.add(
+                Transaction(
+                    book_id=self.books[book].id,
+                    member_id=self.members[member].id,
+                    type=TransactionType.RETURN if days_ago else TransactionType.ISSUE,
+                    issued_on=today - timedelta(days=days_ago, hours=-9),
+                    returned_on=today - timedelta(days=days_ago - 1, hours=-10)
+                    if days_ago
+                    else None,
+                    charge=5 if days_ago else 0,
+                )
+            )
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_popular_books(self):
+        """Check books are ranked by loans of the last week"""
+        response = self.client.get("/api/analytics/popular_books")
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            [("Book 1", 3), ("Book 2", 2), ("Book 0", 1)],
+            [(book["title"], book["issues"]) for book in response.json["books"]],
+        )
+
+    def test_popular_books_window_and_limit(self):
+        """Check days widens the window and limit cuts the list"""
+        response = self.client.get("/api/analytics/popular_books?days=14&limit=1")
+
+        self.assertEqual(
+            [(self.books[0].id, 3)],
+            [(book["book_id"], book["issues"]) for book in response.json["books"]],
+        )
+
+    def test_active_members(self):
+        """Check members are ranked by loans of the last week"""
+        response = self.client.get("/api/analytics/active_members")
+
+        self.assertEqual(
+            [("Member 2", 3), ("Member 0", 2), ("Member 1", 1)],
+            [(m["name"], m["issues"]) for m in response.json["members"]],
+        )
+
+    def test_circulation(self):
+        """Check loans are counted per day, days without loans included"""
+        response = self.client.get("/api/analytics/circulation?days=7")
+        days = response.json["circulation"]
+
+        self.assertEqual(7, len(days))
+        self.assertEqual(date.today().isoformat(), days[-1]["day"])
+        self.assertEqual([1, 0, 0, 2, 0, 1, 2], [day["issues"] for day in days])
+        self.assertEqual([0, 1, 0, 0, 2, 0, 1], [day["returns"] for day in days])
+        self.assertEqual([0, 5, 0, 0, 10, 0, 5], [day["charges"] for day in days])
+
+    def test_invalid_arguments(self):
+        """Check out of range days and limits are rejected"""
+        for query in ("days=0", "days=1000", "limit=0", "limit=101"):
+            response = self.client.get(f"/api/analytics/popular_books?{query}")
+
+            self.assertEqual(400, response.status_code, query)
+            self.assertIn("Error", response.json)
+
+    def test_cached(self):
+        """Check reports are served from the cache"""
+        first = self.client.get("/api/analytics/circulation")
+        second = self.client.get("/api/analytics/circulation")
+
+        self.assertEqual("MISS", first.headers["X-Cache"])
+        self.assertEqual("HIT", second.headers["X-Cache"])
+        self.assertEqual(first.json, second.json)
+
+    def test_rollups_match_ledger(self):
+        """Check the rollup source gives the same reports as the ledger"""
+        paths = (
+            "/api/analytics/popular_books?days=30",
+            "/api/analytics/active_members?days=30",
+            "/api/analytics/circulation?days=30",
+        )
+        ledger = [self.client.get(path).json for path in paths]
+
+        update_rollups(utcnow() + timedelta(minutes=2))
+        self.app.config["ANALYTICS_SOURCE"] = "rollup"
+        rollup = [self.client.get(path).json for path in paths]
+
+        self.assertEqual(ledger, rollup)
+
+    def test_ledger_counts_archived_transactions(self):
+        """Check archiving changes neither source's reports"""
+        paths = (
+            "/api/analytics/popular_books?days=30",
+            "/api/analytics/active_members?days=30",
+            "/api/analytics/circulation?days=30",
+        )
+        before = [self.client.get(path).json for path in paths]
+
+        self.assertEqual(4, archive_transactions(4, 100, datetime.now()))
+        invalidate("analytics")
+        ledger = [self.client.get(path).json for path in paths]
+
+        update_rollups(utcnow() + timedelta(minutes=2))
+        self.app.config["ANALYTICS_SOURCE"] = "rollup"
+        rollup = [self.client.get(path).json for path in paths]
+
+        self.assertEqual(before, ledger)
+        self.assertEqual(before, rollup)
@@ -0,0 +1,142 @@
+from unittest import TestCase
+from app import create_app, db
+from app.models import Book
+from app.suggest import get_suggest_index, normalize
+from app.versions import mark_changed
+from sqlalchemy import delete, insert
+
+
+class TestSuggest(TestCase):
+    """Tests the book suggestion endpoint and its index"""
+
+    def setUp(self):
+        """Set up the test client, app context and a few books."""
+        self.app = create_app("testing")
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        # pull changes made outside this worker on every request
+        get_suggest_index().refresh_seconds = 0
+
+        db.session.add_all(
+            [
+                Book(title="harry potter", author="j. k. rowling", quantity=2),
+                Book(title="hamlet", author="william shakespeare", quantity=1),
+                Book(title="the hobbit", author="j. r. r. tolkien", quantity=1),
+                Book(title="les misérables", author="victor hugo", quantity=1),
+            ]
+        )
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def suggest(self, prefix, **args):
+        """Returns the titles suggested for a prefix."""
+        response = self.client.get(
+            "/api/books/suggest", query_string={"prefix": prefix, **args}
+        )
+        self.assertEqual(200, response.status_code)
+        return [book["title"] for book in response.json["suggestions"]]
+
+    def test_normalize(self):
+        """Check case, accents and spacing are folded"""
+        self.assertEqual("les miserables", normalize("  Les   MISÉRABLES "))
+
+    def test_title_and_author_prefixes(self):
+        """Check titles and authors are matched from their start"""
+        self.assertEqual(["hamlet", "harry potter"], self.suggest("ha"))
+        self.assertEqual(["harry potter", "the hobbit"], self.suggest("J. "))
+        self.assertEqual(["les misérables"], self.suggest("les mise"))
+        self.assertEqual([], self.suggest("potter"))
+
+    def test_limit(self):
+        """Check limit cuts the list"""
+        self.assertEqual(["hamlet"], self.suggest("h", limit=1))
+
+    def test_missing_prefix(self):
+        """Check an empty prefix is rejected"""
+        response = self.client.get("/api/books/suggest?prefix=%20")
+
+        self.assertEqual(400, response.status_code)
+
+    def test_local_changes(self):
+        """Check create, update and delete reach the index at once"""
+        get_suggest_index().refresh_seconds = 3600
+        self.suggest("h")
+
+        self.client.post(
+            "/api/books/create",
+            json={"title": "Hatchet", "author": "Gary Paulsen", "quantity": 1},
+        )
+        self.client.put(
+            "/api/books/update/1",
+            json={"title": "Dune", "author": "Frank Herbert", "quantity": 2},
+        )
+        self.client.delete("/api/books/delete/2")
+
+        self.assertEqual(["hatchet"], self.suggest("h"))
+        self.assertEqual(["Dune"], self.suggest("du"))
+
+    def test_changes_from_other_workers(self):
+        """Check rows written elsewhere are pulled, deleted ones pruned"""
+        self.suggest("h")
+
+        db.session.execute(
+            insert(Book),
+            [{"title": "heidi", "author": "johanna spyri", "quantity": 1}],
+        )
+        db.session.execute(delete(Book).where(Book.title == "hamlet"))
+        mark_changed("books")
+        db.session.commit()
+
+        self.assertEqual(["harry potter", "heidi"], self.suggest("h"))
+
+    def test_warm(self):
+        """Check warm builds the index in a background thread"""
+        index = get_suggest_index()
+
+        index.warm(self.app).join()
+
+        self.assertTrue(index.built)
+        self.assertEqual(8, len(index.keys))
+
+    def test_database_answers_during_build(self):
+        """Check requests arriving while the index is built use the database"""
+        index = get_suggest_index()
+        index.building = True
+
+        self.assertEqual(["hamlet", "harry potter"], self.suggest("ha"))
+        self.assertFalse(index.built)
+
+    def test_too_many_books(self):
+        """Check a catalog larger than the index is served from the database"""
+        get_suggest_index().max_entries = 4
+
+        self.assertEqual(["hamlet", "harry potter"], self.suggest("ha"))
+        self.assertFalse(get_suggest_index().complete)
+
+    def test_rebuilds_once_under_the_cap(self):
+        """Check an index past its cap is rebuilt after deletes"""
+        index = get_suggest_index()
+        index.max_entries = 9
+        self.suggest("h")
+
+        self.client.post(
+            "/api/books/create",
+            json={"title": "Hatchet", "author": "Gary Paulsen", "quantity": 1},
+        )
+
+        self.assertFalse(index.complete)
+        self.assertEqual(["hamlet", "harry potter", "hatchet"], self.suggest("ha"))
+        self.assertFalse(index.complete)
+
+        self.client.delete("/api/books/delete/2")
+
+        self.assertEqual(["harry potter", "hatchet"], self.suggest("ha"))
+        self.assertTrue(index.complete)
+        self.assertEqual(8, len(index.keys))
@@ -1,6 +1,11 @@
+import csv
+import io
+import json
+
 from unittest import TestCase
 from app.models import Book
 from app import create_app, db
+from sqlalchemy import event
 
 
 class TestBookRoutes(TestCase):
@@ -245,3 +250,271 @@ class TestBookRoutes(TestCase):
         self.assertEqual("John Doe", response.json["author"])
         self.assertEqual(4, response.json["quantity"])
         self.assertEqual(20, response.json["penalty_fee"])
+
+    def test_search(self):
+        """Check search endpoint matches titles and authors."""
+        book1 = Book(title="Test Book", author="John Doe", quantity=4, penalty_fee=20)
+        book2 = Book(
+            title="The Last Book", author="Mitchelle White", quantity=4, penalty_fee=20
+        )
+        book3 = Book(title="Whitewater", author="Jane Doe", quantity=4, penalty_fee=20)
+
+        db.session.add_all([book1, book2, book3])
+        db.session.commit()
+
+        response = self.client.get("/api/books/search", query_string={"q": "white"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(2, response.json["total_books"])
+        self.assertEqual(
+            {book2.id, book3.id}, {book["id"] for book in response.json["books"]}
+        )
+
+    def test_search_on_missing_query(self):
+        """Check search endpoint returns an error when no query is given."""
+        response = self.client.get("/api/books/search")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Missing search query", response.json["Error"])
+
+    def test_search_on_short_query(self):
+        """Check search endpoint handles terms shorter than the index minimum."""
+        book = Book(title="Go In Action", author="John Doe", quantity=4)
+
+        db.session.add(book)
+        db.session.commit()
+
+        response = self.client.get("/api/books/search", query_string={"q": "go"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(book.id, response.json["books"][0]["id"])
+
+    def test_search_index_follows_updates_and_deletes(self):
+        """Check search results reflect updated and deleted books."""
+        book = Book(title="Test Book", author="John Doe", quantity=4, penalty_fee=20)
+
+        db.session.add(book)
+        db.session.commit()
+
+        update_data = {
+            "title": "Renamed Volume",
+            "author": "John Doe",
+            "quantity": 4,
+            "penalty_fee": 20,
+        }
+        self.client.put(f"/api/books/update/{book.id}", json=update_data)
+
+        self.assertEqual(400, self.client.get("/api/books/get_by_title/book").status_code)
+        self.assertEqual(
+            200, self.client.get("/api/books/get_by_title/volume").status_code
+        )
+
+        self.client.delete(f"/api/books/delete/{book.id}")
+
+        self.assertEqual(
+            400, self.client.get("/api/books/get_by_title/volume").status_code
+        )
+
+    def test_get_books_with_cursor(self):
+        """Check get_books walks every book with cursor pagination."""
+        db.session.add_all(
+            [
+                Book(title=f"Test Book {i}", author="John Doe", quantity=4)
+                for i in range(5)
+            ]
+        )
+        db.session.commit()
+
+        response = self.client.get(
+            "/api/books/get_books", query_string={"cursor": "", "per_page": 2}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(5, response.json["total_books"])
+        self.assertEqual([1, 2], [book["id"] for book in response.json["books"]])
+        self.assertTrue(response.json["has_next"])
+
+        seen = [book["id"] for book in response.json["books"]]
+        cursor = response.json["next_cursor"]
+
+        while cursor:
+            response = self.client.get(
+                "/api/books/get_books",
+                query_string={"cursor": cursor, "per_page": 2, "with_total": "false"},
+            )
+            self.assertNotIn("total_books", response.json)
+            seen.extend(book["id"] for book in response.json["books"])
+            cursor = response.json["next_cursor"]
+
+        self.assertEqual([1, 2, 3, 4, 5], seen)
+        self.assertFalse(response.json["has_next"])
+
+    def test_get_books_on_invalid_cursor(self):
+        """Check get_books rejects a malformed cursor."""
+        response = self.client.get(
+            "/api/books/get_books", query_string={"cursor": "not-a-cursor"}
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Invalid cursor", response.json["Error"])
+
+    def test_get_by_title_with_cursor(self):
+        """Check title search supports cursor pagination."""
+        db.session.add_all(
+            [
+                Book(title="Test Book", author="John Doe", quantity=4),
+                Book(title="Another book", author="John Doe", quantity=4),
+                Book(title="Unrelated", author="John Doe", quantity=4),
+            ]
+        )
+        db.session.commit()
+
+        response = self.client.get(
+            "/api/books/get_by_title/book", query_string={"cursor": "", "per_page": 1}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(2, response.json["total_books"])
+        self.assertEqual(1, response.json["books"][0]["id"])
+
+        response = self.client.get(
+            "/api/books/get_by_title/book",
+            query_string={"cursor": response.json["next_cursor"], "per_page": 1},
+        )
+
+        self.assertEqual(2, response.json["books"][0]["id"])
+        self.assertIsNone(response.json["next_cursor"])
+
+    def test_bulk_create(self):
+        """Check bulk_create inserts valid rows and reports invalid ones."""
+        self.app.config["BULK_INSERT_CHUNK_SIZE"] = 2
+        payload = [
+            {"title": "First Book", "author": "John Doe", "quantity": 2},
+            {"title": None, "author": "John Doe", "quantity": 2},
+            {"title": "Second Book", "author": "Jane Doe", "quantity": 3},
+            {"title": "Third Book", "author": "Jane Doe", "quantity": 0},
+            {"title": "Fourth Book", "author": "Jane Doe", "quantity": 1},
+        ]
+
+        response = self.client.post("/api/books/bulk_create", json=payload)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(3, response.json["created"])
+        self.assertEqual(2, response.json["failed"])
+        self.assertEqual([1, 3], [error["index"] for error in response.json["errors"]])
+        self.assertEqual(["title"], response.json["errors"][0]["Details"][0]["loc"])
+        self.assertEqual(3, Book.query.count())
+        self.assertEqual(
+            ["first book", "second book", "fourth book"],
+            [book.title for book in Book.query.order_by(Book.id)],
+        )
+
+        response = self.client.get("/api/books/search", query_string={"q": "second"})
+
+        self.assertEqual(1, response.json["total_books"])
+
+        self.client.post("/api/books/create", json=payload[0])
+        response = self.client.get("/api/books/search", query_string={"q": "first"})
+
+        self.assertEqual(2, response.json["total_books"])
+
+    def test_bulk_create_on_invalid_data(self):
+        """Check bulk_create rejects a payload without valid rows."""
+        response = self.client.post(
+            "/api/books/bulk_create", json=[{"title": None, "quantity": 1}]
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Validation failed", response.json["Error"])
+        self.assertEqual(0, Book.query.count())
+
+        response = self.client.post("/api/books/bulk_create", json={"title": "Book"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Expected a JSON array", response.json["Error"])
+
+    def test_export(self):
+        """Check export streams every book as NDJSON and CSV."""
+        self.app.config["EXPORT_BATCH_SIZE"] = 2
+        db.session.add_all(
+            [
+                Book(title=f"Book {i}", author="John Doe", quantity=i + 1)
+                for i in range(5)
+            ]
+        )
+        db.session.commit()
+
+        response = self.client.get("/api/books/export")
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual("application/x-ndjson", response.mimetype)
+        self.assertEqual(5, len(lines))
+        self.assertEqual(
+            {
+                "id": 5,
+                "title": "Book 4",
+                "author": "John Doe",
+                "quantity": 5,
+                "penalty_fee": 10,
+            },
+            lines[4],
+        )
+
+        response = self.client.get("/api/books/export", query_string={"format": "csv"})
+        rows = list(csv.reader(io.StringIO(response.data.decode())))
+
+        self.assertEqual("text/csv", response.mimetype)
+        self.assertEqual(["id", "title", "author", "quantity", "penalty_fee"], rows[0])
+        self.assertEqual(["1", "Book 0", "John Doe", "1", "10"], rows[1])
+        self.assertEqual(6, len(rows))
+
+    def test_export_on_unsupported_format(self):
+        """Check export rejects unknown formats."""
+        response = self.client.get("/api/books/export", query_string={"format": "xml"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Unsupported export format", response.json["Error"])
+
+    def test_get_many(self):
+        """Check get_many returns books in request order and lists missing ids."""
+        for title in ("First Book", "Second Book", "Third Book"):
+            db.session.add(Book(title=title, author="Jane Doe", quantity=1))
+        db.session.commit()
+
+        statements = []
+        event.listen(
+            db.engine,
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args: statements.append(statement),
+        )
+        response = self.client.get("/api/books/get_many?ids=3,99,1,3")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            ["Third Book", "First Book"],
+            [book["title"] for book in response.json["books"]],
+        )
+        self.assertEqual([99], response.json["missing"])
+        # the table version for the ETag, then one IN query
+        self.assertEqual(2, len(statements))
+
+    def test_get_many_repeated_argument(self):
+        """Check ids can also be given as repeated arguments."""
+        db.session.add(Book(title="First Book", author="Jane Doe", quantity=1))
+        db.session.commit()
+
+        response = self.client.get("/api/books/get_many?ids=1&ids=2")
+
+        self.assertEqual(["First Book"], [b["title"] for b in response.json["books"]])
+        self.assertEqual([2], response.json["missing"])
+
+    def test_get_many_invalid_ids(self):
+        """Check missing, malformed and too many ids are rejected."""
+        too_many = ",".join(str(i) for i in range(1, 202))
+
+        for query in ("", "ids=", "ids=1,x", f"ids={too_many}"):
+            response = self.client.get(f"/api/books/get_many?{query}")
+
+            self.assertEqual(response.status_code, 400, query)
+            self.assertEqual("Validation failed", response.json["Error"])
@@ -0,0 +1,202 @@
+import json
+import os
+import stat
+import tempfile
+import time
+
+from unittest import TestCase
+from unittest.mock import patch
+from app.cache import FileSystemCache, MemoryCache, init_cache
+from app.models import Book, Member
+from app import create_app, db
+
+
+class TestCacheBackends(TestCase):
+    """Tests the cache backends"""
+
+    def test_memory_cache_evicts_least_recently_used(self):
+        """Check the memory cache keeps at most max_entries"""
+        cache = MemoryCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(1, cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(3, cache.get("c"))
+
+    def test_memory_cache_expires_entries(self):
+        """Check entries are dropped after their ttl"""
+        cache = MemoryCache()
+        cache.set("a", 1, ttl=0.01)
+        time.sleep(0.02)
+
+        self.assertIsNone(cache.get("a"))
+
+    def test_filesystem_cache_shared_between_instances(self):
+        """Check two filesystem caches on one directory see each other's data"""
+        with tempfile.TemporaryDirectory() as directory:
+            FileSystemCache(directory).set("a", (b"body", 200, "text/plain"), ttl=60)
+            self.assertEqual(
+                (b"body", 200, "text/plain"), FileSystemCache(directory).get("a")
+            )
+
+            FileSystemCache(directory).set("b", 1, ttl=0.01)
+            time.sleep(0.02)
+            self.assertIsNone(FileSystemCache(directory).get("b"))
+
+    def test_filesystem_cache_stores_no_pickles(self):
+        """Check entries are a JSON header and the raw body"""
+        with tempfile.TemporaryDirectory() as directory:
+            cache = FileSystemCache(directory)
+            cache.set("a", (b"body", 200, "text/plain"), ttl=60)
+
+            with open(cache.path("a"), "rb") as file:
+                header = json.loads(file.readline())
+                self.assertEqual(b"body", file.read())
+
+            self.assertEqual(200, header["status"])
+
+    def test_filesystem_cache_prunes_old_entries(self):
+        """Check writes past max_entries delete expired, then oldest entries"""
+        with tempfile.TemporaryDirectory() as directory:
+            cache = FileSystemCache(directory, max_entries=3)
+            cache.set("generation", "token")
+            cache.set("expired", 1, ttl=0.01)
+            time.sleep(0.02)
+            for key, ttl in (("old", 10), ("new", 20), ("newer", 30)):
+                cache.set(key, key, ttl=ttl)
+
+            self.assertEqual(3, len(os.listdir(directory)))
+            self.assertEqual("token", cache.get("generation"))
+            self.assertIsNone(cache.get("old"))
+            self.assertEqual("newer", cache.get("newer"))
+
+    def test_filesystem_cache_prunes_below_the_limit(self):
+        """Check a prune leaves room for many writes before the next one"""
+        with tempfile.TemporaryDirectory() as directory:
+            cache = FileSystemCache(directory, max_entries=10)
+            for number in range(11):
+                cache.set(str(number), number, ttl=60 + number)
+
+            self.assertEqual(9, len(os.listdir(directory)))
+            self.assertIsNone(cache.get("1"))
+            self.assertEqual(2, cache.get("2"))
+
+    def test_filesystem_cache_counts_only_every_few_writes(self):
+        """Check writes between two counts do not scan the directory"""
+        with tempfile.TemporaryDirectory() as directory:
+            cache = FileSystemCache(directory, max_entries=100)
+
+            with patch("app.cache.os.scandir", wraps=os.scandir) as scandir:
+                for number in range(9):
+                    cache.set(str(number), number, ttl=60)
+                scandir.assert_not_called()
+
+                cache.set("9", 9, ttl=60)
+                scandir.assert_called_once()
+
+    def test_filesystem_cache_directory_is_private(self):
+        """Check the default cache directory is in the instance folder"""
+        with tempfile.TemporaryDirectory() as directory:
+            app = create_app("testing")
+            app.instance_path = directory
+            app.config.update(CACHE_BACKEND="filesystem", CACHE_DIR=None)
+            init_cache(app)
+
+            cache_dir = os.path.join(directory, "cache")
+            self.assertEqual(cache_dir, app.extensions["cache"].directory)
+            self.assertEqual(0o700, stat.S_IMODE(os.stat(cache_dir).st_mode))
+
+
+class TestResponseCache(TestCase):
+    """Tests caching and invalidation of the lookup endpoints"""
+
+    def setUp(self):
+        """Set up the test client and app context."""
+        self.app = create_app("testing")
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.book = Book(title="test book", author="john doe", quantity=4)
+        self.member = Member(name="John Doe", debt=0, books_borrowed=0)
+        db.session.add_all([self.book, self.member])
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_repeated_lookup_served_from_cache(self):
+        """Check a second identical GET does not reach the database"""
+        url = f"/api/books/get_by_id/{self.book.id}"
+
+        first = self.client.get(url)
+        # a change behind the API's back is not seen until invalidation
+        self.book.quantity = 1
+        db.session.commit()
+        second = self.client.get(url)
+
+        self.assertEqual("MISS", first.headers["X-Cache"])
+        self.assertEqual("HIT", second.headers["X-Cache"])
+        self.assertEqual(4, second.json["quantity"])
+
+    def test_query_args_are_part_of_the_key(self):
+        """Check different pages are cached separately"""
+        self.client.get("/api/books/get_books?page=1&per_page=5")
+        other = self.client.get("/api/books/get_books?per_page=1&page=1")
+        same = self.client.get("/api/books/get_books?per_page=5&page=1")
+
+        self.assertEqual("MISS", other.headers["X-Cache"])
+        self.assertEqual("HIT", same.headers["X-Cache"])
+
+    def test_errors_are_not_cached(self):
+        """Check 400 responses are recomputed"""
+        self.client.get("/api/books/get_by_id/999")
+        response = self.client.get("/api/books/get_by_id/999")
+
+        self.assertEqual(400, response.status_code)
+        self.assertEqual("MISS", response.headers["X-Cache"])
+
+    def test_update_invalidates_books(self):
+        """Check update_book drops the cached book"""
+        url = f"/api/books/get_by_id/{self.book.id}"
+        self.client.get(url)
+
+        self.client.put(
+            f"/api/books/update/{self.book.id}",
+            json={"title": "test book", "author": "john doe", "quantity": 9},
+        )
+        response = self.client.get(url)
+
+        self.assertEqual("MISS", response.headers["X-Cache"])
+        self.assertEqual(9, response.json["quantity"])
+
+    def test_issue_invalidates_books_and_members(self):
+        """Check issuing a book refreshes the book and member lookups"""
+        book_url = f"/api/books/get_by_id/{self.book.id}"
+        member_url = f"/api/members/get_by_id/{self.member.id}"
+        self.client.get(book_url)
+        self.client.get(member_url)
+
+        self.client.post(
+            "/api/transactions/issue_book",
+            json={"member_id": self.member.id, "book_id": self.book.id},
+        )
+
+        self.assertEqual(3, self.client.get(book_url).json["quantity"])
+        self.assertEqual(1, self.client.get(member_url).json["books_borrowed"])
+
+    def test_member_delete_invalidates_members(self):
+        """Check deleting a member empties the cached member list"""
+        self.client.get("/api/members/get_members")
+        self.client.delete(f"/api/members/delete/{self.member.id}")
+
+        response = self.client.get("/api/members/get_members")
+
+        self.assertEqual(0, response.json["total_members"])
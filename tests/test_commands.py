@@ -0,0 +1,98 @@
+import json
+import os
+import tempfile
+
+from unittest import TestCase
+from app.models import Book, Member
+from app import create_app, db
+
+
+class TestImportCommand(TestCase):
+    """Tests the flask import command"""
+
+    def setUp(self):
+        """Set up the CLI runner and Flask app context."""
+        self.app = create_app("testing")
+        self.runner = self.app.test_cli_runner()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Clean up after each test."""
+        self.tmpdir.cleanup()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def write_file(self, name, content):
+        """Writes a file in the temporary directory and returns its path."""
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "w") as file:
+            file.write(content)
+        return path
+
+    def test_import_books_csv(self):
+        """Check books are imported from CSV in batches, skipping invalid rows"""
+        path = self.write_file(
+            "books.csv",
+            "title,author,quantity,penalty_fee\n"
+            "Test Book,John Doe,4,20\n"
+            "No,John Doe,4,20\n"
+            "Another Book,Jane Doe,2,\n"
+            "Last Book,Jane Doe,1,15\n",
+        )
+
+        result = self.runner.invoke(args=["import", "books", path, "--batch-size", "2"])
+
+        self.assertEqual(0, result.exit_code, result.output)
+        self.assertIn("3 books imported, 1 rejected", result.output)
+        self.assertIn("line 3", result.output)
+        self.assertEqual(3, Book.query.count())
+
+        book = Book.query.filter_by(title="another book").first()
+
+        self.assertIsNotNone(book)
+        self.assertEqual("jane doe", book.author)
+        self.assertEqual(10, book.penalty_fee)
+
+        response = self.app.test_client().get("/api/books/get_by_title/another")
+
+        self.assertEqual(book.id, response.json["books"][0]["id"])
+
+    def test_import_members_ndjson(self):
+        """Check members are imported from NDJSON"""
+        members = [
+            {"name": "Jane Doe", "debt": 0},
+            {"name": "John Doe", "debt": 20, "books_borrowed": 1},
+        ]
+        path = self.write_file(
+            "members.ndjson", "\n".join(json.dumps(member) for member in members)
+        )
+
+        result = self.runner.invoke(args=["import", "members", path])
+
+        self.assertEqual(0, result.exit_code, result.output)
+        self.assertIn("2 members imported, 0 rejected", result.output)
+        self.assertEqual(20, Member.query.filter_by(name="John Doe").first().debt)
+
+    def test_import_skips_malformed_json(self):
+        """Check a malformed NDJSON line is rejected without stopping the load"""
+        path = self.write_file(
+            "members.ndjson",
+            '{"name": "Jane Doe", "debt": 0}\n'
+            '{"name": "John Doe", "debt": \n'
+            '{"name": "Joe Bloggs", "debt": 0}\n',
+        )
+
+        result = self.runner.invoke(
+            args=["import", "members", path, "--batch-size", "1"]
+        )
+
+        self.assertEqual(0, result.exit_code, result.output)
+        self.assertIn("2 members imported, 1 rejected", result.output)
+        self.assertIn("line 2: invalid JSON", result.output)
+        self.assertEqual(
+            ["Jane Doe", "Joe Bloggs"], [member.name for member in Member.query]
+        )
@@ -0,0 +1,160 @@
+import os
+import tempfile
+
+from flask_migrate import check, upgrade
+from unittest import TestCase
+from unittest.mock import patch
+from app import create_app, db
+from app.config import TestingConfig, config, engine_options
+from app.database import apply_sqlite_pragmas
+
+
+class TestSqlitePragmas(TestCase):
+    """Tests the SQLite connection pragmas hook"""
+
+    def setUp(self):
+        """Set up the Flask app context."""
+        self.app = create_app("testing")
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.engine.dispose()
+        self.app_context.pop()
+
+    def pragma(self, name):
+        """Reads a pragma on a fresh pooled connection."""
+        with db.engine.connect() as connection:
+            return connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+    def test_pragmas_applied_on_connect(self):
+        """Check configured pragmas are set on new connections"""
+        self.app.config["SQLITE_PRAGMAS"] = {"busy_timeout": 1234, "cache_size": -2048}
+        apply_sqlite_pragmas(self.app)
+        db.engine.dispose()
+
+        self.assertEqual(1234, self.pragma("busy_timeout"))
+        self.assertEqual(-2048, self.pragma("cache_size"))
+
+    def test_no_pragmas_configured(self):
+        """Check connections keep SQLite defaults without configured pragmas"""
+        self.assertNotEqual(1234, self.pragma("busy_timeout"))
+
+
+class TestEngineOptions(TestCase):
+    """Tests the connection pool configuration"""
+
+    def test_server_database_options(self):
+        """Check pool options and statement timeouts for server databases"""
+        options = engine_options(
+            "postgresql://user@localhost/booknest",
+            pool_size=10,
+            max_overflow=20,
+            pool_recycle=1800,
+            pool_pre_ping=True,
+            statement_timeout=30000,
+        )
+
+        self.assertEqual(10, options["pool_size"])
+        self.assertEqual(20, options["max_overflow"])
+        self.assertEqual(1800, options["pool_recycle"])
+        self.assertTrue(options["pool_pre_ping"])
+        self.assertEqual(
+            "-c statement_timeout=30000", options["connect_args"]["options"]
+        )
+
+        options = engine_options(
+            "mysql://user@localhost/booknest",
+            pool_size=5,
+            max_overflow=0,
+            pool_recycle=600,
+            pool_pre_ping=False,
+            statement_timeout=1000,
+        )
+
+        self.assertFalse(options["pool_pre_ping"])
+        self.assertIn(
+            "max_execution_time=1000", options["connect_args"]["init_command"]
+        )
+
+    def test_environment_overrides(self):
+        """Check DB_* environment variables override the defaults"""
+        overrides = {"DB_POOL_SIZE": "3", "DB_POOL_PRE_PING": "false"}
+
+        with patch.dict(os.environ, overrides):
+            options = engine_options(
+                "postgresql://user@localhost/booknest",
+                pool_size=10,
+                max_overflow=20,
+                pool_recycle=1800,
+                pool_pre_ping=True,
+                statement_timeout=0,
+            )
+
+        self.assertEqual(3, options["pool_size"])
+        self.assertFalse(options["pool_pre_ping"])
+        self.assertNotIn("connect_args", options)
+
+    def test_sqlite_options(self):
+        """Check SQLite keeps SQLAlchemy's pool defaults"""
+        options = engine_options(
+            "sqlite:///data.sqlite",
+            pool_size=10,
+            max_overflow=20,
+            pool_recycle=1800,
+            pool_pre_ping=True,
+            statement_timeout=30000,
+        )
+
+        self.assertEqual({}, options)
+
+    def test_pool_status_route(self):
+        """Check the pool status route reports utilisation"""
+        app = create_app("testing")
+
+        response = app.test_client().get("/db_pool")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual("QueuePool", response.json["pool"])
+        self.assertEqual(0, response.json["checked_out"])
+        self.assertIn("size", response.json)
+
+
+class TestMigrations(TestCase):
+    """Tests the migration history against the models"""
+
+    def setUp(self):
+        """Set up an app on an empty SQLite file."""
+        self.directory = tempfile.TemporaryDirectory()
+        config["migrations"] = type(
+            "MigrationsConfig",
+            (TestingConfig,),
+            {
+                "SQLALCHEMY_DATABASE_URI": "sqlite:///"
+                + os.path.join(self.directory.name, "migrations.sqlite")
+            },
+        )
+        self.app = create_app("migrations")
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.engine.dispose()
+        self.app_context.pop()
+        del config["migrations"]
+        self.directory.cleanup()
+
+    def test_upgraded_schema_matches_models(self):
+        """Check autogenerate finds nothing to change after an upgrade"""
+        migrations = os.path.join(os.path.dirname(__file__), "..", "migrations")
+
+        upgrade(migrations)
+
+        try:
+            check(migrations)
+        except SystemExit:
+            self.fail("autogenerate detected changes after upgrading")
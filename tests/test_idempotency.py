@@ -0,0 +1,236 @@
+import hashlib
+import json
+import uuid
+
+from datetime import timedelta
+from unittest import TestCase
+from unittest.mock import patch
+from sqlalchemy.exc import OperationalError
+from app.idempotency import reserve_key
+from app.models import Book, IdempotencyKey, Member, Transaction
+from app.utils import utcnow
+from app import create_app, db
+
+
+class TestIdempotencyKeys(TestCase):
+    """Tests Idempotency-Key handling on the issue and return endpoints"""
+
+    def setUp(self):
+        """Set up the test client and app context."""
+        self.app = create_app("testing")
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.book = Book(title="test book", author="john doe", quantity=4)
+        self.member = Member(name="John Doe", debt=0, books_borrowed=0)
+        db.session.add_all([self.book, self.member])
+        db.session.commit()
+        self.data = {"member_id": self.member.id, "book_id": self.book.id}
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def post(self, url, key, data=None):
+        return self.client.post(
+            f"/api/transactions/{url}",
+            json=data or self.data,
+            headers={"Idempotency-Key": key},
+        )
+
+    def test_retry_replays_stored_response(self):
+        """Check a retried issue is answered without issuing twice"""
+        first = self.post("issue_book", "key-1")
+        second = self.post("issue_book", "key-1")
+        db.session.expire_all()
+
+        self.assertEqual(201, first.status_code)
+        self.assertEqual(201, second.status_code)
+        self.assertEqual(first.json, second.json)
+        self.assertEqual("true", second.headers["Idempotent-Replayed"])
+        self.assertNotIn("Idempotent-Replayed", first.headers)
+        self.assertEqual(1, Transaction.query.count())
+        self.assertEqual(1, self.member.books_borrowed)
+
+    def test_retried_return_charges_once(self):
+        """Check a retried return does not charge the penalty twice"""
+        self.post("issue_book", "issue")
+        Transaction.query.update({"issued_on": utcnow() - timedelta(days=10)})
+        db.session.commit()
+
+        self.post("retrieve_book", "return")
+        retry = self.post("retrieve_book", "return")
+        db.session.expire_all()
+
+        self.assertEqual(200, retry.status_code)
+        self.assertEqual(30, self.member.debt)
+        self.assertEqual(4, self.book.quantity)
+
+    def test_errors_are_replayed(self):
+        """Check a 4xx response is stored like a success"""
+        data = {"member_id": self.member.id, "book_id": 999}
+
+        first = self.post("issue_book", "key-1", data)
+        db.session.add(Book(id=999, title="late book", author="jane doe", quantity=1))
+        db.session.commit()
+        second = self.post("issue_book", "key-1", data)
+
+        self.assertEqual(400, second.status_code)
+        self.assertEqual(first.json, second.json)
+
+    def test_key_reused_for_other_request(self):
+        """Check a key sent with a different body is rejected"""
+        self.post("issue_book", "key-1")
+        other = self.post("issue_book", "key-1", {**self.data, "book_id": 999})
+
+        self.assertEqual(422, other.status_code)
+
+    def test_keys_are_per_endpoint(self):
+        """Check the same key on another endpoint is a new request"""
+        self.post("issue_book", "key-1")
+        response = self.post("retrieve_book", "key-1")
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            "Return transaction recorded successfully", response.json["Message"]
+        )
+
+    def test_request_in_progress(self):
+        """Check a retry racing the first request is told to wait"""
+        body = json.dumps(self.data).encode()
+        db.session.add(
+            IdempotencyKey(
+                key="key-1",
+                endpoint="transactions_bp.issue_book",
+                request_hash=hashlib.sha256(body).hexdigest(),
+            )
+        )
+        db.session.commit()
+
+        response = self.client.post(
+            "/api/transactions/issue_book",
+            data=body,
+            content_type="application/json",
+            headers={"Idempotency-Key": "key-1"},
+        )
+
+        self.assertEqual(409, response.status_code)
+        self.assertEqual(0, Transaction.query.count())
+
+    def test_abandoned_request_runs_again(self):
+        """Check a reservation past its lease is taken over"""
+        body = json.dumps(self.data).encode()
+        db.session.add(
+            IdempotencyKey(
+                key="key-1",
+                endpoint="transactions_bp.issue_book",
+                request_hash=hashlib.sha256(body).hexdigest(),
+                created_at=utcnow() - timedelta(minutes=5),
+            )
+        )
+        db.session.commit()
+
+        response = self.post("issue_book", "key-1")
+        retry = self.post("issue_book", "key-1")
+
+        self.assertEqual(201, response.status_code)
+        self.assertEqual("true", retry.headers["Idempotent-Replayed"])
+        self.assertEqual(1, Transaction.query.count())
+
+    def test_failed_commit_stores_nothing(self):
+        """Check a failed commit leaves neither the loan nor the key behind"""
+        commit = db.session.commit
+        calls = []
+
+        def flaky_commit():
+            calls.append(None)
+            # the first commit reserves the key, the second records the loan
+            if len(calls) == 2:
+                raise OperationalError("COMMIT", {}, Exception("database is locked"))
+            commit()
+
+        with patch.object(db.session, "commit", flaky_commit):
+            response = self.post("issue_book", "key-1")
+
+        self.assertEqual(500, response.status_code)
+        self.assertEqual(0, Transaction.query.count())
+        self.assertEqual(0, IdempotencyKey.query.count())
+
+        retry = self.post("issue_book", "key-1")
+
+        self.assertEqual(201, retry.status_code)
+        self.assertEqual(1, Transaction.query.count())
+
+    def test_request_outliving_its_lease(self):
+        """Check a request whose key was taken over is rolled back"""
+
+        def taken_over(key, endpoint, request_hash):
+            token = reserve_key(key, endpoint, request_hash)
+            IdempotencyKey.query.update({"token": uuid.uuid4().hex})
+            db.session.commit()
+            return token
+
+        with patch("app.idempotency.reserve_key", taken_over):
+            response = self.post("issue_book", "key-1")
+        db.session.expire_all()
+
+        self.assertEqual(409, response.status_code)
+        self.assertEqual(0, Transaction.query.count())
+        self.assertEqual(0, self.member.books_borrowed)
+
+    def test_reservation_without_fractional_seconds(self):
+        """Check the response is stored when created_at loses its
+        microseconds, as in a MySQL DATETIME"""
+
+        def truncated(key, endpoint, request_hash):
+            token = reserve_key(key, endpoint, request_hash)
+            record = db.session.get(IdempotencyKey, (key, endpoint))
+            record.created_at = record.created_at.replace(microsecond=0)
+            db.session.commit()
+            return token
+
+        with patch("app.idempotency.reserve_key", truncated):
+            response = self.post("issue_book", "key-1")
+        retry = self.post("issue_book", "key-1")
+
+        self.assertEqual(201, response.status_code)
+        self.assertEqual("true", retry.headers["Idempotent-Replayed"])
+        self.assertEqual(1, Transaction.query.count())
+
+    def test_expired_key_runs_again(self):
+        """Check a key past its TTL no longer replays"""
+        self.post("issue_book", "key-1")
+        IdempotencyKey.query.update({"created_at": utcnow() - timedelta(days=2)})
+        db.session.commit()
+
+        response = self.post("issue_book", "key-1")
+
+        self.assertEqual(400, response.status_code)
+        self.assertEqual("Book already issued to member", response.json["Error"])
+
+    def test_invalid_key(self):
+        """Check an overlong key is rejected"""
+        response = self.post("issue_book", "k" * 300)
+
+        self.assertEqual(400, response.status_code)
+        self.assertEqual(0, Transaction.query.count())
+
+    def test_purge_command(self):
+        """Check the purge command deletes expired keys only"""
+        self.post("issue_book", "old")
+        self.post("retrieve_book", "new")
+        IdempotencyKey.query.filter_by(key="old").update(
+            {"created_at": utcnow() - timedelta(days=2)}
+        )
+        db.session.commit()
+
+        result = self.app.test_cli_runner().invoke(
+            args=["purge-idempotency-keys", "--batch-size", "1"]
+        )
+
+        self.assertIn("1 expired idempotency keys deleted", result.output)
+        self.assertEqual(["new"], [record.key for record in IdempotencyKey.query])
@@ -0,0 +1,52 @@
+from unittest import TestCase
+from app.models import Book
+from app import create_app, db
+
+
+class TestRequestInstrumentation(TestCase):
+    """Tests the per-request SQL instrumentation"""
+
+    def setUp(self):
+        """Set up the test client and app context."""
+        self.app = create_app("testing")
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_server_timing_header(self):
+        """Check responses report query count and database time"""
+        db.session.add(Book(title="Test Book", author="John Doe", quantity=4))
+        db.session.commit()
+
+        response = self.client.get("/api/books/get_books")
+        timing = response.headers["Server-Timing"]
+
+        # table versions, COUNT, page
+        self.assertIn('desc="3 queries"', timing)
+        self.assertRegex(timing, r"^db;dur=\d+\.\d+;")
+        self.assertRegex(timing, r"total;dur=\d+\.\d+$")
+
+    def test_slow_request_logged(self):
+        """Check requests over the threshold are logged with the slowest query"""
+        self.app.config["SLOW_REQUEST_THRESHOLD_MS"] = 0
+
+        with self.assertLogs(self.app.logger, level="WARNING") as logs:
+            self.client.delete("/api/members/delete/1")
+
+        self.assertIn("Slow request DELETE /api/members/delete/1", logs.output[0])
+        self.assertIn("1 queries", logs.output[0])
+        self.assertIn("FROM members", logs.output[0])
+
+    def test_fast_request_not_logged(self):
+        """Check requests under the threshold are not logged"""
+        self.app.config["SLOW_REQUEST_THRESHOLD_MS"] = 60000
+
+        with self.assertNoLogs(self.app.logger, level="WARNING"):
+            self.client.get("/api/books/get_by_id/1")
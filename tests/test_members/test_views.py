@@ -143,3 +143,55 @@ class TestMemberRoutes(TestCase):
         
         self.assertEqual(response.status_code, 200)
         self.assertEqual('Member deleted succesfully!', response.json['Message'])
+
+    def test_get_members_with_cursor(self):
+        """Check get members endpoint supports cursor pagination."""
+        db.session.add_all([Member(name=f'Member {i}', debt=0) for i in range(3)])
+        db.session.commit()
+
+        response = self.client.get(
+            '/api/members/get_members',
+            query_string={'cursor': '', 'per_page': 2, 'with_total': 'false'}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(2, len(response.json['members']))
+        self.assertNotIn('total_members', response.json)
+        self.assertTrue(response.json['has_next'])
+
+        response = self.client.get(
+            '/api/members/get_members',
+            query_string={'cursor': response.json['next_cursor'], 'per_page': 2}
+        )
+
+        self.assertEqual(3, response.json['total_members'])
+        self.assertEqual('Member 2', response.json['members'][0]['name'])
+        self.assertIsNone(response.json['next_cursor'])
+
+    def test_export(self):
+        """Check export endpoint streams every member."""
+        db.session.add_all([Member(name='Jane Doe', debt=0), Member(name='John Doe', debt=5)])
+        db.session.commit()
+
+        response = self.client.get('/api/members/export', query_string={'format': 'csv'})
+        lines = response.data.decode().splitlines()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(['id,name,debt,books_borrowed', '1,Jane Doe,0,0', '2,John Doe,5,0'], lines)
+
+    def test_get_many(self):
+        """Check get_many returns members in request order and lists missing ids."""
+        db.session.add_all([Member(name='Jane Doe', debt=0), Member(name='John Doe', debt=0)])
+        db.session.commit()
+
+        response = self.client.get('/api/members/get_many', query_string={'ids': '2,5,1'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(['John Doe', 'Jane Doe'], [m['name'] for m in response.json['members']])
+        self.assertEqual([5], response.json['missing'])
+
+    def test_get_many_invalid_ids(self):
+        """Check malformed ids are rejected."""
+        response = self.client.get('/api/members/get_many?ids=one')
+
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,125 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+from unittest import TestCase
+from prometheus_client import REGISTRY
+from app.models import Book, Member
+from app import create_app, db
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestMetrics(TestCase):
+    """Tests the /metrics endpoint"""
+
+    def setUp(self):
+        """Set up the test client and app context."""
+        self.app = create_app("testing")
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def sample(self, name, **labels):
+        """Reads the current value of a metric sample."""
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_metrics(self):
+        """Check requests, latencies and errors are exported"""
+        requests_before = self.sample(
+            "booknest_http_requests_total",
+            endpoint="books_bp.get_by_id",
+            method="GET",
+            status="400",
+        )
+        errors_before = self.sample(
+            "booknest_http_errors_total", endpoint="books_bp.get_by_id", status="400"
+        )
+
+        self.client.get("/api/books/get_by_id/1")
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("booknest_http_request_duration_seconds_bucket", response.text)
+        self.assertIn("booknest_db_pool_checked_out", response.text)
+        self.assertEqual(
+            requests_before + 1,
+            self.sample(
+                "booknest_http_requests_total",
+                endpoint="books_bp.get_by_id",
+                method="GET",
+                status="400",
+            ),
+        )
+        self.assertEqual(
+            errors_before + 1,
+            self.sample(
+                "booknest_http_errors_total",
+                endpoint="books_bp.get_by_id",
+                status="400",
+            ),
+        )
+
+    def test_domain_counters(self):
+        """Check issues, returns and penalties are counted"""
+        book = Book(title="Test Book", author="John Doe", quantity=4)
+        member = Member(name="John Doe", debt=0, books_borrowed=0)
+        db.session.add_all([book, member])
+        db.session.commit()
+
+        issued = self.sample("booknest_books_issued_total")
+        returned = self.sample("booknest_books_returned_total")
+        data = {"member_id": member.id, "book_id": book.id}
+
+        self.client.post("/api/transactions/issue_book", json=data)
+        self.client.post("/api/transactions/retrieve_book", json=data)
+
+        self.assertEqual(issued + 1, self.sample("booknest_books_issued_total"))
+        self.assertEqual(returned + 1, self.sample("booknest_books_returned_total"))
+
+
+WORKER_SCRIPT = """
+from app import create_app
+app = create_app("testing")
+client = app.test_client()
+client.get("/api/books/hello")
+print(client.get("/metrics").text if {scrape} else "")
+"""
+
+
+class TestMultiProcessMetrics(TestCase):
+    """Tests metrics are aggregated across worker processes"""
+
+    def run_worker(self, metrics_dir, scrape=False):
+        """Runs one app process sharing the metrics directory."""
+        env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=metrics_dir)
+
+        return subprocess.run(
+            [sys.executable, "-c", WORKER_SCRIPT.format(scrape=scrape)],
+            cwd=ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+
+    def test_requests_summed_across_processes(self):
+        """Check /metrics in one process reports requests from all of them"""
+        with tempfile.TemporaryDirectory() as metrics_dir:
+            self.run_worker(metrics_dir)
+            self.run_worker(metrics_dir)
+            output = self.run_worker(metrics_dir, scrape=True)
+
+        self.assertIn(
+            'booknest_http_requests_total{endpoint="books_bp.hello_world",'
+            'method="GET",status="200"} 3.0',
+            output,
+        )
@@ -1,3 +1,4 @@
+from datetime import datetime
 from unittest import TestCase
 from app.models import Book, Transaction, Member
 from app.utils import TransactionType
@@ -149,3 +150,59 @@ class TestBookModel(TestCase):
         self.assertIsNotNone(transaction2)
         self.assertIsNotNone(retrieved_member.transactions)
         self.assertEqual(len(retrieved_member.transactions), 2)
+
+
+class TestTransactionIndexes(TestCase):
+    """Tests the query planner uses the transactions lookup indexes"""
+
+    def setUp(self):
+        """Set up the Flask app context."""
+        self.app = app
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def query_plan(self, query):
+        """Returns the SQLite query plan of a query as one string."""
+        compiled = query.statement.compile(db.engine)
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+        rows = db.session.connection().exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {compiled}", params
+        ).all()
+
+        return " ".join(row[-1] for row in rows)
+
+    def test_open_loan_lookup_uses_index(self):
+        """Check the book and member lookup used by issue/return is indexed"""
+        query = Transaction.query.filter_by(
+            book_id=1, member_id=1, type=TransactionType.ISSUE
+        )
+
+        self.assertIn("ix_transactions_book_id_member_id_type", self.query_plan(query))
+
+    def test_book_lookup_uses_index(self):
+        """Check the pending transaction lookup used by delete_book is indexed"""
+        query = Transaction.query.filter_by(book_id=1, type=TransactionType.ISSUE)
+
+        self.assertIn("ix_transactions_book_id_type", self.query_plan(query))
+
+    def test_member_lookup_uses_index(self):
+        """Check the pending transaction lookup used by delete_member is indexed"""
+        query = Transaction.query.filter_by(member_id=1, type=TransactionType.ISSUE)
+
+        self.assertIn("ix_transactions_member_id_type", self.query_plan(query))
+
+    def test_overdue_lookup_uses_index(self):
+        """Check the overdue loans report seeks on type and issued_on"""
+        query = Transaction.query.filter(
+            Transaction.type == TransactionType.ISSUE,
+            Transaction.issued_on <= datetime(2026, 1, 1),
+        )
+
+        self.assertIn("ix_transactions_type_issued_on", self.query_plan(query))
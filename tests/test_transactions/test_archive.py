@@ -0,0 +1,169 @@
+from datetime import datetime, timedelta
+from unittest import TestCase
+from app import create_app, db
+from app.models import Book, Member, Transaction, TransactionArchive
+from app.transactions.archive import archive_transactions
+from app.utils import TransactionType, utcnow
+
+
+class TestTransactionArchive(TestCase):
+    """Tests archiving returned transactions"""
+
+    def setUp(self):
+        """Set up the app context with a member, a book and some returns."""
+        self.app = create_app("testing")
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.member = Member(name="John Doe", debt=0, books_borrowed=0)
+        self.book = Book(title="Test Book", author="Jane Doe", quantity=5)
+        db.session.add_all([self.member, self.book])
+        db.session.commit()
+
+        self.now = datetime.now()
+        # ids 1 to 3 returned long ago, 4 recently, 5 still open, 6 old again
+        for days, kind in (
+            (400, TransactionType.RETURN),
+            (380, TransactionType.RETURN),
+            (370, TransactionType.RETURN),
+            (5, TransactionType.RETURN),
+            (2, TransactionType.ISSUE),
+            (500, TransactionType.RETURN),
+        ):
+            self.record(days, kind)
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def record(self, days_ago, kind):
+        """Adds a transaction issued and, for returns, returned days ago."""
+        when = self.now - timedelta(days=days_ago)
+        db.session.add(
+            Transaction(
+                book_id=self.book.id,
+                member_id=self.member.id,
+                type=kind,
+                issued_on=when - timedelta(days=3),
+                returned_on=when if kind == TransactionType.RETURN else None,
+                charge=10 if kind == TransactionType.RETURN else 0,
+            )
+        )
+
+    def ids(self, model):
+        return [row.id for row in db.session.query(model.id).order_by(model.id)]
+
+    def test_moves_only_old_returns(self):
+        """Check returns older than the cutoff move and the rest stay"""
+        progress = []
+
+        moved = archive_transactions(365, 2, self.now, progress.append)
+
+        self.assertEqual(4, moved)
+        self.assertEqual([2, 4], progress)
+        self.assertEqual([1, 2, 3, 6], self.ids(TransactionArchive))
+        self.assertEqual([4, 5], self.ids(Transaction))
+
+        archived = db.session.get(TransactionArchive, 1)
+        self.assertEqual(10, archived.charge)
+        self.assertEqual(self.member.id, archived.member_id)
+        self.assertIsNotNone(archived.archived_at)
+
+    def test_archived_ids_are_not_reused(self):
+        """Check new transactions never get the id of an archived one"""
+        archive_transactions(365, 100, self.now)
+        db.session.execute(db.delete(Transaction).where(Transaction.id >= 4))
+        db.session.commit()
+
+        self.record(1, TransactionType.ISSUE)
+        db.session.commit()
+
+        self.assertEqual([7], self.ids(Transaction))
+
+        response = self.client.get(
+            "/api/transactions/get_transactions?include_archive=true"
+        )
+        self.assertEqual(
+            [1, 2, 3, 6, 7], [t["id"] for t in response.json["transactions"]]
+        )
+
+    def test_second_run_moves_nothing(self):
+        """Check archiving again is a no-op"""
+        archive_transactions(365, 100, self.now)
+
+        self.assertEqual(0, archive_transactions(365, 100, self.now))
+
+    def test_listing_excludes_archive_by_default(self):
+        """Check get_transactions lists only the hot table"""
+        archive_transactions(365, 100, self.now)
+
+        response = self.client.get("/api/transactions/get_transactions")
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([4, 5], [t["id"] for t in response.json["transactions"]])
+
+    def test_listing_includes_archive(self):
+        """Check include_archive lists both tables in id order"""
+        archive_transactions(365, 100, self.now)
+
+        response = self.client.get(
+            "/api/transactions/get_transactions?include_archive=true"
+        )
+        transactions = response.json["transactions"]
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(6, response.json["total_transactions"])
+        self.assertEqual([1, 2, 3, 4, 5, 6], [t["id"] for t in transactions])
+        self.assertEqual("return", transactions[0]["type"])
+        self.assertEqual("Test Book", transactions[0]["book_title"])
+        self.assertEqual("John Doe", transactions[0]["member_name"])
+        self.assertEqual("issue", transactions[4]["type"])
+
+    def test_listing_includes_archive_by_cursor(self):
+        """Check include_archive pages with next_cursor across both tables"""
+        archive_transactions(365, 100, self.now)
+
+        first = self.client.get(
+            "/api/transactions/get_transactions",
+            query_string={"include_archive": "true", "cursor": "", "per_page": 4},
+        )
+        second = self.client.get(
+            "/api/transactions/get_transactions",
+            query_string={
+                "include_archive": "true",
+                "cursor": first.json["next_cursor"],
+                "per_page": 4,
+            },
+        )
+
+        self.assertEqual([1, 2, 3, 4], [t["id"] for t in first.json["transactions"]])
+        self.assertEqual([5, 6], [t["id"] for t in second.json["transactions"]])
+        self.assertEqual(6, first.json["total_transactions"])
+
+    def test_listing_archive_since(self):
+        """Check since filters the archived rows as well"""
+        archive_transactions(365, 100, self.now)
+        since = (utcnow() + timedelta(minutes=1)).isoformat()
+
+        response = self.client.get(
+            "/api/transactions/get_transactions",
+            query_string={"include_archive": "true", "since": since, "cursor": ""},
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([], response.json["transactions"])
+
+    def test_archive_command(self):
+        """Check the CLI command reports the archived rows"""
+        result = self.app.test_cli_runner().invoke(
+            args=["archive-transactions", "--days", "365", "--batch-size", "2"]
+        )
+
+        self.assertEqual(0, result.exit_code, result.output)
+        self.assertIn("Done: 4 transactions archived", result.output)
+        self.assertEqual([4, 5], self.ids(Transaction))
@@ -0,0 +1,141 @@
+from unittest import TestCase
+from app import create_app, db
+from app.models import Book, Member, Transaction
+from app.transactions.counters import counter_drift
+from app.transactions.operations import issue, issue_many, retrieve, retrieve_many
+from app.utils import TransactionType
+
+
+class TestLoanCounters(TestCase):
+    """Tests the book and member loan counters"""
+
+    def setUp(self):
+        """Set up the app context with a member and two books."""
+        self.app = create_app("testing")
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.member = Member(name="John Doe", debt=0, books_borrowed=0)
+        self.book = Book(title="Test Book", author="Jane Doe", quantity=5)
+        self.other = Book(title="Other Book", author="Jane Doe", quantity=2)
+        db.session.add_all([self.member, self.book, self.other])
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_issue_and_return(self):
+        """Check issue and return move a copy between shelf and loan"""
+        issue(self.member.id, self.book.id)
+        db.session.expire_all()
+
+        self.assertEqual((4, 1), (self.book.quantity, self.book.on_loan))
+        self.assertEqual(5, self.book.total_copies)
+        self.assertEqual(1, self.member.books_borrowed)
+
+        retrieve(self.member.id, self.book.id)
+        db.session.expire_all()
+
+        self.assertEqual((5, 0), (self.book.quantity, self.book.on_loan))
+        self.assertEqual(0, self.member.books_borrowed)
+
+    def test_batches(self):
+        """Check batch issue and return keep the counters"""
+        ids = [self.book.id, self.other.id]
+
+        issue_many(self.member.id, ids)
+        db.session.expire_all()
+
+        self.assertEqual([1, 1], [self.book.on_loan, self.other.on_loan])
+        self.assertEqual([4, 1], [self.book.quantity, self.other.quantity])
+        self.assertEqual(2, self.member.books_borrowed)
+        self.assertEqual({"books": [], "members": []}, counter_drift())
+
+        retrieve_many(self.member.id, ids)
+        db.session.expire_all()
+
+        self.assertEqual([0, 0], [self.book.on_loan, self.other.on_loan])
+        self.assertEqual(0, self.member.books_borrowed)
+
+    def test_total_copies_in_sql(self):
+        """Check total_copies can be queried"""
+        issue(self.member.id, self.other.id)
+
+        found = Book.query.filter(Book.total_copies == 2).all()
+
+        self.assertEqual([self.other.id], [book.id for book in found])
+
+
+class TestReconcileCommand(TestCase):
+    """Tests the flask reconcile command"""
+
+    def setUp(self):
+        """Set up the app context with one loan recorded in the ledger."""
+        self.app = create_app("testing")
+        self.runner = self.app.test_cli_runner()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.member = Member(name="John Doe", debt=0, books_borrowed=0)
+        self.idle = Member(name="Jane Doe", debt=0, books_borrowed=0)
+        self.book = Book(title="Test Book", author="Jane Doe", quantity=5)
+        db.session.add_all([self.member, self.idle, self.book])
+        db.session.commit()
+        issue(self.member.id, self.book.id)
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def drift(self):
+        """Breaks the counters behind the ledger's back."""
+        db.session.add(
+            Transaction(
+                book_id=self.book.id,
+                member_id=self.idle.id,
+                type=TransactionType.ISSUE,
+            )
+        )
+        self.member.books_borrowed = 3
+        db.session.commit()
+
+    def test_no_drift(self):
+        """Check counters maintained by issue report no drift"""
+        result = self.runner.invoke(args=["reconcile"])
+
+        self.assertEqual(0, result.exit_code, result.output)
+        self.assertIn("0 books and 0 members drifted", result.output)
+
+    def test_reports_drift(self):
+        """Check drifted rows are listed without being changed"""
+        self.drift()
+
+        result = self.runner.invoke(args=["reconcile"])
+        db.session.expire_all()
+
+        self.assertIn(f"books {self.book.id}: counter 1, ledger 2", result.output)
+        self.assertIn(f"members {self.member.id}: counter 3, ledger 1", result.output)
+        self.assertIn(f"members {self.idle.id}: counter 0, ledger 1", result.output)
+        self.assertIn("1 books and 2 members drifted", result.output)
+        self.assertEqual(3, self.member.books_borrowed)
+
+    def test_fix(self):
+        """Check --fix writes back the counted values"""
+        self.drift()
+        version = self.book.version
+
+        result = self.runner.invoke(args=["reconcile", "--fix"])
+        db.session.expire_all()
+
+        self.assertIn("Counters fixed", result.output)
+        self.assertEqual((3, 2), (self.book.quantity, self.book.on_loan))
+        self.assertEqual(version + 1, self.book.version)
+        self.assertEqual([1, 1], [self.member.books_borrowed, self.idle.books_borrowed])
+        self.assertEqual({"books": [], "members": []}, counter_drift())
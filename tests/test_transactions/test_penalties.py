@@ -0,0 +1,249 @@
+from datetime import datetime, timedelta
+from unittest import TestCase
+from app import create_app, db
+from app.models import Book, Member, Transaction
+from app.transactions.operations import compute_penalty
+from app.transactions.penalties import sweep_penalties
+from app.utils import TransactionType
+
+
+class TestPenaltySweep(TestCase):
+    """Tests the overdue penalty sweep"""
+
+    def setUp(self):
+        """Set up the app context with a member, a book and the CLI runner."""
+        self.app = create_app("testing")
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.member = Member(name="John Doe", debt=0, books_borrowed=0)
+        self.book = Book(title="Test Book", author="Jane Doe", quantity=5)
+        db.session.add_all([self.member, self.book])
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def loan(self, days_ago, member=None, book=None):
+        """Adds an open loan issued some days ago."""
+        member = member or self.member
+        book = book or self.book
+        member.books_borrowed += 1
+        record = Transaction(
+            book_id=book.id,
+            member_id=member.id,
+            type=TransactionType.ISSUE,
+            issued_on=datetime.now() - timedelta(days=days_ago),
+        )
+        db.session.add(record)
+        db.session.commit()
+
+        return record
+
+    def test_sql_penalty_matches_python(self):
+        """Check the swept charge equals compute_penalty for the same loan"""
+        records = [self.loan(days) for days in (0, 7, 8, 12, 30, 90)]
+        now = datetime.now() + timedelta(hours=1)
+
+        sweep_penalties(100, now)
+        db.session.expire_all()
+
+        for record in records:
+            self.assertEqual(
+                compute_penalty(record.issued_on, self.book.penalty_fee, now),
+                record.accrued_charge,
+            )
+
+    def test_sweep_charges_member_debt(self):
+        """Check open overdue loans show up in the member's debt"""
+        self.loan(10)
+
+        updated = sweep_penalties(100, datetime.now())
+        db.session.expire_all()
+
+        self.assertEqual(1, updated)
+        self.assertEqual(30, self.member.debt)
+
+    def test_sweep_charges_only_the_increase(self):
+        """Check running the sweep again adds only newly accrued days"""
+        record = self.loan(10)
+        now = datetime.now()
+
+        sweep_penalties(100, now)
+        second = sweep_penalties(100, now)
+        sweep_penalties(100, now + timedelta(days=2))
+        db.session.expire_all()
+
+        self.assertEqual(0, second)
+        self.assertEqual(50, record.accrued_charge)
+        self.assertEqual(50, self.member.debt)
+
+    def test_sweep_spans_batches(self):
+        """Check loans in every id window are swept"""
+        members = [Member(name=f"Member {i}", debt=0) for i in range(5)]
+        db.session.add_all(members)
+        db.session.commit()
+        for member in members:
+            self.loan(9, member=member)
+
+        progress = []
+        updated = sweep_penalties(
+            2, datetime.now(), lambda *args: progress.append(args)
+        )
+        db.session.expire_all()
+
+        self.assertEqual(5, updated)
+        self.assertEqual(3, len(progress))
+        self.assertEqual([20] * 5, [member.debt for member in members])
+
+    def test_return_charges_remaining_penalty(self):
+        """Check a return after a sweep does not charge accrued days twice"""
+        self.loan(10)
+        sweep_penalties(100, datetime.now())
+
+        response = self.client.post(
+            "/api/transactions/retrieve_book",
+            json={"member_id": self.member.id, "book_id": self.book.id},
+        )
+        db.session.expire_all()
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(30, self.member.debt)
+        self.assertEqual(30, Transaction.query.one().charge)
+
+    def test_sweep_ignores_returned_loans(self):
+        """Check returned loans are left alone"""
+        record = self.loan(10)
+        record.type = TransactionType.RETURN
+        db.session.commit()
+
+        self.assertEqual(0, sweep_penalties(100, datetime.now()))
+
+    def test_command(self):
+        """Check the CLI command reports the swept loans"""
+        self.loan(10)
+
+        result = self.app.test_cli_runner().invoke(
+            args=["sweep-penalties", "--batch-size", "1"]
+        )
+
+        self.assertEqual(0, result.exit_code)
+        self.assertIn("Done: 1 loans updated", result.output)
+
+
+class TestOverdueReport(TestCase):
+    """Tests the overdue loans endpoint"""
+
+    def setUp(self):
+        """Set up the test client with open loans of different ages."""
+        self.app = create_app("testing")
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.book = Book(title="Test Book", author="Jane Doe", quantity=5)
+        self.members = [Member(name=f"Member {i}", debt=0) for i in range(4)]
+        db.session.add_all([self.book, *self.members])
+        db.session.commit()
+
+        now = datetime.now()
+        for member, days in zip(self.members, (3, 10, 20, 60)):
+            db.session.add(
+                Transaction(
+                    book_id=self.book.id,
+                    member_id=member.id,
+                    type=TransactionType.ISSUE,
+                    issued_on=now - timedelta(days=days),
+                )
+            )
+        db.session.add(
+            Transaction(
+                book_id=self.book.id,
+                member_id=self.members[0].id,
+                type=TransactionType.RETURN,
+                issued_on=now - timedelta(days=40),
+            )
+        )
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_lists_overdue_open_loans(self):
+        """Check only open loans past the borrowing period are listed"""
+        response = self.client.get("/api/transactions/overdue")
+        loans = response.json["loans"]
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, response.json["total_loans"])
+        self.assertEqual(
+            ["Member 3", "Member 2", "Member 1"],
+            [loan["member_name"] for loan in loans],
+        )
+        self.assertEqual([53, 13, 3], [loan["days_overdue"] for loan in loans])
+        self.assertEqual([500, 130, 30], [loan["projected_penalty"] for loan in loans])
+        self.assertEqual("Test Book", loans[0]["book_title"])
+
+    def test_paginates_by_cursor(self):
+        """Check the report pages with next_cursor"""
+        first = self.client.get("/api/transactions/overdue?per_page=2")
+        second = self.client.get(
+            "/api/transactions/overdue",
+            query_string={"per_page": 2, "cursor": first.json["next_cursor"]},
+        )
+
+        self.assertEqual(2, len(first.json["loans"]))
+        self.assertEqual(["Member 1"], [l["member_name"] for l in second.json["loans"]])
+        self.assertFalse(second.json["has_next"])
+
+    def test_paginates_loans_issued_together(self):
+        """Check loans sharing an issue time are neither skipped nor repeated"""
+        issued_on = datetime.now() - timedelta(days=30)
+        for member in self.members:
+            db.session.add(
+                Transaction(
+                    book_id=self.book.id,
+                    member_id=member.id,
+                    type=TransactionType.ISSUE,
+                    issued_on=issued_on,
+                )
+            )
+        db.session.commit()
+
+        ids, cursor = [], ""
+        while cursor is not None:
+            page = self.client.get(
+                "/api/transactions/overdue",
+                query_string={"per_page": 1, "cursor": cursor},
+            ).json
+            ids += [loan["id"] for loan in page["loans"]]
+            cursor = page["next_cursor"]
+
+        self.assertEqual(7, len(ids))
+        self.assertEqual(7, len(set(ids)))
+
+    def test_shows_accrued_charge(self):
+        """Check the penalty accrued by the sweep is reported"""
+        sweep_penalties(100, datetime.now())
+
+        response = self.client.get("/api/transactions/overdue?with_total=false")
+
+        self.assertEqual(
+            [500, 130, 30], [loan["accrued_charge"] for loan in response.json["loans"]]
+        )
+        self.assertNotIn("total_loans", response.json)
+
+    def test_invalid_cursor(self):
+        """Check a malformed cursor is rejected"""
+        response = self.client.get("/api/transactions/overdue?cursor=xyz")
+
+        self.assertEqual(400, response.status_code)
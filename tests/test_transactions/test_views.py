@@ -3,11 +3,33 @@ from app import create_app, db
 from app.models import Member, Transaction, Book
 from app.utils import TransactionType
 from datetime import datetime, timedelta
+from sqlalchemy import event
+from threading import Barrier, Thread
 from pdb import set_trace
 
+import json
 import sys
 
 
+def charge_before_claim(debt):
+    """Listens for the guarded member update and commits a debt just before it.
+
+    Returns:
+        function: The listener, to be removed by the caller.
+    """
+    charged = []
+
+    def charge(conn, cursor, statement, *args):
+        if not charged and statement.lstrip().upper().startswith("UPDATE MEMBERS"):
+            charged.append(statement)
+            with db.engine.begin() as other:
+                other.execute(Member.__table__.update().values(debt=debt))
+
+    event.listen(db.engine, "before_cursor_execute", charge)
+
+    return charge
+
+
 class TestTransactionRoutes(TestCase):
     def setUp(self):
         """Set up the test client and app context."""
@@ -357,7 +379,7 @@ class TestTransactionRoutes(TestCase):
                 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.json), 10)
-        self.assertEqual(len(response.json['transactions'][0]), 9)
+        self.assertEqual(len(response.json['transactions'][0]), 11)
         self.assertEqual(response.json['transactions'][0]["id"], retrieved_record.id)
         self.assertEqual(response.json['transactions'][0]["book_id"], self.test_book.id)
         self.assertEqual(response.json['transactions'][0]["book_title"], self.test_book.title)
@@ -367,3 +389,337 @@ class TestTransactionRoutes(TestCase):
         self.assertIsNotNone(response.json['transactions'][0]["issued_on"])
         self.assertIsNone(response.json['transactions'][0]["returned_on"])
         self.assertEqual(response.json['transactions'][0]["charge"], 0)
+
+    def test_get_transactions_with_cursor(self):
+        """Test the get all transactions route with cursor pagination."""
+        issue_data = {
+            "member_id": self.test_member.id,
+            "book_id": self.test_book.id,
+        }
+
+        self.client.post("/api/transactions/issue_book", json=issue_data)
+
+        response = self.client.get(
+            "/api/transactions/get_transactions", query_string={"cursor": ""}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(1, response.json["total_transactions"])
+        self.assertEqual(
+            response.json["transactions"][0]["book_title"], self.test_book.title
+        )
+        self.assertIsNone(response.json["next_cursor"])
+
+    def count_queries(self, url, **kwargs):
+        """Requests a url and returns the response and number of SQL statements."""
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            response = self.client.get(url, **kwargs)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+
+        return response, len(statements)
+
+    def test_get_transactions_query_count(self):
+        """Check listing transactions does not lazy load books and members."""
+        for i in range(5):
+            book = Book(title=f"Book {i}", author="Jane Doe", quantity=5)
+            member = Member(name=f"Member {i}", debt=0, books_borrowed=0)
+            db.session.add_all([book, member])
+            db.session.flush()
+            db.session.add(
+                Transaction(
+                    book_id=book.id, member_id=member.id, type=TransactionType.ISSUE
+                )
+            )
+        db.session.commit()
+        db.session.expunge_all()
+
+        response, queries = self.count_queries("/api/transactions/get_transactions")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(5, len(response.json["transactions"]))
+        self.assertEqual("Book 4", response.json["transactions"][4]["book_title"])
+        self.assertEqual("Member 4", response.json["transactions"][4]["member_name"])
+        self.assertEqual(3, queries)  # table versions, one COUNT, one page
+
+        response, queries = self.count_queries(
+            "/api/transactions/get_transactions",
+            query_string={"cursor": "", "with_total": "false"},
+        )
+
+        self.assertEqual(5, len(response.json["transactions"]))
+        self.assertEqual(2, queries)
+
+    def hammer(self, url, payloads):
+        """Posts every payload from its own thread at once, returns status codes."""
+        barrier = Barrier(len(payloads))
+        statuses = []
+
+        def worker(payload):
+            client = self.app.test_client()
+            barrier.wait()
+            statuses.append(client.post(url, json=payload).status_code)
+
+        threads = [Thread(target=worker, args=(payload,)) for payload in payloads]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        db.session.expire_all()
+
+        return statuses
+
+    def test_issue_book_under_concurrent_load(self):
+        """Check concurrent issues never hand out more copies than exist."""
+        self.test_book.quantity = 3
+        members = [Member(name=f"Member {i}", debt=0) for i in range(12)]
+        db.session.add_all(members)
+        db.session.commit()
+
+        statuses = self.hammer(
+            "/api/transactions/issue_book",
+            [{"member_id": m.id, "book_id": self.test_book.id} for m in members],
+        )
+
+        book = db.session.get(Book, self.test_book.id)
+        issued = Transaction.query.filter_by(
+            book_id=self.test_book.id, type=TransactionType.ISSUE
+        ).count()
+
+        self.assertEqual(3, statuses.count(201))
+        self.assertEqual(0, book.quantity)
+        self.assertEqual(3, issued)
+
+    def test_issue_book_limit_under_concurrent_load(self):
+        """Check concurrent issues never let a member exceed the borrowing limit."""
+        books = [Book(title=f"Book {i}", author="Jane Doe", quantity=5) for i in range(8)]
+        db.session.add_all(books)
+        db.session.commit()
+
+        statuses = self.hammer(
+            "/api/transactions/issue_book",
+            [{"member_id": self.test_member.id, "book_id": b.id} for b in books],
+        )
+
+        member = db.session.get(Member, self.test_member.id)
+
+        self.assertEqual(3, statuses.count(201))
+        self.assertEqual(3, member.books_borrowed)
+
+    def test_issue_book_on_member_charged_concurrently(self):
+        """Check a debt charged during the issue is reported as such."""
+        charge = charge_before_claim(50)
+        try:
+            response = self.client.post(
+                "/api/transactions/issue_book",
+                json={"member_id": self.test_member.id, "book_id": self.test_book.id},
+            )
+        finally:
+            event.remove(db.engine, "before_cursor_execute", charge)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual("Member must pay pending penalties!", response.json["Error"])
+        self.assertEqual(0, Transaction.query.count())
+
+    def test_retrieve_book_under_concurrent_load(self):
+        """Check concurrent returns of one loan are only recorded once."""
+        self.client.post(
+            "/api/transactions/issue_book",
+            json={"member_id": self.test_member.id, "book_id": self.test_book.id},
+        )
+
+        statuses = self.hammer(
+            "/api/transactions/retrieve_book",
+            [{"member_id": self.test_member.id, "book_id": self.test_book.id}] * 8,
+        )
+
+        book = db.session.get(Book, self.test_book.id)
+        member = db.session.get(Member, self.test_member.id)
+
+        self.assertEqual(1, statuses.count(200))
+        self.assertEqual(5, book.quantity)
+        self.assertEqual(0, member.books_borrowed)
+
+    def test_export(self):
+        """Test the transactions export route."""
+        self.client.post(
+            "/api/transactions/issue_book",
+            json={"member_id": self.test_member.id, "book_id": self.test_book.id},
+        )
+
+        response = self.client.get("/api/transactions/export")
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(1, len(lines))
+        self.assertEqual(self.test_book.title, lines[0]["book_title"])
+        self.assertEqual(self.test_member.name, lines[0]["member_name"])
+        self.assertEqual("issue", lines[0]["type"])
+        self.assertIsNotNone(datetime.fromisoformat(lines[0]["issued_on"]))
+
+
+class TestBatchRoutes(TestCase):
+    def setUp(self):
+        """Set up the test client, a member and three books."""
+        self.app = create_app("testing")
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.member = Member(name="John Doe", debt=0, books_borrowed=0)
+        self.books = [
+            Book(title=f"Book {i}", author="Jane Doe", quantity=2, penalty_fee=10)
+            for i in range(3)
+        ]
+        db.session.add_all([self.member, *self.books])
+        db.session.commit()
+        self.book_ids = [book.id for book in self.books]
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def post(self, url, book_ids, member_id=None):
+        return self.client.post(
+            f"/api/transactions/{url}",
+            json={"member_id": member_id or self.member.id, "book_ids": book_ids},
+        )
+
+    def test_issue_books(self):
+        """Check every book of the batch is issued in one go."""
+        response = self.post("issue_books", self.book_ids)
+        db.session.expire_all()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [{"book_id": book_id, "ok": True} for book_id in self.book_ids],
+            response.json["results"],
+        )
+        self.assertEqual(3, self.member.books_borrowed)
+        self.assertEqual([1, 1, 1], [book.quantity for book in self.books])
+        self.assertEqual(3, Transaction.query.filter_by(type="issue").count())
+
+    def test_issue_books_is_all_or_nothing(self):
+        """Check one unavailable book rejects the whole batch."""
+        self.books[1].quantity = 0
+        db.session.commit()
+
+        response = self.post("issue_books", self.book_ids[:2] + [999])
+        db.session.expire_all()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [True, False, False], [item["ok"] for item in response.json["results"]]
+        )
+        self.assertEqual("Book not available", response.json["results"][1]["Error"])
+        self.assertEqual("Cannot get book!", response.json["results"][2]["Error"])
+        self.assertEqual(0, self.member.books_borrowed)
+        self.assertEqual(2, self.books[0].quantity)
+        self.assertEqual(0, Transaction.query.count())
+
+    def test_issue_books_limit_counts_whole_batch(self):
+        """Check the borrowing limit applies to the loans plus the batch."""
+        self.post("issue_books", self.book_ids[:1])
+
+        response = self.post("issue_books", self.book_ids)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("cannot borrow more than 3", response.json["Error"])
+
+    def test_issue_books_on_member_charged_concurrently(self):
+        """Check a debt charged during the batch is reported as such."""
+        charge = charge_before_claim(50)
+        try:
+            response = self.post("issue_books", self.book_ids)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", charge)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual("Member must pay pending penalties!", response.json["Error"])
+
+    def test_issue_books_rejects_duplicates_and_open_loans(self):
+        """Check repeated ids and books already on loan are reported."""
+        self.post("issue_books", self.book_ids[:1])
+
+        response = self.post("issue_books", [self.book_ids[0], self.book_ids[1]])
+        duplicate = self.post("issue_books", [self.book_ids[1], self.book_ids[1]])
+
+        self.assertEqual(
+            "Book already issued to member", response.json["results"][0]["Error"]
+        )
+        self.assertEqual(
+            "Book requested more than once", duplicate.json["results"][1]["Error"]
+        )
+
+    def test_issue_books_query_count(self):
+        """Check a batch costs the same number of statements as one book."""
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            self.post("issue_books", self.book_ids)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+
+        selects = [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+        self.assertEqual(3, len(selects))  # member, books, open loans
+
+    def test_retrieve_books(self):
+        """Check a batch return closes every loan and charges penalties."""
+        self.post("issue_books", self.book_ids)
+        Transaction.query.filter_by(book_id=self.book_ids[0]).update(
+            {"issued_on": datetime.now() - timedelta(days=10)}
+        )
+        db.session.commit()
+
+        response = self.post("retrieve_books", self.book_ids)
+        db.session.expire_all()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(30, response.json["charge"])
+        self.assertEqual(
+            [30, 0, 0], [item["charge"] for item in response.json["results"]]
+        )
+        self.assertEqual(0, self.member.books_borrowed)
+        self.assertEqual(30, self.member.debt)
+        self.assertEqual([2, 2, 2], [book.quantity for book in self.books])
+        self.assertEqual(3, Transaction.query.filter_by(type="return").count())
+
+    def test_retrieve_books_is_all_or_nothing(self):
+        """Check a book not on loan rejects the whole return batch."""
+        self.post("issue_books", self.book_ids[:2])
+
+        response = self.post("retrieve_books", self.book_ids)
+        db.session.expire_all()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            "Book not issued to member!", response.json["results"][2]["Error"]
+        )
+        self.assertEqual(2, self.member.books_borrowed)
+        self.assertEqual(0, Transaction.query.filter_by(type="return").count())
+
+    def test_batch_validation(self):
+        """Check empty batches and unknown members are rejected."""
+        empty = self.post("issue_books", [])
+        unknown = self.post("retrieve_books", self.book_ids, member_id=999)
+
+        self.assertEqual(empty.status_code, 400)
+        self.assertEqual("Validation failed", empty.json["Error"])
+        self.assertEqual(unknown.status_code, 400)
+        self.assertEqual(
+            "Cannot get member details from database!", unknown.json["Error"]
+        )
@@ -0,0 +1,288 @@
+from unittest import TestCase
+from unittest.mock import patch
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+from app.models import Book, Member, TableVersion
+from app.versions import mark_changed
+from app import create_app, db
+
+
+class TestConditionalGet(TestCase):
+    """Tests ETag and Last-Modified handling on the lookup endpoints"""
+
+    def setUp(self):
+        """Set up the test client and app context."""
+        self.app = create_app("testing")
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.book = Book(title="test book", author="john doe", quantity=4)
+        self.member = Member(name="John Doe", debt=0, books_borrowed=0)
+        db.session.add_all([self.book, self.member])
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def version(self, name):
+        """Reads the version of a table."""
+        db.session.expire_all()
+        return db.session.get(TableVersion, name).version
+
+    def test_if_none_match_returns_not_modified(self):
+        """Check a matching ETag gets an empty 304"""
+        url = f"/api/books/get_by_id/{self.book.id}"
+        first = self.client.get(url)
+        etag = first.headers["ETag"]
+
+        response = self.client.get(url, headers={"If-None-Match": etag})
+
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(b"", response.data)
+        self.assertEqual(etag, response.headers["ETag"])
+
+    def test_if_modified_since_returns_not_modified(self):
+        """Check an up to date Last-Modified gets a 304"""
+        first = self.client.get("/api/members/get_members")
+
+        response = self.client.get(
+            "/api/members/get_members",
+            headers={"If-Modified-Since": first.headers["Last-Modified"]},
+        )
+
+        self.assertEqual(304, response.status_code)
+
+    def test_not_modified_skips_the_view_query(self):
+        """Check the 304 is answered from the version lookup alone"""
+        url = "/api/books/get_books"
+        etag = self.client.get(url).headers["ETag"]
+
+        response = self.client.get(url, headers={"If-None-Match": etag})
+
+        self.assertIn('desc="1 queries"', response.headers["Server-Timing"])
+
+    def test_write_changes_etag(self):
+        """Check an update through the API bumps the version and the ETag"""
+        url = f"/api/books/get_by_id/{self.book.id}"
+        etag = self.client.get(url).headers["ETag"]
+        version = self.version("books")
+
+        self.client.put(
+            f"/api/books/update/{self.book.id}",
+            json={"title": "test book", "author": "john doe", "quantity": 9},
+        )
+        response = self.client.get(url, headers={"If-None-Match": etag})
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(9, response.json["quantity"])
+        self.assertEqual(version + 1, self.version("books"))
+
+    def test_return_changes_transaction_listing(self):
+        """Check issue and return bump every table they write to"""
+        url = "/api/transactions/get_transactions"
+        data = {"member_id": self.member.id, "book_id": self.book.id}
+
+        self.client.post("/api/transactions/issue_book", json=data)
+        etag = self.client.get(url).headers["ETag"]
+        self.client.post("/api/transactions/retrieve_book", json=data)
+        response = self.client.get(url, headers={"If-None-Match": etag})
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("return", response.json["transactions"][0]["type"])
+        self.assertEqual(2, self.version("transactions"))
+        self.assertEqual(2, self.version("members"))
+
+    def test_failed_write_keeps_version(self):
+        """Check a rejected issue leaves the versions alone"""
+        self.client.post(
+            "/api/transactions/issue_book",
+            json={"member_id": self.member.id, "book_id": 999},
+        )
+
+        self.assertEqual(0, self.version("books"))
+
+    def test_versions_bumped_after_commit(self):
+        """Check the version rows are not written inside the transaction"""
+        mark_changed("books")
+        self.book.quantity = 9
+
+        db.session.flush()
+        self.assertEqual(0, self.version("books"))
+
+        db.session.commit()
+        self.assertEqual(1, self.version("books"))
+
+    def test_failed_bump_keeps_the_write(self):
+        """Check a failed bump stays pending, blocks 304s and is retried"""
+        url = f"/api/books/get_by_id/{self.book.id}"
+        etag = self.client.get(url).headers["ETag"]
+        failing = patch.object(
+            db.engine, "begin", side_effect=OperationalError("", {}, Exception())
+        )
+
+        with failing, self.assertLogs(self.app.logger, "ERROR"):
+            response = self.client.put(
+                f"/api/books/update/{self.book.id}",
+                json={"title": "test book", "author": "john doe", "quantity": 9},
+            )
+            stale = self.client.get(url, headers={"If-None-Match": etag})
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(0, self.version("books"))
+        self.assertEqual({"books"}, self.app.extensions["pending_versions"])
+        self.assertEqual(200, stale.status_code)
+        self.assertEqual(9, stale.json["quantity"])
+
+        retried = self.client.get(url, headers={"If-None-Match": etag})
+
+        self.assertEqual(200, retried.status_code)
+        self.assertEqual(1, self.version("books"))
+        self.assertEqual(set(), self.app.extensions["pending_versions"])
+        self.assertNotEqual(etag, retried.headers["ETag"])
+
+    def test_errors_have_no_etag(self):
+        """Check error responses are not given validators"""
+        response = self.client.get("/api/books/get_by_id/999")
+
+        self.assertEqual(400, response.status_code)
+        self.assertNotIn("ETag", response.headers)
+
+
+class TestRowVersions(TestCase):
+    """Tests row versions, optimistic locking and the since feed"""
+
+    def setUp(self):
+        """Set up the test client and app context."""
+        self.app = create_app("testing")
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.book = Book(title="test book", author="john doe", quantity=4)
+        self.member = Member(name="John Doe", debt=0, books_borrowed=0)
+        db.session.add_all([self.book, self.member])
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def update_book(self, **fields):
+        """Sends an update of the test book."""
+        data = {"title": "test book", "author": "john doe", "quantity": 4}
+        return self.client.put(
+            f"/api/books/update/{self.book.id}", json={**data, **fields}
+        )
+
+    def test_update_with_current_version(self):
+        """Check an update carrying the current version goes through"""
+        response = self.update_book(quantity=7, version=1)
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(2, response.json["version"])
+
+    def test_update_with_stale_version(self):
+        """Check an update based on an old version is refused"""
+        self.update_book(quantity=7, version=1)
+        response = self.update_book(quantity=2, version=1)
+
+        self.assertEqual(409, response.status_code)
+        self.assertEqual(7, response.json["book"]["quantity"])
+        self.assertEqual(2, response.json["book"]["version"])
+
+    def test_member_update_with_stale_version(self):
+        """Check member updates are checked against the version as well"""
+        url = f"/api/members/update/{self.member.id}"
+        data = {"name": "Jane Doe", "debt": 0, "version": 1}
+
+        first = self.client.put(url, json=data)
+        second = self.client.put(url, json={**data, "name": "Jim Doe"})
+
+        self.assertEqual(2, first.json["version"])
+        self.assertEqual(409, second.status_code)
+        self.assertEqual("Jane Doe", second.json["member"]["name"])
+
+    def test_concurrent_orm_write_detected(self):
+        """Check a flush over a row changed underneath raises StaleDataError"""
+        books = Book.__table__
+        # a plain Core statement, so the loaded book keeps its old version
+        db.session.connection().execute(
+            update(books).where(books.c.id == self.book.id).values(version=2)
+        )
+        self.book.quantity = 1
+
+        with self.assertRaises(StaleDataError):
+            db.session.commit()
+
+    def test_issue_bumps_row_versions(self):
+        """Check the issue statements advance version and updated_at"""
+        updated_at = self.book.updated_at
+
+        self.client.post(
+            "/api/transactions/issue_book",
+            json={"member_id": self.member.id, "book_id": self.book.id},
+        )
+        db.session.expire_all()
+
+        self.assertEqual(2, self.book.version)
+        self.assertEqual(2, self.member.version)
+        self.assertGreater(self.book.updated_at, updated_at)
+
+    def test_since_returns_changed_rows_only(self):
+        """Check the since feed skips rows unchanged after the timestamp"""
+        other = Book(title="other book", author="jane doe", quantity=1)
+        db.session.add(other)
+        db.session.commit()
+        since = other.updated_at.isoformat()
+
+        for query_string in ({"since": since}, {"since": since, "cursor": ""}):
+            response = self.client.get(
+                "/api/books/get_books", query_string=query_string
+            )
+
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(
+                [other.id], [book["id"] for book in response.json["books"]]
+            )
+
+        self.update_book(quantity=9)
+        response = self.client.get(
+            "/api/books/get_books", query_string={"since": since}
+        )
+
+        self.assertEqual(2, response.json["total_books"])
+
+    def test_since_on_members_and_transactions(self):
+        """Check members and transactions accept since as well"""
+        self.client.post(
+            "/api/transactions/issue_book",
+            json={"member_id": self.member.id, "book_id": self.book.id},
+        )
+
+        members = self.client.get(
+            "/api/members/get_members", query_string={"since": "2999-01-01T00:00:00"}
+        )
+        transactions = self.client.get(
+            "/api/transactions/get_transactions",
+            query_string={"since": "2000-01-01T00:00:00+02:00", "cursor": ""},
+        )
+
+        self.assertEqual(0, members.json["total_members"])
+        self.assertEqual(1, len(transactions.json["transactions"]))
+        self.assertEqual(1, transactions.json["transactions"][0]["version"])
+
+    def test_invalid_since(self):
+        """Check a malformed since is rejected"""
+        response = self.client.get("/api/books/get_books?since=yesterday")
+
+        self.assertEqual(400, response.status_code)
+        self.assertIn("Invalid since", response.json["Error"])